@@ -0,0 +1,135 @@
+import argparse
+import threading
+import logging
+import statistics
+import time
+import uuid
+import io
+import sys
+from pathlib import Path
+from datetime import datetime, timedelta
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from packages.database_tools import connect
+from packages.game_tools import claim_games, CLAIM_COLUMNS, GAME_COLUMNS
+
+"""
+Benchmark job claiming with many simulated workers polling one games table.
+
+Runs inside a throwaway schema on the database configured by the PG_* variables,
+so it never touches the real queue. Use a disposable local Postgres.
+"""
+
+parser = argparse.ArgumentParser(description="Benchmark concurrent job claiming against Postgres",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument("-g", "--games", action="store", type=int, help="number of queued games", default=5000)
+parser.add_argument("-w", "--workers", action="store", type=int, help="number of simulated workers", default=32)
+parser.add_argument("-s", "--slots", action="store", type=int, help="games claimed per poll", default=8)
+parser.add_argument("-x", "--expired", action="store", type=float, help="share of games left claimed by a dead worker with an expired lease", default=0.1)
+parser.add_argument("-m", "--method", action="store", help="claim method (skip_locked, legacy, both)", default='both')
+args = vars(parser.parse_args())
+
+# claim_games warns about every expired lease it takes over
+logging.getLogger().setLevel(logging.ERROR)
+
+
+def legacy_claim(conn, cur, device_id, slots):
+    # Pre-SKIP LOCKED behaviour: read then claim row by row
+    cur.execute(f"""
+        SELECT {', '.join(CLAIM_COLUMNS)}
+        FROM games
+        WHERE device_id IS NULL
+        ORDER BY created_on ASC
+        LIMIT {slots}
+    """)
+    rows = cur.fetchall()
+    for row in rows:
+        cur.execute("UPDATE games SET device_id = %s WHERE primary_key = %s", (device_id, row[0]))
+        conn.commit()
+    return [dict(zip(CLAIM_COLUMNS, row)) for row in rows]
+
+
+def setup_schema(schema, game_count, expired):
+    conn, cur = connect()
+    cur.execute(f'CREATE SCHEMA "{schema}"')
+    tables_sql = (REPO_ROOT / 'queries' / 'create_tables.sql').read_text()
+    cur.execute(tables_sql.replace('"public".', f'"{schema}".'))
+
+    created_on = datetime.now()
+    job_id = str(uuid.uuid4())
+    # Rows a crashed worker claimed, whose leases have run out
+    dead_device = str(uuid.uuid4())
+    dead_every = round(1 / expired) if expired else 0
+    buffer = io.StringIO()
+    for i in range(game_count):
+        dead = dead_every and i % dead_every == 0
+        buffer.write('\t'.join([
+            str(uuid.uuid4()), f'Deck {i % 50}', f'Deck {(i + 1) % 50}', '\\N', '\\N',
+            job_id, '1', '0', '0', '0', '0', '{}', dead_device if dead else '\\N', 'constructed',
+            (created_on + timedelta(microseconds=i)).isoformat(), '\\N', '0', '\\N', '\\N',
+            (created_on - timedelta(minutes=1)).isoformat() if dead else '\\N',
+        ]) + '\n')
+    buffer.seek(0)
+    cur.execute(f'SET search_path TO "{schema}"')
+    cur.copy_from(buffer, 'games', sep='\t', columns=GAME_COLUMNS + ['lease_expires_on'])
+    conn.commit()
+    conn.close()
+
+
+def run_workers(schema, method, worker_count, slots):
+    claim = claim_games if method == 'skip_locked' else legacy_claim
+    claimed = []
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        device_id = str(uuid.uuid4())
+        conn, cur = connect(options=f'-c search_path="{schema}"')
+        while True:
+            start = time.perf_counter()
+            games = claim(conn, cur, device_id, slots)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                claimed.extend(game['primary_key'] for game in games)
+            if not games:
+                break
+        conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(worker_count)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_time = time.perf_counter() - start
+
+    return claimed, latencies, wall_time
+
+
+def report(method, claimed, latencies, wall_time, game_count):
+    unique = len(set(claimed))
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"\n{method}:")
+    print(f"  Games claimed: {unique}/{game_count} ({len(claimed) - unique} duplicate claims)")
+    print(f"  Wall time: {wall_time:.2f}s ({unique / wall_time:.0f} claims/s)")
+    print(f"  Claim latency: p50 {p50:.2f}ms, p99 {p99:.2f}ms over {len(latencies)} polls")
+
+
+methods = ['skip_locked', 'legacy'] if args['method'] == 'both' else [args['method']]
+for method in methods:
+    schema = f"claim_bench_{uuid.uuid4().hex[:8]}"
+    setup_schema(schema, args['games'], args['expired'])
+    try:
+        claimed, latencies, wall_time = run_workers(schema, method, args['workers'], args['slots'])
+        report(method, claimed, latencies, wall_time, args['games'])
+    finally:
+        conn, cur = connect()
+        cur.execute(f'DROP SCHEMA "{schema}" CASCADE')
+        conn.commit()
+        conn.close()
@@ -0,0 +1,106 @@
+import argparse
+import tempfile
+import random
+import time
+import sys
+import os
+from pathlib import Path
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from packages.deck_tools import parse_card, parse_decks, parse_deck_files, add_lands
+
+"""
+Benchmark Archidekt decklist parsing: the per-line parse_card loop and
+per-deck add_lands against the vectorized parser, and one process against
+parallel parsing of many input files.
+
+Output is checked against the original parser on the golden inputs in
+tests/test_deck_tools.py; this script only times the two.
+"""
+
+parser = argparse.ArgumentParser(description="Benchmark decklist parsing",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument("-c", "--cards", action="store", type=int, help="cards in the synthetic export", default=20000)
+parser.add_argument("-n", "--files", action="store", type=int, help="synthetic input files for the parallel run", default=32)
+parser.add_argument("-w", "--workers", action="store", type=int, help="worker processes, defaults to one per CPU", default=None)
+args = vars(parser.parse_args())
+
+
+def legacy_add_lands(cards_df, lands):
+    # add_lands as it was before, one filter and concat per deck
+    for deck in cards_df['deck_name'].unique():
+        deck_df = cards_df[cards_df['deck_name'] == deck]
+        colour = deck_df['colour'].iloc[0]
+        if deck_df[deck_df['card_name'].isin(['Plains', 'Island', 'Swamp', 'Mountain', 'Forest'])].empty:
+            lands_df = pd.DataFrame.from_dict(lands[colour])
+            lands_df['deck_name'] = deck
+            cards_df = pd.concat([cards_df, lands_df])
+    return cards_df
+
+
+def land_table():
+    # The lands add_lands uses, read back from a deck of each colour with none of its own,
+    # so the per-deck loop is timed with the same lands
+    probe = pd.DataFrame([{'quantity': '1', 'card_name': 'Probe', 'colour': colour, 'set_code': 'JMP',
+                           'deck_name': colour, 'tag': ''} for colour in 'WUBRG'])
+    added = add_lands(probe).iloc[len(probe):]
+    return {colour: added[added['deck_name'] == colour].drop(columns='deck_name').to_dict('records') for colour in 'WUBRG'}
+
+
+def legacy_parse_decks(cards, format, lands):
+    # parse_decks as it was before, one parse_card call per line
+    cards_df = pd.DataFrame.from_dict([parse_card(card, format) for card in cards])
+    if format == 'jumpstart':
+        cards_df = legacy_add_lands(cards_df, lands)
+        assert len(cards_df['deck_name'].unique()) == cards_df['quantity'].astype(int).sum() // 20, "Deck count does not match expected value (cards/20)"
+    return cards_df
+
+
+def synthetic_export(card_count, seed=0):
+    # Jumpstart lines in the Archidekt export shape, with some that take the fallback path.
+    # Half decks have 12 cards, add_lands brings each to 20
+    rng = random.Random(seed)
+    colours = 'WUBRG'
+    decks = [(colours[i % 5], f"Theme {i}{' (Big)' if i % 7 == 0 else ''}{'/Drain' if i % 11 == 0 else ''}") for i in range(card_count // 12)]
+    lines = []
+    for i in range(len(decks) * 12):
+        colour, deck = decks[i // 12]
+        name = f"Card {rng.randint(0, 5000)}{', the Bold' if i % 3 == 0 else ''}{' // Other Side' if i % 97 == 0 else ''}"
+        tag = rng.choice(['Creature,#7ef553', 'Removal,#fb3335', 'Noncreature,#00edff', 'Card Draw,#aaaaaa'])
+        spacing = '  ' if i % 13 == 0 else ' '
+        set_code = '(j25 promo)' if i % 501 == 0 else f"({rng.choice(['jmp', 'j22', 'j25', 'afr'])})"
+        lines.append(f"1x {name} {set_code} [{colour}{spacing}- {deck}] ^{tag}^\n")
+    return lines
+
+
+def timed(label, function, *function_args):
+    start = time.perf_counter()
+    result = function(*function_args)
+    elapsed = time.perf_counter() - start
+    print(f"  {label}: {elapsed * 1000:.0f}ms")
+    return result, elapsed
+
+
+lands = land_table()
+export = synthetic_export(args['cards'])
+print(f"Synthetic export, {len(export)} cards")
+legacy, legacy_time = timed("legacy parse_card loop + add_lands", legacy_parse_decks, export, 'jumpstart', lands)
+parsed, parsed_time = timed("vectorized parse_decks", parse_decks, export, 'jumpstart')
+print(f"  {legacy_time / parsed_time:.1f}x faster")
+
+with tempfile.TemporaryDirectory() as directory:
+    paths = []
+    for i in range(args['files']):
+        paths.append(os.path.join(directory, f"export {i}.txt"))
+        with open(paths[-1], 'w') as f:
+            f.writelines(synthetic_export(args['cards'] // args['files'], seed=i))
+    print(f"{len(paths)} input files, {args['cards'] // args['files']} cards each")
+    serial, serial_time = timed("one process", parse_deck_files, paths, 'jumpstart', 1)
+    parallel, parallel_time = timed("worker processes", parse_deck_files, paths, 'jumpstart', args['workers'])
+    for serial_df, parallel_df in zip(serial, parallel):
+        pd.testing.assert_frame_equal(parallel_df, serial_df)
+    print(f"  {serial_time / parallel_time:.1f}x faster in parallel")
@@ -0,0 +1,107 @@
+import argparse
+import statistics
+import random
+import time
+import uuid
+import io
+import sys
+from pathlib import Path
+from datetime import datetime
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from packages.database_tools import connect
+from packages.deck_tools import upload_decks
+
+"""
+Benchmark deck uploads: the old insert of every card under a fresh uuid4
+against the diff-based upload_decks, for a first upload, an unchanged
+re-upload and a re-upload with one deck edited.
+
+Runs in a throwaway schema built from queries/create_tables.sql. Use a disposable local Postgres.
+"""
+
+parser = argparse.ArgumentParser(description="Benchmark idempotent deck uploads",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument("-c", "--cards", action="store", type=int, help="cards in the uploaded list", default=2000)
+parser.add_argument("-s", "--deck_size", action="store", type=int, help="cards per deck", default=20)
+parser.add_argument("-r", "--repeat", action="store", type=int, help="timed runs per upload, median is reported", default=20)
+args = vars(parser.parse_args())
+
+
+def synthetic_list(card_count, deck_size, seed=0):
+    rng = random.Random(seed)
+    return pd.DataFrame([{
+        'card_name': f"Card {rng.randint(0, 20000)}",
+        'deck_name': f"Theme {i // deck_size}",
+        'set_code': 'JMP',
+        'quantity': '1',
+        'tag': rng.choice(['Creature', 'Removal', 'Noncreature']),
+        'colour': 'WUBRG'[(i // deck_size) % 5],
+        'format': 'jumpstart',
+        'category': 'main',
+    } for i in range(card_count)])
+
+
+def legacy_upload(cur, decks_df):
+    # tools/update_decks.py before diff-based uploads: every card again under a new key
+    decks_df = decks_df.copy()
+    decks_df.insert(0, 'primary_key', [str(uuid.uuid4()) for _ in range(len(decks_df))])
+    decks_df['uploaded_on'] = datetime.now().isoformat()
+    decks_df = decks_df[['primary_key', 'card_name', 'deck_name', 'set_code', 'quantity', 'uploaded_on', 'tag', 'colour', 'format', 'category']]
+    buffer = io.StringIO()
+    decks_df.to_csv(buffer, index=False, header=False, sep='\t')
+    buffer.seek(0)
+    cur.copy_from(buffer, 'decks', sep='\t', columns=list(decks_df.columns))
+
+
+def timed_uploads(conn, cur, upload, decks_df, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = upload(cur, decks_df)
+        conn.commit()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, result
+
+
+def deck_rows(cur):
+    cur.execute("SELECT count(*) FROM decks")
+    return cur.fetchone()[0]
+
+
+schema = f"upload_bench_{uuid.uuid4().hex[:8]}"
+conn, cur = connect()
+cur.execute(f'CREATE SCHEMA "{schema}"')
+cur.execute((REPO_ROOT / 'queries' / 'create_tables.sql').read_text().replace('"public".', f'"{schema}".'))
+cur.execute(f'SET search_path TO "{schema}"')
+conn.commit()
+try:
+    decks_df = synthetic_list(args['cards'], args['deck_size'])
+    print(f"Uploading {len(decks_df)} cards in {decks_df['deck_name'].nunique()} decks")
+
+    legacy_ms, _ = timed_uploads(conn, cur, legacy_upload, decks_df, args['repeat'])
+    print(f"  legacy insert: {legacy_ms:.1f}ms per upload, {deck_rows(cur)} rows after {args['repeat']} uploads")
+    cur.execute("DELETE FROM decks")
+    conn.commit()
+
+    first_ms, (changed, _) = timed_uploads(conn, cur, upload_decks, decks_df, 1)
+    print(f"  first upload: {first_ms:.1f}ms, {len(changed)} decks written, {deck_rows(cur)} rows")
+
+    unchanged_ms, (changed, unchanged) = timed_uploads(conn, cur, upload_decks, decks_df, args['repeat'])
+    assert not changed and deck_rows(cur) == len(decks_df), "unchanged re-upload wrote rows"
+    print(f"  unchanged re-upload: {unchanged_ms:.1f}ms, {len(unchanged)} decks unchanged, {deck_rows(cur)} rows")
+
+    edited = decks_df.copy()
+    edited.loc[0, 'card_name'] = 'Edited Card'
+    edited_ms, (changed, unchanged) = timed_uploads(conn, cur, upload_decks, edited, 1)
+    assert [(deck_name, revision) for _, deck_name, revision in changed] == [(edited.loc[0, 'deck_name'], 2)]
+    print(f"  one deck edited: {edited_ms:.1f}ms, {len(changed)} deck written as revision 2, {deck_rows(cur)} rows")
+finally:
+    conn.rollback()
+    cur.execute(f'DROP SCHEMA "{schema}" CASCADE')
+    conn.commit()
+    conn.close()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+import hashlib
+import random
+import time
+import sys
+import os
+
+"""
+Stand-in for Forge's simulator, for benchmarking the worker without a Forge install.
+
+One-shot, like `java -jar forge.jar sim ...` (point FORGE_COMMAND at this script):
+
+    python benchmarks/fake_forge.py sim -d "Deck A" "Deck B" -n 10 -q
+
+Resident, speaking the pool protocol in packages/simulator_tools.py (point FORGE_POOL_CMD at it):
+
+    python benchmarks/fake_forge.py --pool
+
+Output follows Forge's: a "Game outcome: Turn N" line and a result line per
+game, with game log lines in between unless -q is given. Each deck has a
+fixed strength derived from its name, so the same matchup favours the same
+deck from run to run. Behaviour is set through the environment:
+
+    FAKE_FORGE_STARTUP_SECONDS   JVM start-up delay before the first game (default 0.5)
+    FAKE_FORGE_GAME_SECONDS      mean time per game, +/-50% jitter (default 0.05)
+    FAKE_FORGE_DRAW_RATE         share of games drawn (default 0.01)
+    FAKE_FORGE_NOISE             game log lines per game without -q (default 20)
+    FAKE_FORGE_MEMORY_MB         memory to hold while running, like a JVM heap (default 0)
+    FAKE_FORGE_EXIT_CODE         exit code of every run (default 0)
+    FAKE_FORGE_SEED              random seed, unseeded by default
+    FAKE_FORGE_DECKS_PATH        if set, fail like Forge when a deck has no <name>.dck here
+"""
+
+DONE_PREFIX = '@@FORGE_DONE'
+PING = '@@PING'
+PONG = '@@PONG'
+
+STARTUP_SECONDS = float(os.environ.get("FAKE_FORGE_STARTUP_SECONDS", 0.5))
+GAME_SECONDS = float(os.environ.get("FAKE_FORGE_GAME_SECONDS", 0.05))
+DRAW_RATE = float(os.environ.get("FAKE_FORGE_DRAW_RATE", 0.01))
+NOISE = int(os.environ.get("FAKE_FORGE_NOISE", 20))
+MEMORY_MB = int(os.environ.get("FAKE_FORGE_MEMORY_MB", 0))
+EXIT_CODE = int(os.environ.get("FAKE_FORGE_EXIT_CODE", 0))
+SEED = os.environ.get("FAKE_FORGE_SEED")
+DECKS_PATH = os.environ.get("FAKE_FORGE_DECKS_PATH")
+
+rng = random.Random(SEED)
+
+
+def strength(deck_name):
+    return 0.5 + int(hashlib.md5(deck_name.encode()).hexdigest()[:8], 16) / 0xffffffff
+
+
+def parse_sim_args(args):
+    # Forge's sim arguments: -d <deck>... -n <games> [-q]
+    if '-d' not in args:
+        raise ValueError("sim needs -d <deck> <deck>...")
+    decks = []
+    for arg in args[args.index('-d') + 1:]:
+        if arg.startswith('-'):
+            break
+        decks.append(arg)
+    if len(decks) < 2:
+        raise ValueError("sim needs at least two decks")
+    if DECKS_PATH:
+        missing = [deck for deck in decks if not os.path.exists(os.path.join(DECKS_PATH, f"{deck}.dck"))]
+        if missing:
+            raise ValueError(f"Could not find deck(s) {', '.join(missing)} in {DECKS_PATH}")
+    game_count = int(args[args.index('-n') + 1]) if '-n' in args else 1
+    return decks, game_count, '-q' in args
+
+
+def simulate(args, write):
+    decks, game_count, quiet = parse_sim_args(args)
+    weights = [strength(deck) for deck in decks]
+    for game in range(1, game_count + 1):
+        started = time.perf_counter()
+        turns = rng.randint(5, 14)
+        if not quiet:
+            for _ in range(NOISE):
+                seat = rng.randrange(len(decks))
+                write(f"Turn {rng.randint(1, turns)} (Ai({seat + 1})-{decks[seat]}) casts a spell")
+        time.sleep(GAME_SECONDS * rng.uniform(0.5, 1.5))
+
+        write(f"Game outcome: Turn {turns}")
+        if rng.random() < DRAW_RATE:
+            elapsed_ms = int((time.perf_counter() - started) * 1000)
+            write(f"Game Result: Game {game} ended in a Draw! Took {elapsed_ms} ms.")
+            continue
+        seat = rng.choices(range(len(decks)), weights=weights)[0]
+        for loser in range(len(decks)):
+            if loser != seat:
+                write(f"Game outcome: Ai({loser + 1})-{decks[loser]} has lost because life total reached 0")
+        write(f"Game outcome: Ai({seat + 1})-{decks[seat]} has won because all opponents have lost")
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        write(f"Game Result: Game {game} ended in {elapsed_ms} ms. Ai({seat + 1})-{decks[seat]} has won!")
+
+
+def write_line(line):
+    sys.stdout.write(line + '\n')
+    sys.stdout.flush()
+
+
+def run_once(args):
+    if not args or args[0] != 'sim':
+        print(f"Unknown mode {args[:1]}, expected sim", file=sys.stderr)
+        return 1
+    try:
+        simulate(args[1:], write_line)
+    except ValueError as e:
+        print(f"Invalid sim arguments: {e}", file=sys.stderr)
+        return 1
+    return EXIT_CODE
+
+
+def run_pool():
+    # One request per line, answered with its output and a done marker
+    for request in sys.stdin:
+        request = request.rstrip('\n')
+        if request == PING:
+            write_line(PONG)
+            continue
+        if not request:
+            continue
+        try:
+            simulate(request.split('\t'), write_line)
+            returncode = EXIT_CODE
+        except ValueError as e:
+            print(f"Invalid sim arguments: {e}", file=sys.stderr, flush=True)
+            returncode = 1
+        write_line(f"{DONE_PREFIX} {returncode}")
+    return 0
+
+
+if __name__ == '__main__':
+    # Held for the life of the process, like the JVM's heap
+    heap = b'\x01' * (MEMORY_MB * 1024 * 1024)
+    time.sleep(STARTUP_SECONDS)
+    sys.exit(run_pool() if sys.argv[1:] == ['--pool'] else run_once(sys.argv[1:]))
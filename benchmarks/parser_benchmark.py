@@ -0,0 +1,167 @@
+import argparse
+import random
+import gzip
+import glob
+import time
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from packages.game_tools import GameOutputParser
+
+"""
+Benchmark Forge sim output parsing: the old lowercasing and substring search
+against the compiled parser, both for whole logs and line-by-line streaming.
+
+Parses recorded logs spooled by the worker (output/logs/*.txt.gz) when given,
+otherwise a synthetic log in the same format. Deck names are read from each
+log's win lines, since spooled logs do not record the matchup.
+"""
+
+parser = argparse.ArgumentParser(description="Benchmark Forge output parsing",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument("-l", "--logs", action="store", help="glob of recorded logs (.txt or .txt.gz)", default=None)
+parser.add_argument("-g", "--games", action="store", type=int, help="games in the synthetic log", default=50000)
+parser.add_argument("--noise", action="store", type=int, help="game log lines per game in the synthetic log (0 matches quiet -q output)", default=20)
+parser.add_argument("-r", "--repeat", action="store", type=int, help="timed runs per parser, best is reported", default=5)
+args = vars(parser.parse_args())
+
+
+def legacy_parse(output, deck_names):
+    # Whole-log parsing as parse_game_results did it before the compiled parser
+    win_counts = [0, 0, 0, 0]
+    turn_counts = []
+    for line in output.strip().split('\n'):
+        if 'game outcome: turn' in line.lower():
+            try:
+                turn_counts.append(int(line.lower().split()[-1]))
+            except (ValueError, IndexError):
+                pass
+        if 'won!' in line.lower():
+            for j, name in enumerate(deck_names):
+                if name and name.lower() in line.lower():
+                    win_counts[j] += 1
+                    break
+    return win_counts, turn_counts
+
+
+class LegacyLineParser:
+    # Streaming parser as GameOutputParser.feed worked before, one call per line
+
+    def __init__(self, deck_names):
+        self.deck_names = list(deck_names) + [None] * (4 - len(deck_names))
+        self.win_counts = [0, 0, 0, 0]
+        self.turn_counts = []
+        self.games_played = 0
+
+    def feed(self, line):
+        lowered = line.lower()
+        if 'game outcome: turn' in lowered:
+            try:
+                self.turn_counts.append(int(lowered.split()[-1]))
+            except (ValueError, IndexError):
+                pass
+        if 'won!' in lowered:
+            for j, name in enumerate(self.deck_names):
+                if name and name.lower() in lowered:
+                    self.win_counts[j] += 1
+                    break
+            self.games_played += 1
+        elif 'ended in a draw' in lowered:
+            self.games_played += 1
+
+
+def legacy_line_parse(output, deck_names):
+    game_parser = LegacyLineParser(deck_names)
+    for line in output.strip().split('\n'):
+        game_parser.feed(line)
+    return game_parser.win_counts, game_parser.turn_counts
+
+
+def line_parse(output, deck_names):
+    game_parser = GameOutputParser(deck_names)
+    for line in output.strip().split('\n'):
+        game_parser.feed(line)
+    return game_parser.win_counts, game_parser.turn_counts
+
+
+def text_parse(output, deck_names):
+    game_parser = GameOutputParser(deck_names)
+    game_parser.feed_text(output)
+    return game_parser.win_counts, game_parser.turn_counts
+
+
+def synthetic_log(game_count, deck_names, noise, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for game in range(1, game_count + 1):
+        # Game log lines a verbose run prints between results
+        for _ in range(rng.randint(noise // 2, noise)):
+            lines.append(f"Turn {rng.randint(1, 15)} (Ai({rng.randint(1, 2)})-{rng.choice(deck_names)}) casts a spell")
+        lines.append(f"Game outcome: Turn {rng.randint(4, 15)}")
+        if rng.random() < 0.02:
+            lines.append(f"Game Result: Game {game} ended in a Draw! Took {rng.randint(500, 9000)} ms.")
+        else:
+            seat = rng.randrange(len(deck_names))
+            lines.append(f"Game {game}: Ai({seat + 1})-{deck_names[seat]} has won!")
+    return '\n'.join(lines) + '\n'
+
+
+def recorded_logs(pattern):
+    for path in sorted(glob.glob(pattern)):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt') as f:
+            output = f.read()
+        # Deck names from the win lines, in order of first appearance
+        names = []
+        for line in output.splitlines():
+            if 'has won!' in line and ')-' in line:
+                name = line.split(')-', 1)[1].rsplit(' has won!', 1)[0]
+                if name not in names:
+                    names.append(name)
+        yield path, output, names[:4]
+
+
+def best_time(parse, logs, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _, output, names in logs:
+            parse(output, names)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if args['logs']:
+    logs = list(recorded_logs(args['logs']))
+    if not logs:
+        raise ValueError(f"No logs match {args['logs']}")
+else:
+    # "Cats" is a substring of "Cats Angelic", which the legacy parser miscounts
+    logs = [('synthetic', synthetic_log(args['games'], ['Cats', 'Cats Angelic'], args['noise']), ['Cats', 'Cats Angelic'])]
+
+size_mb = sum(len(output) for _, output, _ in logs) / 1e6
+print(f"Parsing {len(logs)} log(s), {size_mb:.1f} MB")
+
+for path, output, names in logs:
+    legacy = legacy_parse(output, names)
+    compiled = text_parse(output, names)
+    assert line_parse(output, names) == compiled, f"{path}: line and text parsing disagree"
+    if legacy != compiled:
+        print(f"  {path}: wins differ for {names}, legacy {legacy[0]} vs compiled {compiled[0]}")
+
+results = {}
+# Streaming parsers are compared with the old streaming parser, whole-log parsing with the old loop
+for label, parse, baseline in [
+    ('legacy (whole log)', legacy_parse, 'legacy (whole log)'),
+    ('compiled (whole log)', text_parse, 'legacy (whole log)'),
+    ('legacy (per line)', legacy_line_parse, 'legacy (per line)'),
+    ('compiled (per line)', line_parse, 'legacy (per line)'),
+]:
+    results[label] = best_time(parse, logs, args['repeat'])
+    print(f"  {label}: {results[label] * 1000:.1f}ms ({size_mb / results[label]:.0f} MB/s, "
+          f"{results[baseline] / results[label]:.1f}x legacy)")
@@ -0,0 +1,362 @@
+import argparse
+import collections
+import itertools
+import statistics
+import subprocess
+import urllib.request
+import tempfile
+import platform
+import socket
+import shlex
+import json
+import math
+import time
+import uuid
+import os
+import sys
+from pathlib import Path
+from datetime import datetime
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from packages.database_tools import connect
+from packages.deck_tools import upload_decks
+from packages.game_tools import queue_games
+from packages.scheduler_tools import process_usage
+
+"""
+End-to-end benchmark of the worker pipeline: queue, claim, deck sync, simulation,
+parsing and result write-back, with benchmarks/fake_forge.py standing in for Forge.
+
+Uploads synthetic decks and queues a round robin in a throwaway schema built from
+queries/create_tables.sql, starts real worker.py processes against it, and measures
+games per second until the queue drains, claim latency from the workers' /metrics
+and the resident memory of each worker and of its simulators. Use a disposable
+local Postgres.
+
+Each run is appended to a history file. Runs are compared with the median of the
+last five on the same host with the same options, and the script exits with 1 if
+any result is worse than that by more than the threshold.
+"""
+
+parser = argparse.ArgumentParser(description="Benchmark the worker pipeline end to end with a fake Forge",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument("-w", "--workers", action="store", type=int, help="worker processes", default=2)
+parser.add_argument("-c", "--concurrency", action="store", type=int, help="games each worker runs at once (MAX_GAMES)", default=4)
+parser.add_argument("-d", "--decks", action="store", type=int, help="decks in the round robin", default=8)
+parser.add_argument("-g", "--games", action="store", type=int, help="games per matchup", default=20)
+parser.add_argument("-s", "--shard_size", action="store", type=int, help="most games in one row", default=None)
+parser.add_argument("-t", "--game_seconds", action="store", type=float, help="fake Forge seconds per game", default=0.02)
+parser.add_argument("-u", "--startup_seconds", action="store", type=float, help="fake Forge start-up seconds", default=0.3)
+parser.add_argument("-m", "--memory_mb", action="store", type=int, help="memory each fake Forge holds", default=0)
+parser.add_argument("-p", "--pool", action="store_true", help="run the fake Forge through the simulator pool (FORGE_POOL_CMD)")
+parser.add_argument("--timeout", action="store", type=float, help="seconds to wait for the queue to drain", default=600)
+parser.add_argument("--history", action="store", help="JSON lines file of past runs", default='output/benchmarks/pipeline_history.jsonl')
+parser.add_argument("--threshold", action="store", type=float, help="relative change that counts as a regression", default=0.1)
+parser.add_argument("--no_record", action="store_true", help="compare with the history without appending this run")
+args = vars(parser.parse_args())
+
+FAKE_FORGE = REPO_ROOT / 'benchmarks' / 'fake_forge.py'
+
+# Result, and whether a higher value is better
+TRACKED = {
+    'games_per_second': True,
+    'claim_mean_ms': False,
+    'claim_p95_ms': False,
+    'write_results_mean_ms': False,
+    'worker_rss_mb': False,
+    'simulator_rss_mb': False,
+}
+
+
+def synthetic_decks(deck_count, deck_size=60):
+    return pd.DataFrame([{
+        'card_name': f"Card {(deck * 7 + card) % 400}",
+        'deck_name': f"Bench Deck {deck}",
+        'set_code': 'BEN',
+        'quantity': '1',
+        'tag': 'Creature',
+        'colour': 'WUBRG'[deck % 5],
+        'format': 'constructed',
+        'category': 'main',
+    } for deck in range(deck_count) for card in range(deck_size)])
+
+
+def setup_schema(schema):
+    conn, cur = connect()
+    cur.execute(f'CREATE SCHEMA "{schema}"')
+    cur.execute((REPO_ROOT / 'queries' / 'create_tables.sql').read_text().replace('"public".', f'"{schema}".'))
+    cur.execute(f'SET search_path TO "{schema}"')
+    decks_df = synthetic_decks(args['decks'])
+    upload_decks(cur, decks_df)
+    conn.commit()
+    return conn, cur, sorted(decks_df['deck_name'].unique())
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def worker_env(schema, root):
+    forge_dir = root / 'forge'
+    decks_dir = forge_dir / 'decks'
+    (decks_dir / 'constructed').mkdir(parents=True, exist_ok=True)
+    env = {key: value for key, value in os.environ.items() if key != 'TRACE_PATH'}
+    env.update({
+        'PGOPTIONS': f"{env.get('PGOPTIONS', '')} -c search_path={schema}".strip(),
+        'FORGE_JAR_PATH': str(forge_dir / 'forge.jar'),
+        'FORGE_DECKS_PATH': str(decks_dir),
+        'FORGE_COMMAND': shlex.join([sys.executable, str(FAKE_FORGE)]),
+        'FAKE_FORGE_DECKS_PATH': str(decks_dir / 'constructed'),
+        'FAKE_FORGE_STARTUP_SECONDS': str(args['startup_seconds']),
+        'FAKE_FORGE_GAME_SECONDS': str(args['game_seconds']),
+        'FAKE_FORGE_MEMORY_MB': str(args['memory_mb']),
+        'MAX_GAMES': str(args['concurrency']),
+        'SPOOL_GAME_LOGS': '0',
+        'PYTHONUNBUFFERED': '1',
+    })
+    if args['pool']:
+        env['FORGE_POOL_CMD'] = shlex.join([sys.executable, str(FAKE_FORGE), '--pool'])
+        env['FORGE_POOL_SIZE'] = str(args['concurrency'])
+    else:
+        env.pop('FORGE_POOL_CMD', None)
+    return env
+
+
+def start_workers(env, root, count):
+    workers = []
+    for i in range(count):
+        cwd = root / f'worker_{i}'
+        cwd.mkdir()
+        port = free_port()
+        log = open(cwd / 'worker.log', 'w')
+        proc = subprocess.Popen(
+            [sys.executable, str(REPO_ROOT / 'worker.py')],
+            cwd=cwd,
+            env={**env, 'DEVICE_ID': str(uuid.uuid4()), 'WORKER_PORT': str(port)},
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        workers.append({'proc': proc, 'port': port, 'log': log, 'log_path': cwd / 'worker.log'})
+
+    # Wait until every worker serves /status, so start-up is not timed
+    deadline = time.monotonic() + 60
+    for worker in workers:
+        while True:
+            if worker['proc'].poll() is not None:
+                raise RuntimeError(f"Worker exited with {worker['proc'].returncode}:\n{worker['log_path'].read_text()[-2000:]}")
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{worker['port']}/status", timeout=2).read()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Worker on port {worker['port']} did not start")
+                time.sleep(0.2)
+    return workers
+
+
+def stop_workers(workers):
+    for worker in workers:
+        if worker['proc'].poll() is None:
+            worker['proc'].terminate()
+    for worker in workers:
+        try:
+            worker['proc'].wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            worker['proc'].kill()
+            worker['proc'].wait()
+        worker['log'].close()
+
+
+def child_pids(pid):
+    # Children are listed under the thread that started them
+    children = []
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        return children
+    return children + [grandchild for child in children for grandchild in child_pids(child)]
+
+
+def sample_memory(workers, peaks):
+    # Peak resident memory of each worker and of the simulators it runs
+    for i, worker in enumerate(workers):
+        usage = process_usage(worker['proc'].pid)
+        if usage is None:
+            continue
+        simulators = sum((process_usage(child) or (0, 0))[0] for child in child_pids(worker['proc'].pid))
+        peaks[i]['worker'] = max(peaks[i]['worker'], usage[0])
+        peaks[i]['simulators'] = max(peaks[i]['simulators'], simulators)
+
+
+def scrape_metrics(workers):
+    # Samples summed across workers, keyed by name and labels
+    samples = collections.defaultdict(float)
+    for worker in workers:
+        text = urllib.request.urlopen(f"http://127.0.0.1:{worker['port']}/metrics", timeout=5).read().decode()
+        for line in text.splitlines():
+            if line and not line.startswith('#'):
+                key, value = line.rsplit(' ', 1)
+                samples[key] += float(value)
+    return samples
+
+
+def histogram_mean(samples, name, labels=''):
+    count = samples.get(f'{name}_count{labels}', 0)
+    return samples.get(f'{name}_sum{labels}', 0) / count if count else None
+
+
+def histogram_quantile(samples, name, q):
+    # Linear interpolation within the bucket holding the quantile, as Prometheus does
+    prefix = f'{name}_bucket{{le="'
+    buckets = sorted((float(key[len(prefix):-2]), count) for key, count in samples.items() if key.startswith(prefix))
+    if not buckets or not buckets[-1][1]:
+        return None
+    rank = q * buckets[-1][1]
+    lower_bound, lower_count = 0.0, 0
+    for bound, count in buckets:
+        if count >= rank:
+            if math.isinf(bound):
+                return lower_bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / max(count - lower_count, 1)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def wait_for_queue(conn, cur, workers, timeout):
+    peaks = [{'worker': 0.0, 'simulators': 0.0} for _ in workers]
+    deadline = time.monotonic() + timeout
+    while True:
+        sample_memory(workers, peaks)
+        cur.execute("SELECT count(*) FILTER (WHERE finished_on IS NULL), coalesce(sum(games_played), 0) FROM games")
+        unfinished, games_played = cur.fetchone()
+        conn.commit()
+        if not unfinished:
+            return games_played, peaks
+        for worker in workers:
+            if worker['proc'].poll() is not None:
+                raise RuntimeError(f"Worker exited with {worker['proc'].returncode}:\n{worker['log_path'].read_text()[-2000:]}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{unfinished} rows still unfinished after {timeout}s, {games_played} games played")
+        time.sleep(0.1)
+
+
+def run_benchmark():
+    schema = f"pipeline_bench_{uuid.uuid4().hex[:8]}"
+    conn, cur, decks = setup_schema(schema)
+    workers = []
+    try:
+        with tempfile.TemporaryDirectory(prefix='pipeline_bench_') as root:
+            root = Path(root)
+            workers = start_workers(worker_env(schema, root), root, args['workers'])
+            matchups = [(deck1, deck2, None, None) for deck1, deck2 in itertools.combinations(decks, 2)]
+
+            started = time.perf_counter()
+            _, rows = queue_games(cur, matchups, 'constructed', num_games=args['games'], shard_size=args['shard_size'])
+            conn.commit()
+            print(f"Queued {len(matchups) * args['games']} games in {rows} rows for {len(workers)} workers")
+
+            games_played, peaks = wait_for_queue(conn, cur, workers, args['timeout'])
+            elapsed = time.perf_counter() - started
+            samples = scrape_metrics(workers)
+            stop_workers(workers)
+    finally:
+        stop_workers(workers)
+        conn.rollback()
+        cur.execute(f'DROP SCHEMA "{schema}" CASCADE')
+        conn.commit()
+        conn.close()
+
+    claim_mean = histogram_mean(samples, 'worker_claim_seconds')
+    claim_p95 = histogram_quantile(samples, 'worker_claim_seconds', 0.95)
+    write_mean = histogram_mean(samples, 'db_transaction_seconds', '{operation="write_results"}')
+    return {
+        'games': int(games_played),
+        'rows': rows,
+        'seconds': round(elapsed, 3),
+        'games_per_second': round(games_played / elapsed, 2),
+        'claims': int(samples.get('worker_claim_seconds_count', 0)),
+        'claim_mean_ms': round(claim_mean * 1000, 2) if claim_mean is not None else None,
+        'claim_p95_ms': round(claim_p95 * 1000, 2) if claim_p95 is not None else None,
+        'write_results_mean_ms': round(write_mean * 1000, 2) if write_mean is not None else None,
+        'worker_rss_mb': round(max(peak['worker'] for peak in peaks), 1),
+        'simulator_rss_mb': round(max(peak['simulators'] for peak in peaks), 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(results, baseline_runs, threshold):
+    """
+    Compare results with the median of earlier runs
+
+    Returns:
+        list: Names of results worse than the baseline by more than threshold
+    """
+    regressions = []
+    print(f"\n{'result':<24}{'baseline':>12}{'this run':>12}{'change':>10}")
+    for name, higher_is_better in TRACKED.items():
+        history = [run['results'][name] for run in baseline_runs if run['results'].get(name) is not None]
+        value = results.get(name)
+        if not history or value is None:
+            print(f"{name:<24}{'-':>12}{value if value is not None else '-':>12}")
+            continue
+        baseline = statistics.median(history)
+        change = (value - baseline) / baseline if baseline else 0.0
+        worse = -change if higher_is_better else change
+        flag = '  REGRESSION' if worse > threshold else ''
+        if flag:
+            regressions.append(name)
+        print(f"{name:<24}{baseline:>12}{value:>12}{change:>+10.1%}{flag}")
+    return regressions
+
+
+params = {key: args[key] for key in ('workers', 'concurrency', 'decks', 'games', 'shard_size', 'game_seconds', 'startup_seconds', 'memory_mb', 'pool')}
+results = run_benchmark()
+print(f"{results['games']} games in {results['seconds']}s: {results['games_per_second']} games/s, "
+      f"claim {results['claim_mean_ms']}ms mean / {results['claim_p95_ms']}ms p95 over {results['claims']} claims, "
+      f"peak RSS {results['worker_rss_mb']}MB per worker + {results['simulator_rss_mb']}MB of simulators")
+
+run = {
+    'recorded_on': datetime.now().isoformat(timespec='seconds'),
+    'commit': git_commit(),
+    'host': platform.node(),
+    'cpus': os.cpu_count(),
+    'params': params,
+    'results': results,
+}
+# Only runs on the same machine with the same options are comparable
+baseline_runs = [past for past in read_history(args['history'])
+                 if past['host'] == run['host'] and past['cpus'] == run['cpus'] and past['params'] == params][-5:]
+if baseline_runs:
+    print(f"\nBaseline: median of {len(baseline_runs)} earlier run(s), last at {baseline_runs[-1]['commit']}")
+regressions = compare(results, baseline_runs, args['threshold'])
+
+if not args['no_record']:
+    os.makedirs(os.path.dirname(args['history']) or '.', exist_ok=True)
+    with open(args['history'], 'a') as f:
+        f.write(json.dumps(run) + '\n')
+    print(f"\nRecorded run in {args['history']}")
+
+if regressions:
+    print(f"Regressed by more than {args['threshold']:.0%}: {', '.join(regressions)}")
+    sys.exit(1)
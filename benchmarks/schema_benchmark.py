@@ -0,0 +1,168 @@
+import argparse
+import statistics
+import random
+import time
+import uuid
+import io
+import sys
+from pathlib import Path
+from datetime import datetime, timedelta
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from packages.database_tools import connect
+from packages.game_tools import GAME_COLUMNS
+
+"""
+Benchmark the games and decks hot queries before and after
+queries/migrations/005_indexes_turn_arrays.sql on a large synthetic table.
+
+Builds the pre-migration layout (no secondary indexes, turn_counts as JSON) in a
+throwaway schema, times the queries, applies the real migration file and times
+them again. Use a disposable local Postgres.
+"""
+
+parser = argparse.ArgumentParser(description="Benchmark games/decks queries before and after the index migration",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument("-g", "--games", action="store", type=int, help="rows in the games table", default=1000000)
+parser.add_argument("-q", "--queued", action="store", type=int, help="rows still waiting to be claimed", default=5000)
+parser.add_argument("-j", "--job_size", action="store", type=int, help="rows per job", default=500)
+parser.add_argument("-d", "--decks", action="store", type=int, help="decks per format in the decks table", default=500)
+parser.add_argument("-r", "--repeat", action="store", type=int, help="timed runs per query, median is reported", default=20)
+args = vars(parser.parse_args())
+
+FORMATS = ['constructed', 'commander', 'jumpstart']
+DECK_COLUMNS = ['primary_key', 'card_name', 'deck_name', 'set_code', 'quantity', 'uploaded_on', 'tag', 'colour', 'format', 'category']
+
+
+def copy_rows(cur, table, rows, columns, chunk_size=100000):
+    buffer = io.StringIO()
+    for i, row in enumerate(rows, 1):
+        buffer.write('\t'.join(row) + '\n')
+        if i % chunk_size == 0:
+            buffer.seek(0)
+            cur.copy_from(buffer, table, sep='\t', columns=columns)
+            buffer = io.StringIO()
+    buffer.seek(0)
+    cur.copy_from(buffer, table, sep='\t', columns=columns)
+
+
+def game_rows(game_count, queued, job_size, rng):
+    started = datetime.now() - timedelta(days=365)
+    job_id = matchup_id = None
+    for i in range(game_count):
+        if i % job_size == 0:
+            job_id = str(uuid.uuid4())
+        if i % 4 == 0:
+            matchup_id = str(uuid.uuid4())
+        created_on = started + timedelta(seconds=30 * i)
+        finished = i < game_count - queued
+        wins = rng.randint(0, 25)
+        # The old writer stored str() of a Python list in the JSON column
+        turn_counts = str([rng.randint(4, 16) for _ in range(25)]) if finished else '[]'
+        yield [
+            str(uuid.uuid4()), f'Deck {i % 300}', f'Deck {(i * 7 + 1) % 300}', '\\N', '\\N',
+            job_id, '25', str(wins), str(25 - wins), '0', '0', turn_counts,
+            str(uuid.uuid4()) if finished else '\\N', 'constructed', created_on.isoformat(),
+            (created_on + timedelta(minutes=5)).isoformat() if finished else '\\N',
+            '25' if finished else '0', matchup_id, '\\N',
+        ]
+
+
+def deck_rows(deck_count, rng):
+    uploaded_on = datetime.now().isoformat()
+    for format in FORMATS:
+        for deck in range(deck_count):
+            for card in range(60):
+                yield [str(uuid.uuid4()), f'Card {rng.randint(0, 20000)}', f'Deck {deck}', 'SET', '1',
+                       uploaded_on, '\\N', '\\N', format, '\\N']
+
+
+def setup_schema(schema):
+    conn, cur = connect()
+    cur.execute(f'CREATE SCHEMA "{schema}"')
+    cur.execute((REPO_ROOT / 'queries' / 'create_tables.sql').read_text().replace('"public".', f'"{schema}".'))
+    cur.execute(f'SET search_path TO "{schema}"')
+
+    # Back to the layout before migration 005
+    cur.execute('DROP INDEX "IX_games_queue", "IX_games_job_id", "IX_games_matchup_id", "IX_decks_format_deck_name"')
+    cur.execute('ALTER TABLE games ALTER COLUMN turn_counts DROP DEFAULT, '
+                'ALTER COLUMN turn_counts TYPE JSON USING to_json(turn_counts)')
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    copy_rows(cur, 'games', game_rows(args['games'], args['queued'], args['job_size'], rng), GAME_COLUMNS)
+    copy_rows(cur, 'decks', deck_rows(args['decks'], rng), DECK_COLUMNS)
+    cur.execute('ANALYZE')
+    conn.commit()
+    print(f"Loaded {args['games']} games and {args['decks'] * 60 * len(FORMATS)} deck rows "
+          f"in {time.perf_counter() - start:.1f}s")
+    return conn, cur
+
+
+def sample_keys(cur):
+    cur.execute("SELECT job_id, matchup_id FROM games TABLESAMPLE SYSTEM (1) LIMIT %s", (args['repeat'],))
+    return cur.fetchall()
+
+
+def measure(cur, conn, keys):
+    queries = {
+        'claim 8 queued games': (
+            "SELECT primary_key FROM games WHERE device_id IS NULL AND finished_on IS NULL "
+            "ORDER BY created_on LIMIT 8 FOR UPDATE SKIP LOCKED",
+            lambda i: ()),
+        'load one job with turn counts': (
+            "SELECT deck1_name, deck2_name, deck1_wins, deck2_wins, games_played, turn_counts FROM games WHERE job_id = %s",
+            lambda i: (keys[i % len(keys)][0],)),
+        'merge one matchup\'s shards': (
+            "SELECT sum(deck1_wins), sum(games_played) FROM games WHERE matchup_id = %s",
+            lambda i: (keys[i % len(keys)][1],)),
+        'deck versions for a game': (
+            "SELECT deck_name, MAX(uploaded_on) FROM decks WHERE format = %s AND deck_name = ANY(%s) GROUP BY deck_name",
+            lambda i: ('commander', [f'Deck {i}', f'Deck {i + 1}', f'Deck {i + 2}', f'Deck {i + 3}'])),
+        'deck names in a format': (
+            "SELECT DISTINCT deck_name FROM decks WHERE format = %s ORDER BY deck_name",
+            lambda i: (FORMATS[i % len(FORMATS)],)),
+    }
+    timings = {}
+    for label, (query, params) in queries.items():
+        samples = []
+        for i in range(args['repeat']):
+            start = time.perf_counter()
+            cur.execute(query, params(i))
+            cur.fetchall()
+            samples.append(time.perf_counter() - start)
+            conn.rollback()
+        timings[label] = statistics.median(samples) * 1000
+
+    cur.execute("SELECT pg_total_relation_size('games'), avg(pg_column_size(turn_counts)) FROM games")
+    table_bytes, turn_bytes = cur.fetchone()
+    return timings, table_bytes, float(turn_bytes)
+
+
+schema = f"schema_bench_{uuid.uuid4().hex[:8]}"
+conn, cur = setup_schema(schema)
+try:
+    keys = sample_keys(cur)
+    before = measure(cur, conn, keys)
+
+    start = time.perf_counter()
+    cur.execute((REPO_ROOT / 'queries' / 'migrations' / '005_indexes_turn_arrays.sql').read_text()
+                .replace('"public".', f'"{schema}".'))
+    cur.execute('ANALYZE')
+    conn.commit()
+    print(f"Migration took {time.perf_counter() - start:.1f}s")
+    after = measure(cur, conn, keys)
+
+    print(f"\n{'query':<32}{'before':>12}{'after':>12}")
+    for label in before[0]:
+        print(f"{label:<32}{before[0][label]:>10.2f}ms{after[0][label]:>10.2f}ms  ({before[0][label] / after[0][label]:.0f}x)")
+    print(f"{'games table size':<32}{before[1] / 1e6:>10.0f}MB{after[1] / 1e6:>10.0f}MB")
+    print(f"{'turn_counts bytes per row':<32}{before[2]:>12.0f}{after[2]:>12.0f}")
+finally:
+    conn.rollback()
+    cur.execute(f'DROP SCHEMA "{schema}" CASCADE')
+    conn.commit()
+    conn.close()
@@ -0,0 +1,81 @@
+import argparse
+import itertools
+import random
+import time
+import sys
+from collections import defaultdict
+from pathlib import Path
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from packages.stats_tools import deck_stats, pair_stats, turn_distribution
+
+"""
+Benchmark job analytics on a synthetic round robin: the notebook's iterrows
+aggregation against the vectorized deck, pair and turn statistics.
+
+Rows are built in memory in the shape fetch_job_games returns, so no database is needed.
+"""
+
+parser = argparse.ArgumentParser(description="Benchmark job analytics",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument("-g", "--games", action="store", type=int, help="total games in the job", default=1000000)
+parser.add_argument("-d", "--decks", action="store", type=int, help="decks in the round robin", default=60)
+parser.add_argument("-s", "--shard_size", action="store", type=int, help="games per row", default=25)
+args = vars(parser.parse_args())
+
+
+def synthetic_job(game_count, deck_count, shard_size, seed=0):
+    rng = random.Random(seed)
+    strength = {f'Deck {i}': rng.random() for i in range(deck_count)}
+    matchups = itertools.cycle(itertools.combinations(strength, 2))
+    rows = []
+    for _ in range(game_count // shard_size):
+        deck1, deck2 = next(matchups)
+        p = strength[deck1] / (strength[deck1] + strength[deck2])
+        wins = sum(rng.random() < p for _ in range(shard_size))
+        rows.append({
+            'format': 'constructed',
+            'game_count': shard_size,
+            'games_played': shard_size,
+            'turn_counts': [rng.randint(4, 16) for _ in range(shard_size)],
+            'deck1_name': deck1, 'deck2_name': deck2, 'deck3_name': None, 'deck4_name': None,
+            'deck1_wins': wins, 'deck2_wins': shard_size - wins, 'deck3_wins': 0, 'deck4_wins': 0,
+        })
+    return pd.DataFrame(rows)
+
+
+def notebook_deck_stats(df):
+    # Combination win rates as testing.ipynb computed them, kept as the reference
+    stats = defaultdict(lambda: {'games': 0, 'wins': 0})
+    for _, row in df.iterrows():
+        for i in range(1, 5):
+            if row[f'deck{i}_name']:
+                stats[row[f'deck{i}_name']]['games'] += row['game_count']
+                stats[row[f'deck{i}_name']]['wins'] += row[f'deck{i}_wins']
+    return pd.DataFrame([{'deck': k, 'games': v['games'], 'wins': v['wins']} for k, v in stats.items()])
+
+
+def timed(label, function, *function_args):
+    start = time.perf_counter()
+    result = function(*function_args)
+    print(f"  {label}: {(time.perf_counter() - start) * 1000:.0f}ms")
+    return result
+
+
+games = synthetic_job(args['games'], args['decks'], args['shard_size'])
+print(f"{len(games)} rows, {games['games_played'].sum()} games, {args['decks']} decks")
+
+reference = timed("notebook iterrows", notebook_deck_stats, games)
+stats = timed("deck_stats", deck_stats, games)
+timed("pair_stats", pair_stats, games)
+timed("turn_distribution", turn_distribution, games)
+
+merged = reference.merge(stats, on='deck', suffixes=('_notebook', ''))
+assert (merged['games_notebook'] == merged['games']).all() and (merged['wins_notebook'] == merged['wins']).all(), \
+    "deck_stats disagrees with the notebook aggregation"
+print(f"Top deck: {stats.iloc[0]['deck']} {stats.iloc[0]['win_rate']:.1%} "
+      f"({stats.iloc[0]['ci_low']:.1%}-{stats.iloc[0]['ci_high']:.1%}), median {stats.iloc[0]['median_turns']} turns")
@@ -0,0 +1,121 @@
+import pandas as pd
+import threading
+import pickle
+import time
+import uuid
+import os
+import logging
+
+# Columns of the decks table, kept when no deck matches
+DECK_COLUMNS = ['primary_key', 'card_name', 'deck_name', 'set_code', 'quantity', 'uploaded_on',
+                'tag', 'colour', 'format', 'category', 'content_hash', 'revision']
+
+class DeckCache:
+    """
+    Worker-local cache of deck card lists, keyed by format and deck name
+
+    Every deck is stored with the MAX(uploaded_on) of its rows. A sync asks the
+    database for those versions only and re-fetches the cards of decks whose
+    version changed, so repeated games over the same decks read almost nothing.
+    Formats are persisted to <cache_path>/<format>.pkl so a restarted worker
+    starts warm.
+    """
+
+    def __init__(self, cache_path='output/decks/cache', ttl=None):
+        self.cache_path = cache_path
+        self.ttl = float(os.environ.get("DECK_CACHE_TTL", 10)) if ttl is None else ttl
+        self.decks = {}
+        self.synced_on = {}
+        self.lock = threading.Lock()
+
+    def _file(self, format):
+        return os.path.join(self.cache_path, f"{format}.pkl")
+
+    def _load(self, format):
+        if format in self.decks:
+            return self.decks[format]
+
+        self.decks[format] = {}
+        try:
+            with open(self._file(format), 'rb') as f:
+                self.decks[format] = pickle.load(f)
+            logging.info(f"Loaded {len(self.decks[format])} cached {format} decks from disk")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable deck cache {self._file(format)}: {e}")
+        return self.decks[format]
+
+    def _save(self, format):
+        os.makedirs(self.cache_path, exist_ok=True)
+        temp_path = f"{self._file(format)}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(self.decks[format], f)
+        os.replace(temp_path, self._file(format))
+
+    def get_decks(self, cur, format, deck_names=None):
+        """
+        Return the cards for the requested decks, fetching only decks that changed
+
+        Args:
+            cur: Database cursor
+            format (str): Game format
+            deck_names (list, optional): Decks to return. If empty, every deck in the format
+
+        Returns:
+            DataFrame: Rows from the decks table for the requested decks
+        """
+        deck_names = [name for name in (deck_names or []) if name]
+
+        with self.lock:
+            cached = self._load(format)
+            key = (format, tuple(sorted(deck_names)))
+            recently_synced = time.monotonic() - self.synced_on.get(key, float('-inf')) < self.ttl
+
+            if not recently_synced:
+                self._sync(cur, format, deck_names, cached)
+                self.synced_on[key] = time.monotonic()
+
+            wanted = deck_names or list(cached)
+            frames = [cached[name][1] for name in wanted if name in cached]
+
+        if not frames:
+            return pd.DataFrame(columns=DECK_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def _sync(self, cur, format, deck_names, cached):
+        query = """
+            SELECT deck_name, MAX(uploaded_on)
+            FROM decks
+            WHERE format = %s
+            """
+        params = [format]
+        if deck_names:
+            query += "\nAND deck_name = ANY(%s)"
+            params.append(deck_names)
+        cur.execute(query + "\nGROUP BY deck_name", params)
+        versions = dict(cur.fetchall())
+
+        stale = [name for name, version in versions.items()
+                 if name not in cached or cached[name][0] != version]
+        removed = [name for name in (deck_names or list(cached)) if name in cached and name not in versions]
+
+        for name in removed:
+            del cached[name]
+
+        if stale:
+            logging.info(f"Fetching {len(stale)} changed {format} deck(s) from database")
+            cur.execute("""
+                SELECT * FROM decks
+                WHERE format = %s
+                AND deck_name = ANY(%s)
+                """, (format, stale))
+            rows = cur.fetchall()
+            decks_df = pd.DataFrame(rows, columns=[desc[0] for desc in cur.description])
+            for name, deck in decks_df.groupby('deck_name', sort=False):
+                cached[name] = (versions[name], deck.reset_index(drop=True))
+        else:
+            logging.info(f"All {len(versions)} requested {format} deck(s) are up to date in cache")
+
+        if stale or removed:
+            self._save(format)
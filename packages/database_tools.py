@@ -1,22 +1,176 @@
-
 import psycopg2
+import psycopg2.pool
 from dotenv import load_dotenv
+import contextlib
+import threading
+import logging
+import time
 import os
+from packages import metrics_tools
 
-def connect():
-    # Update cards table in database
+
+DB_SECONDS = metrics_tools.histogram(
+    'db_transaction_seconds', 'Time from borrowing a pooled connection to commit or rollback', labels=('operation',))
+DB_POOL_WAIT_SECONDS = metrics_tools.histogram(
+    'db_pool_wait_seconds', 'Time spent waiting for a free pooled connection')
+
+
+def _connection_params(**kwargs):
     load_dotenv()
-    conn = psycopg2.connect(
+    params = dict(
         dbname=os.getenv("PG_NAME"),
         user=os.getenv("PG_USER"),
         password=os.getenv("PG_PASSWORD"),
         host=os.getenv("PG_HOST", "localhost"),
-        port=os.getenv("PG_PORT", "5432")
+        port=os.getenv("PG_PORT", "5432"),
     )
+    params.update(kwargs)
+    return params
+
+
+def connect(**kwargs):
+    # Update cards table in database
+    # Extra keyword arguments (e.g. options) are passed through to psycopg2.connect
+    conn = psycopg2.connect(**_connection_params(**kwargs))
     cur = conn.cursor()
     # print("Connected to PostgreSQL")
     return conn, cur
 
-conn, cur = connect()
 
-__all__ = ["conn", "cur"]
\ No newline at end of file
+class ConnectionPool:
+    """
+    Thread-safe connection pool that blocks while every connection is in use
+    (psycopg2's own pool raises instead) and records how long callers waited
+    """
+
+    def __init__(self, size, **kwargs):
+        self.size = size
+        self.pool = psycopg2.pool.ThreadedConnectionPool(1, size, **_connection_params(**kwargs))
+        self.slots = threading.BoundedSemaphore(size)
+        self.stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.in_use = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def getconn(self):
+        start = time.perf_counter()
+        self.slots.acquire()
+        waited = time.perf_counter() - start
+        DB_POOL_WAIT_SECONDS.observe(waited)
+
+        with self.stats_lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        if waited > 1:
+            logging.warning(f"Waited {waited:.2f}s for a database connection ({self.size} in pool)")
+
+        try:
+            conn = self.pool.getconn()
+            if conn.closed:
+                self.pool.putconn(conn, close=True)
+                conn = self.pool.getconn()
+            return conn
+        except Exception:
+            self._release()
+            raise
+
+    def putconn(self, conn):
+        try:
+            self.pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self._release()
+
+    def _release(self):
+        with self.stats_lock:
+            self.in_use -= 1
+        self.slots.release()
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                'size': self.size,
+                'in_use': self.in_use,
+                'checkouts': self.checkouts,
+                'wait_seconds_total': self.wait_seconds,
+                'wait_seconds_max': self.max_wait_seconds,
+                'wait_seconds_avg': self.wait_seconds / self.checkouts if self.checkouts else 0.0,
+            }
+
+    def close(self):
+        self.pool.closeall()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Return the process-wide connection pool, creating it on first use
+
+    A pool inherited through fork is never reused, since its sockets belong to the parent.
+
+    Returns:
+        ConnectionPool: Shared pool sized by PG_POOL_SIZE (default 10)
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool(int(os.getenv("PG_POOL_SIZE", 10)))
+            _pool_pid = os.getpid()
+            logging.info(f"Created database connection pool with {_pool.size} connections")
+        return _pool
+
+
+@contextlib.contextmanager
+def connection(operation='other'):
+    """
+    Borrow a pooled connection for one unit of work
+
+    Commits when the block finishes, rolls back if it raises, and always hands
+    the connection back to the pool.
+
+    Args:
+        operation (str): Name the block's round trips are timed under in db_transaction_seconds
+
+    Yields:
+        tuple: (conn, cur)
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    cur = conn.cursor()
+    start = time.perf_counter()
+    try:
+        yield conn, cur
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        DB_SECONDS.observe(time.perf_counter() - start, operation=operation)
+        if not cur.closed:
+            cur.close()
+        pool.putconn(conn)
+
+
+def pool_stats():
+    """
+    Pool usage and wait time metrics, empty if the pool has not been created
+    """
+    return _pool.stats() if _pool is not None else {}
+
+
+def close_connections():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = None
+
+
+__all__ = ["connect", "connection", "get_pool", "pool_stats", "close_connections"]
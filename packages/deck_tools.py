@@ -1,7 +1,15 @@
 import pandas as pd
+import numpy as np
+import concurrent.futures
 import itertools
-# import shutil
+import collections
+import hashlib
+import shutil
+import io
+import uuid
 import os
+import re
+from datetime import datetime
 
 
 def generate_decklists(cards_df):
@@ -15,71 +23,154 @@ def generate_decklists(cards_df):
         cards_df (DataFrame): Dataframe containing all combinations of Jumpstart decks
     """
     deck_names = cards_df['deck_name'].unique()
-    deck_combinations = itertools.combinations(deck_names, 2)
-    decks_df = pd.DataFrame()
+    deck_rows = _deck_positions(cards_df)
 
-    for deck1_name, deck2_name in deck_combinations:
-        deck1 = cards_df[cards_df['deck_name'] == deck1_name]
-        deck2 = cards_df[cards_df['deck_name'] == deck2_name]
-        deck = pd.concat([deck1, deck2])
-        deck['deck_name'] = f"{deck1_name} {deck2_name}"
-        decks_df = pd.concat([decks_df, deck])
+    # Collect row positions for every combination, then take them in one go
+    positions = []
+    combined_names = []
+    for deck1_name, deck2_name in itertools.combinations(deck_names, 2):
+        rows = np.concatenate([deck_rows[deck1_name], deck_rows[deck2_name]])
+        positions.append(rows)
+        combined_names.append((f"{deck1_name} {deck2_name}", len(rows)))
+
+    if not positions:
+        return pd.DataFrame()
+
+    decks_df = cards_df.iloc[np.concatenate(positions)].copy()
+    decks_df['deck_name'] = np.repeat(
+        [name for name, _ in combined_names],
+        [length for _, length in combined_names],
+    )
 
     return decks_df
 
-def generate_deck_files(decks_df, output_path="output/decks"):
+
+def iter_decklists(cards_df):
+    """
+    Lazily yields each possible Jumpstart deck (two half decks put together),
+    so every combination never has to be in memory at once
+
+    Args:
+        cards_df (DataFrame): Dataframe containing cards categorized into decks
+
+    Yields:
+        DataFrame: Cards in one combined deck, named "<deck1> <deck2>"
+    """
+    deck_names = cards_df['deck_name'].unique()
+    deck_rows = _deck_positions(cards_df)
+
+    for deck1_name, deck2_name in itertools.combinations(deck_names, 2):
+        deck = cards_df.iloc[np.concatenate([deck_rows[deck1_name], deck_rows[deck2_name]])].copy()
+        deck['deck_name'] = f"{deck1_name} {deck2_name}"
+        yield deck
+
+
+def _deck_positions(cards_df):
+    # Row positions of each deck's cards, found in a single grouping pass
+    deck_rows = collections.defaultdict(lambda: np.empty(0, dtype=np.intp))
+    deck_rows.update(cards_df.groupby('deck_name', sort=False).indices)
+    return deck_rows
+
+def generate_deck_files(decks_df, output_path="output/decks", format=None):
     """
     Creates .dck files for all decks in a decks_df
 
+    Each deck is stored once under its content hash in <output_path>/.store and
+    hard-linked into place, so unchanged decks cost a hash and a stat, and files
+    are swapped in atomically instead of wiped, so concurrent games never see a
+    missing or half-written deck.
+
     Args:
         decks_df (DataFrame): Dataframe containing cards categorized into decks
+        output_path (String): Path to output folder
+        format (String): Forge deck subdirectory under FORGE_DECKS_PATH (e.g. constructed)
+
+    Returns:
+        int: Number of deck files that were new or changed
+    """
+    store_path = os.path.join(output_path, '.store')
+    os.makedirs(store_path, exist_ok=True)
+
+    FORGE_DECKS_PATH = os.environ.get("FORGE_DECKS_PATH")
+    forge_path = None
+    if FORGE_DECKS_PATH:
+        forge_path = os.path.join(FORGE_DECKS_PATH, format) if format else FORGE_DECKS_PATH
+        if not os.path.exists(forge_path):
+            print(f"Warning: FORGE_DECKS_PATH is set but directory does not exist: {forge_path}")
+            forge_path = None
+
+    changed = 0
+    for deck_name, deck in decks_df.groupby('deck_name', sort=False):
+        content = render_deck_file(deck, deck_name).encode()
+        blob = os.path.join(store_path, f"{hashlib.sha1(content).hexdigest()}.dck")
+        if not os.path.exists(blob):
+            _replace_file(blob, content=content)
+
+        targets = [os.path.join(output_path, f"{deck_name}.dck")]
+        if forge_path:
+            targets.append(os.path.join(forge_path, f"{deck_name}.dck"))
+
+        for target in targets:
+            if not _same_deck(blob, target, content):
+                _replace_file(target, source=blob)
+                changed += 1
+
+    if changed:
+        print(f"Updated {changed} deck file(s) in {output_path}" + (f" and {forge_path}" if forge_path else ""))
+
+    return changed
+
+
+def _same_deck(blob, target, content):
+    # A hard link to the blob is the common case, otherwise compare contents
+    try:
+        if os.path.samefile(blob, target):
+            return True
+        with open(target, 'rb') as f:
+            return f.read() == content
+    except FileNotFoundError:
+        return False
+
+
+def _replace_file(target, content=None, source=None):
     """
+    Atomically put a file in place, from bytes or as a hard link to source
+    (copying when source is on another filesystem)
+    """
+    temp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+    try:
+        if source is None:
+            with open(temp_path, 'wb') as f:
+                f.write(content)
+        else:
+            try:
+                os.link(source, temp_path)
+            except OSError:
+                shutil.copyfile(source, temp_path)
+        os.replace(temp_path, target)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def render_deck_file(deck, name='Sample Deck'):
+    """
+    Renders a deck in Forge's .dck format
 
-    os.makedirs(output_path, exist_ok=True)
-    for filename in os.listdir(output_path):
-        file_path = os.path.join(output_path, filename)
-        if os.path.isfile(file_path):
-            os.unlink(file_path)
-
-    deck_names = decks_df['deck_name'].unique()
-
-    for deck_name in deck_names:
-        deck = decks_df[decks_df['deck_name'] == deck_name]
-        generate_deck_file(deck, deck_name, output_path)
-
-    # Copy decks to Forge directory if specified
-    FORGE_DECKS_PATH = os.environ.get("FORGE_DECKS_PATH") + f"\\{format}"
-    if FORGE_DECKS_PATH and os.path.exists(FORGE_DECKS_PATH):
-        print(f"Copying decks to Forge directory: {FORGE_DECKS_PATH}")
-
-        # Wipe the forge deck directory
-        try:
-            for filename in os.listdir(FORGE_DECKS_PATH):
-                dst_file = os.path.join(FORGE_DECKS_PATH, filename)
-                if os.path.isfile(dst_file) and filename.endswith('.dck'):
-                    os.unlink(dst_file)
-                    print(f"Removed old deck: {filename}")
-        except Exception as e:
-            print(f"Error cleaning Forge decks directory: {e}")
-
-        # Copy new decks
-        try:
-            deck_count = 0
-            for filename in os.listdir(output_path):
-                if filename.endswith('.dck'):
-                    src = os.path.join(output_path, filename)
-                    dst = os.path.join(FORGE_DECKS_PATH, filename)
-                    if os.path.isfile(src):
-                        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
-                            fdst.write(fsrc.read())
-                        deck_count += 1
-            print(f"Successfully copied {deck_count} decks to Forge directory")
-        except Exception as e:
-            print(f"Error copying decks to Forge directory: {e}")
-    elif FORGE_DECKS_PATH:
-        print(f"Warning: FORGE_DECKS_PATH is set but directory does not exist: {FORGE_DECKS_PATH}")
-    else:
-        print("FORGE_DECKS_PATH not set, skipping copy to Forge directory")
+    Args:
+        deck (DataFrame): Dataframe containing cards in a deck
+        name (String): Deck name
+
+    Returns:
+        String: .dck file contents
+    """
+    lines = ['[metadata]', f'Name={name}', '[Avatar]', '', '[Main]']
+    for quantity, card_name, set_code in deck[['quantity', 'card_name', 'set_code']].itertuples(index=False):
+        set_code = set_code if set_code else ''
+        lines.append(f"{quantity} {card_name}|{set_code}|1")
+    lines += ['[Sideboard]', '', '[Planes]', '', '[Schemes]', '', '[Conspiracy]', '', '[Dungeon]']
+
+    return '\n'.join(lines)
 
 
 def generate_deck_file(deck, name='Sample Deck', output_path='output/decks'):
@@ -94,19 +185,89 @@ def generate_deck_file(deck, name='Sample Deck', output_path='output/decks'):
     os.makedirs(output_path, exist_ok=True)
 
     with open(os.path.join(output_path, f"{name}.dck"), 'w') as f:
-        f.write('[metadata]\n')
-        f.write(f'Name={name}\n')
-        f.write('[Avatar]\n\n')
-        f.write('[Main]\n')
-        for _, row in deck.iterrows():
-            set_code = row['set_code'] if row['set_code'] else ''
-            f.write(f"{row['quantity']} {row['card_name']}|{set_code}|1\n")
+        f.write(render_deck_file(deck, name))
 
-        f.write('[Sideboard]\n\n')
-        f.write('[Planes]\n\n')
-        f.write('[Schemes]\n\n')
-        f.write('[Conspiracy]\n\n')
-        f.write('[Dungeon]')
+
+# Columns of a deck upload, staged as-is and stamped with hash, revision and time on merge
+UPLOAD_COLUMNS = ['card_name', 'deck_name', 'set_code', 'quantity', 'tag', 'colour', 'format', 'category']
+
+
+def upload_decks(cur, decks_df, uploaded_on=None):
+    """
+    Uploads decks, replacing only those whose cards changed, in the caller's transaction
+
+    Cards are COPYed to a staging table and hashed per deck in the database. A
+    deck whose hash matches its stored one is left alone, so uploading the same
+    list again writes nothing. A changed or new deck has its rows replaced and
+    its revision bumped. Decks missing from the upload are kept.
+
+    Args:
+        cur: Database cursor
+        decks_df (DataFrame): Cards with UPLOAD_COLUMNS
+        uploaded_on (datetime, optional): Time to stamp on changed decks
+
+    Returns:
+        tuple: (changed, unchanged) lists of (format, deck_name, revision)
+    """
+    buffer = io.StringIO()
+    decks_df[UPLOAD_COLUMNS].to_csv(buffer, index=False, header=False, sep='\t', na_rep='\\N')
+    buffer.seek(0)
+
+    cur.execute("""
+        CREATE TEMP TABLE deck_upload (
+          card_name TEXT, deck_name TEXT, set_code TEXT, quantity INTEGER,
+          tag TEXT, colour TEXT, format TEXT, category TEXT
+        ) ON COMMIT DROP
+    """)
+    cur.copy_from(buffer, 'deck_upload', sep='\t', columns=UPLOAD_COLUMNS)
+
+    # Uploads of the same deck take turns, readers are not blocked
+    cur.execute("LOCK TABLE decks IN SHARE ROW EXCLUSIVE MODE")
+    cur.execute("""
+        CREATE TEMP TABLE deck_upload_versions ON COMMIT DROP AS
+        WITH uploaded AS (
+            SELECT format, deck_name, md5(string_agg(card, E'\\n' ORDER BY card)) AS content_hash
+            FROM (
+                SELECT format, deck_name,
+                       concat_ws(E'\\t', card_name, set_code, quantity, tag, colour, category) AS card
+                FROM deck_upload
+            ) AS cards
+            GROUP BY format, deck_name
+        ),
+        stored AS (
+            SELECT DISTINCT ON (d.format, d.deck_name) d.format, d.deck_name, d.content_hash, d.revision
+            FROM decks AS d
+            JOIN uploaded AS u ON u.format = d.format AND u.deck_name = d.deck_name
+            ORDER BY d.format, d.deck_name, d.uploaded_on DESC
+        )
+        SELECT u.format, u.deck_name, u.content_hash,
+               CASE WHEN s.content_hash = u.content_hash THEN s.revision ELSE coalesce(s.revision, 0) + 1 END AS revision,
+               s.content_hash IS NOT DISTINCT FROM u.content_hash AS unchanged
+        FROM uploaded AS u
+        LEFT JOIN stored AS s ON s.format = u.format AND s.deck_name = u.deck_name
+    """)
+    cur.execute("""
+        DELETE FROM decks AS d
+        USING deck_upload_versions AS v
+        WHERE NOT v.unchanged
+        AND d.format = v.format
+        AND d.deck_name = v.deck_name
+    """)
+    cur.execute("""
+        INSERT INTO decks (primary_key, card_name, deck_name, set_code, quantity, uploaded_on,
+                           tag, colour, format, category, content_hash, revision)
+        SELECT gen_random_uuid(), c.card_name, c.deck_name, c.set_code, c.quantity, %s,
+               c.tag, c.colour, c.format, c.category, v.content_hash, v.revision
+        FROM deck_upload AS c
+        JOIN deck_upload_versions AS v ON v.format = c.format AND v.deck_name = c.deck_name
+        WHERE NOT v.unchanged
+    """, (uploaded_on or datetime.now(),))
+
+    cur.execute("SELECT format, deck_name, revision, unchanged FROM deck_upload_versions ORDER BY format, deck_name")
+    versions = cur.fetchall()
+    changed = [(format, deck_name, revision) for format, deck_name, revision, unchanged in versions if not unchanged]
+    unchanged = [(format, deck_name, revision) for format, deck_name, revision, unchanged in versions if unchanged]
+    return changed, unchanged
 
 
 def add_lands(cards_df):
@@ -119,7 +280,6 @@ def add_lands(cards_df):
     Returns:
         DataFrame: Dataframe containing cards categorized into decks, with added lands
     """
-    deck_names = cards_df['deck_name'].unique()
     lands = {
         'W': [
             {
@@ -203,18 +363,20 @@ def add_lands(cards_df):
         ],
     }
 
-    for deck in deck_names:
-        deck_df = cards_df[cards_df['deck_name'] == deck]
-        colour = deck_df['colour'].iloc[0]
-
-        if deck_df[deck_df['card_name'].isin(['Plains', 'Island', 'Swamp', 'Mountain', 'Forest'])].empty:
-            lands_df = pd.DataFrame.from_dict(lands[colour])
-            lands_df['deck_name'] = deck
-
-            cards_df = pd.concat([cards_df, lands_df])
+    # Decks are checked in one pass and all their lands are added with a single concat
+    colours = cards_df.groupby('deck_name', sort=False)['colour'].first()
+    has_basics = cards_df['card_name'].isin(['Plains', 'Island', 'Swamp', 'Mountain', 'Forest']) \
+        .groupby(cards_df['deck_name'], sort=False).any()
+    missing = colours[~has_basics.reindex(colours.index, fill_value=False)]
+    if missing.empty:
+        return cards_df
 
+    land_rows = [(index, {**land, 'deck_name': deck})
+                 for deck, colour in missing.items()
+                 for index, land in enumerate(lands[colour])]
+    lands_df = pd.DataFrame([row for _, row in land_rows], index=[index for index, _ in land_rows])
 
-    return cards_df
+    return pd.concat([cards_df, lands_df])
 
 
 def parse_card(card, format):
@@ -290,6 +452,62 @@ def parse_card(card, format):
         return card_dict
 
 
+# Archidekt export lines in the shape most cards take, parsed a whole column at a time:
+#   "1x Angelic Page (jmp) [W - Angelic] ^Creature,#7ef553^"   (jumpstart)
+#   "4 Boomerang Basics"  or  "4x Boomerang Basics (dsk)"      (other formats)
+# Lines are whitespace-normalised first. Anything the patterns do not match
+# exactly goes through parse_card, so both paths always give the same result.
+JUMPSTART_PATTERN = re.compile(
+    r'^(?P<quantity>[^\sx]*)\S* (?P<card_name>[^()\[\]]+?) \((?P<set_code>[^\s()]+)\)'
+    r' \[(?P<colour>[^\s\[\]-][^\s\[\]]*) - (?P<deck_name>(?:(?! - )[^\[\]])+)\](?: (?P<tag>.+))?$'
+)
+CARD_PATTERN = re.compile(
+    r'^(?P<quantity>[^\sx]*)\S* (?P<card_name>[^()]+?)(?: \((?P<set_code>[^\s()]+)\)(?: .*)?)?$'
+)
+CARD_COLUMNS = ['quantity', 'card_name', 'colour', 'set_code', 'deck_name', 'tag']
+
+
+def parse_cards(cards, format):
+    """
+    Parses card lines from input CSV into a DataFrame, same as calling parse_card on each line
+
+    Args:
+        cards (List): List of card lines from CSV
+        format (String): Game format, jumpstart lines also carry deck, colour and tag
+
+    Returns:
+        DataFrame: Parsed cards, one row per line
+    """
+    lines = pd.Series(list(cards))
+    if lines.empty:
+        return pd.DataFrame(columns=CARD_COLUMNS)
+    normalised = lines.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+    if format == 'jumpstart':
+        cards_df = normalised.str.extract(JUMPSTART_PATTERN)
+        # Only the last word of the tag counts, up to its first comma
+        cards_df['tag'] = cards_df['tag'].str.replace(r'^.* |,.*$', '', regex=True).str.strip('^')
+        matched = cards_df['card_name'].notna()
+        cards_df['tag'] = cards_df['tag'].fillna('')
+    else:
+        cards_df = normalised.str.extract(CARD_PATTERN)
+        matched = cards_df['card_name'].notna()
+        cards_df['set_code'] = cards_df['set_code'].fillna('')
+        cards_df['colour'] = cards_df['deck_name'] = cards_df['tag'] = ''
+    cards_df['set_code'] = cards_df['set_code'].str.upper()
+    cards_df = cards_df[CARD_COLUMNS]
+
+    for column in CARD_COLUMNS:
+        cards_df[column] = cards_df[column].str.strip().str.replace('/', '', regex=False)
+
+    if not matched.all():
+        fallback = pd.DataFrame.from_dict([parse_card(card, format) for card in lines[~matched]])
+        fallback.index = lines.index[~matched]
+        cards_df.loc[~matched] = fallback[CARD_COLUMNS]
+
+    return cards_df
+
+
 def parse_decks(cards, format):
     """
     Parses an input CSV
@@ -300,11 +518,50 @@ def parse_decks(cards, format):
     Returns:
         DataFrame: All cards processed
     """
-    card_list = [parse_card(card, format) for card in cards]
-    cards_df = pd.DataFrame.from_dict(card_list)
+    cards_df = parse_cards(cards, format)
 
     if format == 'jumpstart':
         cards_df = add_lands(cards_df)
         assert len(cards_df['deck_name'].unique()) == cards_df['quantity'].astype(int).sum() // 20, "Deck count does not match expected value (cards/20)"
 
-    return cards_df
\ No newline at end of file
+    return cards_df
+
+
+def parse_deck_file(path, format):
+    """
+    Reads and parses one input file
+
+    Args:
+        path (String): Path to the input file
+        format (String): Game format
+
+    Returns:
+        DataFrame: All cards processed
+    """
+    try:
+        with open(path, 'r') as file:
+            cards = file.readlines()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Input file '{path}' not found.")
+    return parse_decks(cards, format)
+
+
+def parse_deck_files(paths, format, workers=None):
+    """
+    Parses many input files, spread over worker processes
+
+    Args:
+        paths (List): Paths of the input files
+        format (String): Game format
+        workers (int, optional): Worker processes, defaults to one per CPU. A single file is parsed in-process
+
+    Returns:
+        List: One DataFrame per input file, in the same order as paths
+    """
+    paths = list(paths)
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers <= 1:
+        return [parse_deck_file(path, format) for path in paths]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(parse_deck_file, paths, itertools.repeat(format)))
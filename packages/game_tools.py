@@ -1,11 +1,51 @@
 import pandas as pd
 import subprocess
 from datetime import datetime
+import itertools
+import random
+import math
 import uuid
+import collections
+import contextlib
+import threading
+import gzip
+import re
+import shlex
 import os
 import io
 import logging
-from packages.database_tools import conn, cur
+import time
+from packages.database_tools import connection
+from packages.simulator_tools import get_pool, ForgePoolError, FORGE_FIRST_GAME_SECONDS
+from packages.stats_tools import deck_stats
+from packages.result_tools import update_summaries, SUMMARY_COLUMNS
+
+
+# Workers LISTEN on this channel so queued games start without waiting for a poll
+GAMES_CHANNEL = 'games_queued'
+
+
+class EarlyStop(Exception):
+    """Raised from a GameOutputParser callback to stop the simulator once enough games are in"""
+
+
+class LeaseLost(Exception):
+    """Raised from a GameOutputParser callback to stop a game whose row was finished or claimed by another device"""
+
+
+class SimulatorFailed(Exception):
+    """Raised when the simulator exits with an error before playing every game it was asked for"""
+
+
+def notify_games_queued(cur, job_id):
+    """
+    Wake listening workers once the current transaction commits
+
+    Args:
+        cur: Cursor inside the transaction that queued the games
+        job_id (str): Job the games were queued under, sent as the payload
+    """
+    cur.execute("SELECT pg_notify(%s, %s)", (GAMES_CHANNEL, str(job_id)))
 
 
 def fetch_decks(format):
@@ -13,13 +53,15 @@ def fetch_decks(format):
     Retrieve unique deck names from database for the specified format
     '''
 
-    cur.execute(
-        f"""SELECT DISTINCT deck_name
-        FROM decks
-        WHERE format = '{format}'
-        ORDER BY deck_name ASC;""",
-    )
-    deck_names = [row[0] for row in cur.fetchall()]
+    with connection() as (conn, cur):
+        cur.execute(
+            """SELECT DISTINCT deck_name
+            FROM decks
+            WHERE format = %s
+            ORDER BY deck_name ASC;""",
+            (format,),
+        )
+        deck_names = [row[0] for row in cur.fetchall()]
 
     return deck_names
 
@@ -27,7 +69,9 @@ def fetch_decks(format):
 def create_game(decks,
                 format='constructed',
                 num_games=1,
-                print_decks=False):
+                print_decks=False,
+                shard_size=None,
+                early_stop=None):
 
     # Ensure all variables have valid values
     valid_formats = ['constructed', 'commander', 'jumpstart']
@@ -40,9 +84,7 @@ def create_game(decks,
     # Print decks if argument is true
     if print_decks == True:
         print(deck_names)
-        cur.close()
-        conn.close()
-        quit()
+        return
 
     # Check decks against deck_names
     if decks == 'all':
@@ -54,48 +96,732 @@ def create_game(decks,
             raise ValueError(f"Deck(s) not found: {', '.join(missing_decks)}, run -p without -d to see all valid decks for format -f")
 
     if format == 'commander' or format == 'jumpstart':
-        player_count = 4
         assert len(selected_decks) == 4, f"{format} games require four decks, to be paired as two half decks"
     else:
-        player_count = 2
         assert len(selected_decks) == 2, f"{format} games require two decks"
 
-    # Assign deck names
-    player_dict = {}
-    for i in range(player_count):
-        player_dict[f'deck{i+1}_name'] = selected_decks[i]
-    # Fill remaining with None if less than 4 players
-    for i in range(player_count, 4):
-        player_dict[f'deck{i+1}_name'] = None
-
-    games_df = pd.DataFrame([player_dict])
-
-    games_df.insert(0, 'primary_key', [str(uuid.uuid4()) for _ in range(len(games_df))])
-    games_df['job_id'] = str(uuid.uuid4())
-    games_df['game_count'] = num_games
-    games_df['deck1_wins'] = [0] * len(games_df)
-    games_df['deck2_wins'] = [0] * len(games_df)
-    games_df['deck3_wins'] = [0] * len(games_df)
-    games_df['deck4_wins'] = [0] * len(games_df)
-    games_df['turn_counts'] = [[]] * len(games_df)
-    games_df['device_id'] = [None] * len(games_df)
-    games_df['format'] = format
-    games_df['created_on'] = datetime.now().isoformat()
-    games_df['finished_on'] = [None] * len(games_df)
-
-    print(games_df.head())
-
-    # Prepare a CSV buffer from the DataFrame
-    csv_buffer = io.StringIO()
-    games_df.to_csv(csv_buffer, index=False, header=False, sep='\t', na_rep='\\N')
-    csv_buffer.seek(0)
-
-    cur.copy_from(csv_buffer, 'games', sep='\t')
+    # Fill remaining seats with None if less than 4 players
+    matchup = tuple(selected_decks) + (None,) * (4 - len(selected_decks))
+
+    with connection() as (conn, cur):
+        job_id, game_rows = queue_games(cur, [matchup], format, num_games, shard_size=shard_size, early_stop=early_stop)
+    print(f"Successfully uploaded {game_rows} game row(s) to database under job {job_id}")
+
+    return job_id
+
+
+GAME_COLUMNS = [
+    'primary_key',
+    'deck1_name',
+    'deck2_name',
+    'deck3_name',
+    'deck4_name',
+    'job_id',
+    'game_count',
+    'deck1_wins',
+    'deck2_wins',
+    'deck3_wins',
+    'deck4_wins',
+    'turn_counts',
+    'device_id',
+    'format',
+    'created_on',
+    'finished_on',
+    'games_played',
+    'matchup_id',
+    'early_stop_confidence',
+]
+
+
+def _copy_value(value):
+    """
+    Format a value for COPY's text format
+    """
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+class _RowStream(io.TextIOBase):
+    """
+    File-like object that renders rows for copy_from as they are read,
+    so queuing a large tournament never holds every row in memory
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.buffer = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line
+        if size < 0:
+            size = len(self.buffer)
+        chunk, self.buffer = self.buffer[:size], self.buffer[size:]
+        return chunk
+
+    def readline(self, size=-1):
+        if not self.buffer:
+            self.buffer = next(self.lines, '')
+        line, self.buffer = self.buffer, ''
+        return line
+
+
+def shard_counts(num_games, shard_size=None):
+    """
+    Split a matchup's games into shards of at most shard_size games
+
+    Args:
+        num_games (int): Games requested for the matchup
+        shard_size (int, optional): Largest shard, no splitting if not set
+
+    Returns:
+        list: Game count of each shard
+    """
+    if not shard_size or num_games <= shard_size:
+        return [num_games]
+    full_shards, remainder = divmod(num_games, shard_size)
+    return [shard_size] * full_shards + ([remainder] if remainder else [])
+
+
+def queue_games(cur, matchups, format, num_games=1, job_id=None, shard_size=None, early_stop=None):
+    """
+    Stream matchups into the games table with a single COPY
+
+    Matchups with more than shard_size games are split into several rows that
+    share a matchup_id, so different cores and workers can run them in parallel.
+    The caller commits, which also delivers the queue notification.
+
+    Args:
+        cur: Database cursor
+        matchups (iterable): Tuples of four deck names (None for empty seats)
+        format (str): Game format
+        num_games (int): Games to run per matchup
+        job_id (str, optional): Job to queue under, a new job if not given
+        shard_size (int, optional): Most games in one row
+        early_stop (float, optional): Stop a matchup once its winner is clear at this confidence
+
+    Returns:
+        tuple: (job_id, number of rows queued)
+    """
+    job_id = job_id or str(uuid.uuid4())
+    created_on = datetime.now().isoformat()
+    shards = shard_counts(num_games, shard_size)
+    row_count = 0
+    game_count = 0
+
+    def rows():
+        nonlocal row_count, game_count
+        for matchup in matchups:
+            game_count += sum(shards)
+            matchup_id = str(uuid.uuid4())
+            for shard_games in shards:
+                row_count += 1
+                values = [str(uuid.uuid4()), *matchup, job_id, shard_games, 0, 0, 0, 0, '{}', None, format, created_on, None, 0, matchup_id, early_stop]
+                yield '\t'.join(_copy_value(value) for value in values) + '\n'
+
+    cur.copy_from(_RowStream(rows()), 'games', sep='\t', columns=GAME_COLUMNS)
+
+    # Running totals for progress queries, added to when Swiss rounds extend a job
+    cur.execute("""
+        INSERT INTO job_stats (job_id, format, rows_total, game_count, created_on)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (job_id) DO UPDATE
+        SET rows_total = job_stats.rows_total + EXCLUDED.rows_total,
+            game_count = job_stats.game_count + EXCLUDED.game_count
+    """, (job_id, format, row_count, game_count, created_on))
+    notify_games_queued(cur, job_id)
+
+    return job_id, row_count
+
+
+def tournament_entrants(deck_names, format):
+    """
+    Build tournament entrants from deck names
+
+    Jumpstart entrants are pairs of half decks, other formats play decks as they are.
+
+    Args:
+        deck_names (list): Deck names in the format
+        format (str): Game format
+
+    Returns:
+        list: Tuples of deck names making up each entrant
+    """
+    if format == 'jumpstart':
+        return list(itertools.combinations(deck_names, 2))
+    return [(deck_name,) for deck_name in deck_names]
+
+
+def _seats(format):
+    # Entrants per game: commander pods seat four, jumpstart and constructed are one on one
+    return 4 if format == 'commander' else 2
+
+
+def _disjoint(entrants):
+    decks = [deck for entrant in entrants for deck in entrant]
+    return len(decks) == len(set(decks))
+
+
+def _matchup(entrants):
+    decks = tuple(deck for entrant in entrants for deck in entrant)
+    return decks + (None,) * (4 - len(decks))
+
+
+def matchup_count(entrants, format):
+    """
+    Number of matchups in the round robin of entrants, counting only groups that share no deck
+
+    Args:
+        entrants (list): Entrants from tournament_entrants
+        format (str): Game format
+
+    Returns:
+        int: Matchups round_robin would yield
+    """
+    seats = _seats(format)
+    decks = {deck for entrant in entrants for deck in entrant}
+    if all(len(entrant) == 1 for entrant in entrants) and len(decks) == len(entrants):
+        return math.comb(len(entrants), seats)
+    if (seats == 2 and all(len(set(entrant)) == 2 for entrant in entrants)
+            and len(set(map(frozenset, entrants))) == len(entrants) == math.comb(len(decks), 2)):
+        # Every pair of half decks: choose four decks, then one of the three ways to split them
+        return math.comb(len(decks), 4) * 3
+    return sum(1 for _ in round_robin(entrants, format))
+
+
+def round_robin(entrants, format):
+    """
+    Yield every pairing (or pod, for commander) of entrants exactly once
+    """
+    for group in itertools.combinations(entrants, _seats(format)):
+        if _disjoint(group):
+            yield _matchup(group)
+
+
+def sample_pairings(entrants, format, sample, seed=None):
+    """
+    Yield a uniform random subset of the round robin without enumerating all of it
+
+    Args:
+        entrants (list): Entrants from tournament_entrants
+        format (str): Game format
+        sample (int): Number of matchups to draw
+        seed (int, optional): Random seed for a reproducible schedule
+    """
+    rng = random.Random(seed)
+    seats = _seats(format)
+    total = matchup_count(entrants, format)
+
+    # Dense samples are cheaper to draw from the full schedule than by rejection
+    if sample * 2 >= total:
+        matchups = list(round_robin(entrants, format))
+        if sample > len(matchups):
+            raise ValueError(f"Requested {sample} matchups but the round robin only has {len(matchups)}")
+        yield from rng.sample(matchups, sample)
+        return
+
+    seen = set()
+    while len(seen) < sample:
+        group = tuple(sorted(rng.sample(range(len(entrants)), seats)))
+        if group in seen or not _disjoint([entrants[i] for i in group]):
+            continue
+        seen.add(group)
+        yield _matchup([entrants[i] for i in group])
+
+
+def swiss_pairings(entrants, format, standings=None, played=None, seed=None, byes=None):
+    """
+    Yield one Swiss round: entrants sorted by points and grouped with neighbours,
+    avoiding rematches where possible. Leftover entrants sit the round out,
+    taken from the bottom of the standings among those that have not sat out yet.
+
+    Args:
+        entrants (list): Entrants from tournament_entrants
+        format (str): Game format
+        standings (dict, optional): Points per entrant from previous rounds
+        played (set, optional): frozensets of entrants that have already met
+        seed (int, optional): Random seed used to break ties
+        byes (set, optional): Entrants that sat out an earlier round
+    """
+    rng = random.Random(seed)
+    standings = standings or {}
+    played = played or set()
+    byes = byes or set()
+    seats = _seats(format)
+
+    order = sorted(entrants, key=lambda entrant: (-standings.get(entrant, 0), rng.random()))
+    # Entrants that already sat out are only left over again once everyone has
+    sitting_out = sorted(order, key=lambda entrant: entrant not in byes)[len(order) - len(order) % seats:]
+    for entrant in sitting_out:
+        logging.info(f"{entrant} sits out this round")
+        order.remove(entrant)
+    while len(order) >= seats:
+        group = [order.pop(0)]
+        # First pass avoids rematches, second pass accepts them rather than leave a seat empty
+        for allow_rematch in (False, True):
+            for candidate in list(order):
+                if len(group) == seats:
+                    break
+                if not _disjoint(group + [candidate]):
+                    continue
+                if not allow_rematch and any(frozenset((candidate, opponent)) in played for opponent in group):
+                    continue
+                group.append(candidate)
+                order.remove(candidate)
+        if len(group) == seats:
+            yield _matchup(group)
+        else:
+            logging.info(f"No opponents left for {group}, sitting out this round")
+
+
+def tournament_standings(rows, format, entrants=()):
+    """
+    Points, previous opponents and byes of a tournament's entrants from its game rows
+
+    Args:
+        rows (list): (matchup_id, deck1_name..deck4_name, deck1_wins..deck4_wins) per game row
+        format (str): Game format
+        entrants (list, optional): Every entrant of the tournament, so those that sat
+            out a round are kept even without games
+
+    Returns:
+        tuple: (standings dict, played set, entrants list, byes set)
+    """
+    standings = {tuple(entrant): 0 for entrant in entrants}
+    played = set()
+    matchups = collections.defaultdict(set)
+    for row in rows:
+        matchup_id, names, wins = row[0], row[1:5], row[5:]
+        if format == 'jumpstart':
+            seated = [(names[0], names[1]), (names[2], names[3])]
+        else:
+            seated = [(name,) for name in names if name]
+
+        for entrant, entrant_wins in zip(seated, wins):
+            standings[entrant] = standings.get(entrant, 0) + (entrant_wins or 0)
+            # Shards of one matchup share its matchup_id, older rows have none
+            matchups[entrant].add(matchup_id or frozenset(seated))
+        for a, b in itertools.combinations(seated, 2):
+            played.add(frozenset((a, b)))
+
+    # One matchup per round, so an entrant with fewer than the most has sat out
+    rounds = max((len(entrant_matchups) for entrant_matchups in matchups.values()), default=0)
+    byes = {entrant for entrant in standings if len(matchups[entrant]) < rounds}
+    return standings, played, list(standings), byes
+
+
+def fetch_standings(job_id, format):
+    """
+    Load points, previous opponents and byes for a tournament job from its games
+
+    Returns:
+        tuple: (standings dict, played set, entrants list, byes set)
+    """
+    with connection() as (conn, cur):
+        cur.execute("""
+            SELECT matchup_id, deck1_name, deck2_name, deck3_name, deck4_name,
+                   deck1_wins, deck2_wins, deck3_wins, deck4_wins
+            FROM games
+            WHERE job_id = %s
+        """, (job_id,))
+        rows = cur.fetchall()
+        cur.execute("SELECT deck_names FROM tournament_entrants WHERE job_id = %s", (job_id,))
+        entrants = [deck_names for deck_names, in cur.fetchall()]
+
+    return tournament_standings(rows, format, entrants)
+
+
+def save_entrants(cur, job_id, entrants):
+    """
+    Record every entrant of a Swiss tournament, so later rounds also pair those sitting out
+
+    Args:
+        cur: Database cursor
+        job_id (str): Tournament job
+        entrants (list): Entrants from tournament_entrants
+    """
+    cur.executemany("""
+        INSERT INTO tournament_entrants (job_id, deck_names)
+        VALUES (%s, %s)
+        ON CONFLICT DO NOTHING
+    """, [(job_id, list(entrant)) for entrant in entrants])
+
+
+def create_tournament(decks,
+                      format='constructed',
+                      num_games=1,
+                      mode='round_robin',
+                      sample=None,
+                      seed=None,
+                      job_id=None,
+                      shard_size=None,
+                      early_stop=None):
+    """
+    Queue a whole tournament under one job with a single COPY
+
+    Args:
+        decks (str): Comma separated deck names, or 'all' for every deck in the format
+        format (str): Game format (constructed, commander, jumpstart)
+        num_games (int): Games to run per matchup
+        mode (str): round_robin, sample (random subset of the round robin) or swiss
+        sample (int, optional): Matchups to draw in sample mode, entrants to draw for a first Swiss round
+        seed (int, optional): Random seed for a reproducible schedule
+        job_id (str, optional): Existing Swiss job to queue the next round for
+        shard_size (int, optional): Split matchups with more games than this into shards
+        early_stop (float, optional): Stop each matchup once its winner is clear at this confidence
+
+    Returns:
+        str: Job ID the games were queued under
+    """
+    valid_modes = ['round_robin', 'sample', 'swiss']
+    if mode not in valid_modes:
+        raise ValueError(f"Invalid tournament mode '{mode}'. Valid options are: {', '.join(valid_modes)}.")
+
+    if mode == 'swiss' and job_id:
+        standings, played, entrants, byes = fetch_standings(job_id, format)
+        if not entrants:
+            raise ValueError(f"No games found for job {job_id}")
+        matchups = swiss_pairings(entrants, format, standings, played, seed, byes)
+    else:
+        deck_names = fetch_decks(format)
+        if decks == 'all':
+            selected_decks = deck_names
+        else:
+            selected_decks = [d.strip() for d in decks.split(',')]
+            missing_decks = set(selected_decks) - set(deck_names)
+            if missing_decks:
+                raise ValueError(f"Deck(s) not found: {', '.join(missing_decks)}, run -p without -d to see all valid decks for format -f")
+
+        entrants = tournament_entrants(selected_decks, format)
+        if mode == 'round_robin':
+            matchups = round_robin(entrants, format)
+        elif mode == 'sample':
+            if not sample:
+                raise ValueError("Sample tournaments need a sample size")
+            matchups = sample_pairings(entrants, format, sample, seed)
+        else:
+            if sample:
+                entrants = random.Random(seed).sample(entrants, min(sample, len(entrants)))
+            matchups = swiss_pairings(entrants, format, seed=seed)
+
+    print(f"Queuing {mode} tournament for {len(entrants)} {format} entrants")
+    with connection() as (conn, cur):
+        job_id, game_rows = queue_games(cur, matchups, format, num_games, job_id, shard_size, early_stop)
+        if mode == 'swiss':
+            save_entrants(cur, job_id, entrants)
+    print(f"Successfully uploaded {game_rows} game row(s) to database under job {job_id}")
+
+    return job_id
+
+
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'queries')
+
+
+def fetch_matchup_results(job_id):
+    """
+    Load per-matchup totals for a job, with the shards of each matchup merged
+
+    Args:
+        job_id (str): Job to summarize
+
+    Returns:
+        pandas.DataFrame: One row per matchup (see queries/matchup_results.sql)
+    """
+    with open(os.path.join(QUERIES_PATH, 'matchup_results.sql')) as f:
+        query = f.read()
+
+    with connection() as (conn, cur):
+        cur.execute(query, {'job_id': str(job_id)})
+        rows = cur.fetchall()
+        columns = [desc[0] for desc in cur.description]
+
+    return pd.DataFrame(rows, columns=columns)
+
+
+CLAIM_COLUMNS = [
+    'primary_key',
+    'deck1_name',
+    'deck2_name',
+    'deck3_name',
+    'deck4_name',
+    'created_on',
+    'format',
+    'game_count',
+    # Checkpointed progress from an earlier, interrupted run
+    'deck1_wins',
+    'deck2_wins',
+    'deck3_wins',
+    'deck4_wins',
+    'turn_counts',
+    'games_played',
+    'early_stop_confidence',
+    'matchup_id',
+    'attempts',
+]
+
+
+def claim_games(conn, cur, device_id, slots, lease_seconds=300):
+    """
+    Atomically claim up to `slots` unassigned games for a device
+
+    Rows locked by another worker's claim are skipped rather than waited on,
+    so any number of workers can poll at once without claiming the same game.
+
+    A claim is a lease that the worker keeps renewing with renew_leases while
+    the game runs. Rows whose lease ran out, because their worker died, are
+    claimed again like queued ones and resume from their last checkpoint.
+    Each claim counts as an attempt, and rows released after a failure wait
+    until their retry_after.
+
+    Args:
+        conn: Database connection
+        cur: Cursor on conn
+        device_id (str): Device claiming the games
+        slots (int): Maximum number of games to claim
+        lease_seconds (float): How long the claim lasts without being renewed
+
+    Returns:
+        list: One dict per claimed game, keyed by CLAIM_COLUMNS
+    """
+    if slots <= 0:
+        return []
+
+    columns = ', '.join(f'g.{column}' for column in CLAIM_COLUMNS)
+    cur.execute(f"""
+        UPDATE games AS g
+        SET device_id = %s,
+            lease_expires_on = now() + make_interval(secs => %s),
+            attempts = g.attempts + 1
+        FROM (
+            SELECT primary_key, device_id
+            FROM games
+            WHERE finished_on IS NULL
+            AND (device_id IS NULL OR lease_expires_on < now())
+            AND (retry_after IS NULL OR retry_after <= now())
+            ORDER BY created_on ASC
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        ) AS claimed
+        WHERE g.primary_key = claimed.primary_key
+        RETURNING {columns}, claimed.device_id
+    """, (device_id, lease_seconds, slots))
+    rows = cur.fetchall()
+    conn.commit()
+
+    reclaimed = [row for row in rows if row[-1] is not None]
+    if reclaimed:
+        logging.warning(f"Reclaimed {len(reclaimed)} game(s) whose lease expired: "
+                        f"{', '.join(f'{row[0]} from {row[-1]}' for row in reclaimed)}")
+
+    # RETURNING does not preserve the subquery's ordering
+    games = [dict(zip(CLAIM_COLUMNS, row)) for row in rows]
+    games.sort(key=lambda game: game['created_on'])
+    return games
+
+
+def renew_leases(conn, cur, device_id, primary_keys, lease_seconds=300):
+    """
+    Extend the leases a device holds on the games it is running
+
+    Args:
+        conn: Database connection
+        cur: Cursor on conn
+        device_id (str): Device holding the leases
+        primary_keys (list): Games the device is running
+        lease_seconds (float): How long each lease lasts from now
+
+    Returns:
+        list: Games whose lease could not be renewed, because they were finished or reclaimed by another device
+    """
+    primary_keys = [str(primary_key) for primary_key in primary_keys]
+    if not primary_keys:
+        return []
+
+    cur.execute("""
+        UPDATE games
+        SET lease_expires_on = now() + make_interval(secs => %s)
+        WHERE primary_key = ANY(%s::uuid[])
+        AND device_id = %s
+        AND finished_on IS NULL
+        RETURNING primary_key
+    """, (lease_seconds, primary_keys, device_id))
+    renewed = {str(row[0]) for row in cur.fetchall()}
     conn.commit()
-    print("Successfully uploaded game to database")
+    return [primary_key for primary_key in primary_keys if primary_key not in renewed]
+
+
+def matchup_wins(cur, matchup_id, primary_key):
+    """
+    Wins checkpointed by the other shards of a matchup, in seat order
+
+    Args:
+        cur: Database cursor
+        matchup_id (str): Matchup the shards share
+        primary_key (str): The caller's own row, left out
+
+    Returns:
+        list: Summed wins for seats 1-4
+    """
+    cur.execute("""
+        SELECT coalesce(sum(deck1_wins), 0), coalesce(sum(deck2_wins), 0),
+               coalesce(sum(deck3_wins), 0), coalesce(sum(deck4_wins), 0)
+        FROM games
+        WHERE matchup_id = %s
+        AND primary_key <> %s
+    """, (matchup_id, primary_key))
+    return [int(wins) for wins in cur.fetchone()]
+
+
+def finish_matchup(conn, cur, matchup_id, primary_key):
+    """
+    Finish a decided matchup's shards that are still waiting to be claimed, marked stopped_early
+
+    Shards running on a worker are left alone, they see the matchup is decided
+    at their next checkpoint. Checkpointed games of the finished shards are kept.
+
+    Args:
+        conn: Database connection
+        cur: Cursor on conn
+        matchup_id (str): Matchup the shards share
+        primary_key (str): The caller's own row, finished through the result sink
+
+    Returns:
+        int: Number of shards finished
+    """
+    cur.execute(f"""
+        UPDATE games AS g
+        SET stopped_early = TRUE,
+            finished_on = now(),
+            device_id = NULL,
+            lease_expires_on = NULL
+        FROM (
+            SELECT primary_key
+            FROM games
+            WHERE matchup_id = %s
+            AND primary_key <> %s
+            AND finished_on IS NULL
+            AND (device_id IS NULL OR lease_expires_on < now())
+            FOR UPDATE SKIP LOCKED
+        ) AS queued
+        WHERE g.primary_key = queued.primary_key
+        RETURNING {', '.join(f'g.{column}' for column in SUMMARY_COLUMNS)}, g.games_played
+    """, (matchup_id, primary_key))
+    rows = cur.fetchall()
+    # Their checkpointed games were already counted as progress, only the finish is new
+    update_summaries(cur, rows)
+    conn.commit()
+    return len(rows)
+
+
+def queue_depth(cur):
+    """
+    Unfinished games by state: waiting to be claimed (including expired leases) or leased to a worker
+
+    Args:
+        cur: Database cursor
+
+    Returns:
+        dict: {'queued': int, 'leased': int}
+    """
+    cur.execute("""
+        SELECT count(*) FILTER (WHERE device_id IS NULL OR lease_expires_on < now()),
+               count(*) FILTER (WHERE device_id IS NOT NULL AND lease_expires_on >= now())
+        FROM games
+        WHERE finished_on IS NULL
+    """)
+    queued, leased = cur.fetchone()
+    return {'queued': queued, 'leased': leased}
+
+
+@contextlib.contextmanager
+def _spool(log_path):
+    # Compressed copy of the simulator output, written as it streams in
+    if log_path is None:
+        yield None
+        return
+    os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+    with gzip.open(log_path, 'wt', encoding='utf-8') as log_file:
+        yield log_file
+
+
+def _line_handler(parser, log_file):
+    def on_line(line):
+        if parser is not None:
+            parser.feed(line)
+        if log_file is not None:
+            log_file.write(line + '\n')
+    return on_line
+
+
+def _run_streaming(cmd, on_line, timeout, on_start=None, cwd=None):
+    """
+    Run the simulator and hand each stdout line to on_line as it arrives,
+    keeping only the tail of stderr, so memory stays flat however many games run
+
+    Returns:
+        subprocess.CompletedProcess: Return code and stderr tail, stdout is None
+
+    Raises:
+        subprocess.TimeoutExpired: If the process ran longer than timeout seconds
+    """
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1, cwd=cwd)
+    if on_start is not None:
+        on_start(proc)
+    stderr_tail = collections.deque(maxlen=200)
+    stderr_thread = threading.Thread(target=stderr_tail.extend, args=(proc.stderr,), daemon=True)
+    stderr_thread.start()
+
+    timed_out = threading.Event()
+    def kill():
+        timed_out.set()
+        proc.kill()
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+
+    try:
+        first_line = True
+        for line in proc.stdout:
+            if first_line:
+                FORGE_FIRST_GAME_SECONDS.observe(time.perf_counter() - started)
+                first_line = False
+            on_line(line.rstrip('\n'))
+        returncode = proc.wait()
+    finally:
+        timer.cancel()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        stderr_thread.join(timeout=5)
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+
+    return subprocess.CompletedProcess(cmd, returncode, None, ''.join(stderr_tail))
+
+
+def forge_command():
+    """
+    Command that starts a one-shot simulator, before its `sim` arguments
+
+    FORGE_COMMAND replaces `java -jar <forge jar>`, e.g. with
+    benchmarks/fake_forge.py to run the worker without Forge.
+
+    Returns:
+        list: Command arguments
+    """
+    command = os.environ.get("FORGE_COMMAND")
+    if command:
+        return shlex.split(command)
+    return ["java", "-jar", os.path.basename(os.environ.get("FORGE_JAR_PATH", ""))]
 
-    cur.close()
-    conn.close()
 
 def run_game(deck1_name,
              deck2_name,
@@ -104,6 +830,9 @@ def run_game(deck1_name,
              game_count=1,
              working_dir=None,
              format='constructed',
+             parser=None,
+             log_path=None,
+             on_start=None,
              ):
     """
     Run a single game between two to four decks
@@ -114,10 +843,14 @@ def run_game(deck1_name,
         deck3_name (str, optional): Name of the third deck
         deck4_name (str, optional): Name of the fourth deck
         game_count (int): Number of games to run (default 1)
-        working_dir (str): Working directory for the Java process
+        working_dir (str): Working directory for the Java process, the caller's is left unchanged
+        parser (GameOutputParser, optional): Fed each output line as it streams in
+        log_path (str, optional): gzip file to spool the output to
+        on_start (callable, optional): Called with the simulator's Popen once it is running
 
     Returns:
-        subprocess.CompletedProcess: Game output
+        subprocess.CompletedProcess: Game output. When streaming to a parser or
+        log_path, stdout is not kept and is None.
     """
     if working_dir is None:
         working_dir = os.path.dirname(os.environ.get("FORGE_JAR_PATH", ""))
@@ -125,19 +858,15 @@ def run_game(deck1_name,
     logging.info(f"Running game: {deck1_name} vs {deck2_name} vs {deck3_name} vs {deck4_name}")
     logging.info(f"Game count: {game_count}, Format: {format}")
     logging.info(f"Working directory: {working_dir}")
-    original_cwd = os.getcwd()
-    # logging.info("start try")
+    cwd = working_dir or None
     try:
-        if working_dir:
-            # logging.info("working dir:", working_dir)
-            os.chdir(working_dir)
-            logging.info(f"Changed to working directory: {os.getcwd()}")
         logging.info("creating deck paths")
         # deck1_path = os.path.join(format.upper(), f'{deck1_name}.dck')
         # deck2_path = os.path.join(format.upper(), f'{deck2_name}.dck')
         logging.info("creating cmd")
+        command = forge_command()
         cmd = [
-            "java", "-jar", os.path.basename(os.environ.get("FORGE_JAR_PATH", "")),
+            *command,
             "sim", "-d",
             deck1_name,
             deck2_name,
@@ -169,9 +898,31 @@ def run_game(deck1_name,
             "-q"
         ])
 
+        streaming = parser is not None or log_path is not None
+
+        # Prefer a warm simulator from the pool, fall back to a one-shot JVM
+        pool = get_pool(working_dir)
+        if pool is not None:
+            try:
+                with _spool(log_path) as log_file:
+                    on_line = _line_handler(parser, log_file) if streaming else None
+                    game_output = pool.run(cmd[len(command) + 1:], game_count=game_count, timeout=game_count*60, on_line=on_line, on_start=on_start)
+                logging.info(f"Pooled game completed with return code: {game_output.returncode}")
+                return game_output
+            except ForgePoolError as e:
+                # Only start and protocol failures get here, before any output was parsed.
+                # Timeouts raise TimeoutExpired, so the caller checkpoints and releases the game
+                logging.warning(f"Simulator pool failed ({e}), falling back to one-shot run")
+                if parser is not None:
+                    parser.reset()
+
         logging.info(f"Running command: {' '.join(cmd)}")
 
-        game_output = subprocess.run(cmd, capture_output=True, text=True, timeout=game_count*60)
+        if streaming:
+            with _spool(log_path) as log_file:
+                game_output = _run_streaming(cmd, _line_handler(parser, log_file), timeout=game_count*60, on_start=on_start, cwd=cwd)
+        else:
+            game_output = subprocess.run(cmd, capture_output=True, text=True, timeout=game_count*60, cwd=cwd)
         logging.info("Game subprocess completed")
         logging.info(game_output)
         logging.info(f"Game completed with return code: {game_output.returncode}")
@@ -179,12 +930,12 @@ def run_game(deck1_name,
             logging.error(f"Game failed with stderr: {game_output.stderr}")
 
         return game_output
+    except EarlyStop:
+        logging.info("Game stopped early")
+        raise
     except Exception as e:
         logging.error(f"Exception during game execution: {e}")
         raise
-    finally:
-        os.chdir(original_cwd)
-        logging.debug(f"Restored working directory: {os.getcwd()}")
 
 def parse_game_results(results):
     """
@@ -196,98 +947,36 @@ def parse_game_results(results):
     Returns:
         pandas.DataFrame: DataFrame with one row per deck including wins, winrate, and turn count statistics
     """
-    from statistics import mode, median
-
-    # First, parse individual game results
-    game_data = []
-
+    # Shape each successful run like a games row, so the job analytics apply unchanged
+    rows = []
     for result in results:
         if result['success'] and result['result']:
-            output = result['result'].stdout
-            lines = output.strip().split('\n')
-
-            wins_deck1 = 0
-            wins_deck2 = 0
-            total_games = 0
-            turn_counts = []
-
-            for line in lines:
-                if 'game outcome: turn' in line.lower():
-                    try:
-                        turn_count = int(line.lower().split()[-1])
-                        turn_counts.append(turn_count)
-                    except (ValueError, IndexError):
-                        pass
-
-                if 'won!' in line.lower():
-                    total_games += 1
-                    if result['deck1'].lower() in line.lower():
-                        wins_deck1 += 1
-                    elif result['deck2'].lower() in line.lower():
-                        wins_deck2 += 1
-
-            # Add data for each deck in this matchup
-            if total_games > 0:
-                avg_turns = sum(turn_counts) / len(turn_counts) if turn_counts else 0
-                median_turns = median(turn_counts) if turn_counts else 0
-                try:
-                    mode_turns = mode(turn_counts) if turn_counts else 0
-                except:
-                    mode_turns = turn_counts[0] if turn_counts else 0
-
-                # Add deck1 data
-                game_data.append({
-                    'deck': result['deck1'],
-                    'wins': wins_deck1,
-                    'losses': wins_deck2,
-                    'total_games': total_games,
-                    'avg_turns': avg_turns,
-                    'median_turns': median_turns,
-                    'mode_turns': mode_turns
-                })
-
-                # Add deck2 data
-                game_data.append({
-                    'deck': result['deck2'],
-                    'wins': wins_deck2,
-                    'losses': wins_deck1,
-                    'total_games': total_games,
-                    'avg_turns': avg_turns,
-                    'median_turns': median_turns,
-                    'mode_turns': mode_turns
+            parser = GameOutputParser([result['deck1'], result['deck2']])
+            parser.feed_text(result['result'].stdout)
+            if parser.games_played:
+                rows.append({
+                    'format': 'constructed',
+                    'deck1_name': result['deck1'],
+                    'deck2_name': result['deck2'],
+                    'deck3_name': None,
+                    'deck4_name': None,
+                    **parser.result(),
                 })
 
-    if not game_data:
+    if not rows:
         return pd.DataFrame()
 
-    # Convert to DataFrame for easier aggregation
-    df = pd.DataFrame(game_data)
-
-    # Aggregate by deck name
-    deck_summary = df.groupby('deck').agg({
-        'wins': 'sum',
-        'losses': 'sum',
-        'total_games': 'sum',
-        'avg_turns': 'mean',
-        'median_turns': 'mean',
-        'mode_turns': 'mean'
-    }).reset_index()
-
-    # Calculate win rate
-    deck_summary['winrate'] = deck_summary['wins'] / deck_summary['total_games']
-    deck_summary['winrate'] = deck_summary['winrate'].round(4)
-
-    # Round turn statistics
-    deck_summary['avg_turns'] = deck_summary['avg_turns'].round(2)
-    deck_summary['median_turns'] = deck_summary['median_turns'].round(2)
-    deck_summary['mode_turns'] = deck_summary['mode_turns'].round(2)
-
-    # Sort by win rate (descending)
-    deck_summary = deck_summary.sort_values('winrate', ascending=False).reset_index(drop=True)
-
-    # Reorder columns for better readability
-    deck_summary = deck_summary[['deck', 'wins', 'losses', 'total_games', 'winrate',
-                                'avg_turns', 'median_turns', 'mode_turns']]
+    stats = deck_stats(pd.DataFrame(rows))
+    deck_summary = pd.DataFrame({
+        'deck': stats['deck'],
+        'wins': stats['wins'],
+        'losses': stats['losses'],
+        'total_games': stats['games'],
+        'winrate': stats['win_rate'].round(4),
+        'avg_turns': stats['avg_turns'].round(2),
+        'median_turns': stats['median_turns'],
+        'mode_turns': stats['mode_turns'],
+    })
 
     print(f"\nDeck Performance Summary:")
     print(f"Total decks analyzed: {len(deck_summary)}")
@@ -296,6 +985,168 @@ def parse_game_results(results):
 
     return deck_summary
 
+
+# One pattern for every line the parser cares about, so each line is scanned once:
+#   "Game outcome: Turn 9"
+#   "Game 3: Ai(2)-Cats Angelic has won!"  or  "Game 3 ended in 5120 ms. Ai(2)-Cats Angelic has won!"
+#   "Game 4: Game ended in a draw!"
+# Forge prefixes each player with "Ai(<seat>)-" and the deck name, so the
+# winner is the exact deck name between that prefix and "has won!".
+# Forge prints "Game outcome: Turn N", then "Game N ended in X ms. Ai(seat)-<deck> has won!"
+# or "Game N ended in a Draw! Took X ms.", with a "Game Result: " prefix in sim mode.
+# Output is lowercased before matching: re.IGNORECASE is several times slower on whole logs
+RESULT_PATTERN = re.compile(
+    r'game (?:outcome: turn (?P<turn>\d+)'
+    r'|\d+(?::| ended in \d+ ms\.) ai\((?P<seat>\d+)\)-(?P<winner>.*) has won!'
+    r'|(?P<draw>\d+ ended in a draw))'
+)
+# Each alternative of RESULT_PATTERN alone, for counting a whole captured log in C-level passes
+TURN_PATTERN = re.compile(r'game outcome: turn (\d+)')
+WIN_PATTERN = re.compile(r'game \d+(?::| ended in \d+ ms\.) ai\((\d+)\)-(.*) has won!')
+DRAW_PATTERN = re.compile(r'game \d+ ended in a draw')
+# Streamed lines are timed one in PARSE_SAMPLE_LINES and scaled up, since reading the
+# clock twice costs about as much as matching the line. Timing a run of lines instead
+# would count the wait for the simulator's next line. Prime, so it does not line up
+# with the fixed number of log lines Forge prints per game
+PARSE_SAMPLE_LINES = 31
+
+
+class GameOutputParser:
+    """
+    Incremental parser for Forge sim output
+
+    Lines are fed one at a time as the simulator prints them, so only the
+    counters are kept in memory rather than the whole log. Each game ends with
+    a "has won!" or "ended in a draw" line, at which point on_game is called
+    with the parser so callers can report progress or checkpoint.
+
+    Winners are matched exactly (ignoring case) against the deck list, so a
+    deck whose name contains another's ("Cats" and "Cats Angelic") is never
+    credited with the other's wins. Mirror matches are told apart by Forge's
+    seat number.
+
+    Args:
+        deck_names (list): Deck names in seat order
+        initial (dict, optional): Result checkpointed by an earlier run, counted on top of
+        on_game (callable, optional): Called after each completed game
+    """
+
+    def __init__(self, deck_names, initial=None, on_game=None):
+        self.deck_names = list(deck_names) + [None] * (4 - len(deck_names))
+        self.seats = {}
+        for seat, name in enumerate(self.deck_names):
+            if name:
+                self.seats.setdefault(name.lower(), []).append(seat)
+        self.initial = initial or {}
+        self.on_game = on_game
+        self.reset()
+
+    def reset(self):
+        self.win_counts = [self.initial.get(f'deck{i+1}_wins') or 0 for i in range(4)]
+        self.turn_counts = list(self.initial.get('turn_counts') or [])
+        self.games_played = self.initial.get('games_played') or 0
+        self.draws = 0
+        self.lines = 0
+        self.parse_seconds = 0.0
+
+    def feed(self, line):
+        self.lines += 1
+        # Matching is the parsing cost, on_game callbacks are not counted
+        if self.lines % PARSE_SAMPLE_LINES:
+            match = RESULT_PATTERN.search(line.lower())
+        else:
+            start = time.perf_counter()
+            match = RESULT_PATTERN.search(line.lower())
+            self.parse_seconds += (time.perf_counter() - start) * PARSE_SAMPLE_LINES
+        if match is not None:
+            turn, seat, winner, draw = match.groups()
+            if turn is not None:
+                self.turn_counts.append(int(turn))
+            else:
+                self._game_finished(winner, seat)
+
+    def feed_text(self, text):
+        """
+        Parse a whole captured log without splitting it into lines
+
+        Without an on_game callback games need not be replayed in order, so
+        results are counted with C-level passes over the text instead of a
+        Python loop per line.
+
+        Args:
+            text (str): Simulator output
+        """
+        if not text:
+            return
+        start = time.perf_counter()
+        try:
+            self._feed_text(text)
+        finally:
+            self.parse_seconds += time.perf_counter() - start
+
+    def _feed_text(self, text):
+        self.lines += text.count('\n') + (not text.endswith('\n'))
+        text = text.lower()
+        if self.on_game is not None:
+            for turn, seat, winner, draw in RESULT_PATTERN.findall(text):
+                if turn:
+                    self.turn_counts.append(int(turn))
+                else:
+                    self._game_finished(None if draw else winner, seat)
+            return
+
+        # The patterns match the same result lines as feed does, anchored on Forge's "Game N" prefix
+        # so win text elsewhere in the log is not counted. Games are counted per winner, not one by one
+        self.turn_counts.extend(map(int, TURN_PATTERN.findall(text)))
+        for (seat, winner), games in collections.Counter(WIN_PATTERN.findall(text)).items():
+            winning_seat = self._winning_seat(winner, seat)
+            if winning_seat is None:
+                logging.warning(f"{games} win line(s) found but no deck name matched: {winner}")
+            else:
+                self.win_counts[winning_seat] += games
+            self.games_played += games
+
+        draws = len(DRAW_PATTERN.findall(text))
+        self.draws += draws
+        self.games_played += draws
+
+    def _winning_seat(self, winner, forge_seat):
+        seats = self.seats.get(winner)
+        if not seats:
+            return None
+        if len(seats) > 1 and int(forge_seat) - 1 in seats:
+            return int(forge_seat) - 1
+        return seats[0]
+
+    def _game_finished(self, winner, forge_seat):
+        # A game without a winner was drawn
+        if winner is None:
+            self.draws += 1
+        else:
+            seat = self._winning_seat(winner, forge_seat)
+            if seat is None:
+                logging.warning(f"Win line found but no deck name matched: {winner}")
+            else:
+                self.win_counts[seat] += 1
+        self.games_played += 1
+        if self.on_game is not None:
+            self.on_game(self)
+
+    def result(self):
+        """
+        Returns:
+            dict: {deck1_wins, deck2_wins, deck3_wins, deck4_wins, turn_counts, games_played}
+        """
+        return {
+            'deck1_wins': self.win_counts[0],
+            'deck2_wins': self.win_counts[1],
+            'deck3_wins': self.win_counts[2],
+            'deck4_wins': self.win_counts[3],
+            'turn_counts': list(self.turn_counts),
+            'games_played': self.games_played
+        }
+
+
 def parse_single_game_result(result):
     """
     Parse a single game result dict (as used in worker.py) and return a dict with deck win counts and turn counts.
@@ -315,7 +1166,8 @@ def parse_single_game_result(result):
             'deck2_wins': 0,
             'deck3_wins': 0,
             'deck4_wins': 0,
-            'turn_counts': []
+            'turn_counts': [],
+            'games_played': 0
         }
 
     output = result['result'].stdout
@@ -328,48 +1180,15 @@ def parse_single_game_result(result):
             'deck2_wins': 0,
             'deck3_wins': 0,
             'deck4_wins': 0,
-            'turn_counts': []
+            'turn_counts': [],
+            'games_played': 0
         }
 
-    lines = output.strip().split('\n')
-    logging.info(f"Game output has {len(lines)} lines")
-
     deck_names = [result.get('deck1'), result.get('deck2'), result.get('deck3'), result.get('deck4')]
     logging.info(f"Deck names: {deck_names}")
 
-    win_counts = [0, 0, 0, 0]
-    turn_counts = []
+    parser = GameOutputParser(deck_names)
+    parser.feed_text(output)
+    logging.info(f"Game output has {parser.lines} lines")
 
-    for i, line in enumerate(lines):
-        if 'game outcome: turn' in line.lower():
-            try:
-                turn_count = int(line.lower().split()[-1])
-                turn_counts.append(turn_count)
-                logging.debug(f"Found turn count: {turn_count} from line: {line.strip()}")
-            except (ValueError, IndexError) as e:
-                logging.warning(f"Failed to parse turn count from line: {line.strip()} - Error: {e}")
-                pass
-        if 'won!' in line.lower():
-            logging.debug(f"Found win line: {line.strip()}")
-            for j, name in enumerate(deck_names):
-                if name and name.lower() in line.lower():
-                    win_counts[j] += 1
-                    logging.debug(f"Win credited to deck {j} ({name})")
-                    break
-            else:
-                logging.warning(f"Win line found but no deck name matched: {line.strip()}")
-
-    result_dict = {
-        'deck1_wins': win_counts[0],
-        'deck2_wins': win_counts[1],
-        'deck3_wins': win_counts[2],
-        'deck4_wins': win_counts[3],
-        'turn_counts': turn_counts
-    }
-
-    # logging.info(f"Final parsed result: {result_dict}")
-    total_wins = sum(win_counts)
-    total_turns = len(turn_counts)
-    # logging.info(f"Total wins found: {total_wins}, Total turn counts found: {total_turns}")
-
-    return result_dict
\ No newline at end of file
+    return parser.result()
@@ -0,0 +1,258 @@
+import contextlib
+import threading
+import bisect
+import math
+import time
+import logging
+
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Modules create their metrics once at import through the shared registry
+(counter, gauge and histogram below) and record into them from any thread.
+The worker serves REGISTRY.render() at /metrics and REGISTRY.snapshot() in
+/status. Creating a metric that already exists returns the existing one, so
+modules can be reloaded.
+"""
+
+# Seconds, from a fast database round trip up to a long simulation
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    """
+    A named metric with optional labels, one series per combination of label values
+    """
+
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Metric {self.name} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self):
+        """
+        Returns:
+            list: (suffix, label values, extra labels, value) for every sample to expose
+        """
+        with self.lock:
+            return [('', key, (), value) for key, value in self.series.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.label_names, key, extra)} {_format_value(value)}")
+        return lines
+
+    def snapshot(self):
+        with self.lock:
+            return {','.join(key) or '': value for key, value in self.series.items()}
+
+
+class Counter(Metric):
+    """
+    A value that only goes up, such as games simulated
+    """
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError(f"Counter {self.name} cannot decrease")
+        key = self._key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down, set directly or read from a function at scrape time
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self.function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.series[key] = float(value)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0.0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """
+        Read the gauge from function whenever it is scraped
+
+        Args:
+            function (callable): Returns a number, or a dict of {label value tuple: number} for labelled gauges
+        """
+        self.function = function
+
+    def _refresh(self):
+        if self.function is None:
+            return
+        try:
+            value = self.function()
+        except Exception as e:
+            logging.warning(f"Could not read gauge {self.name}: {e}")
+            return
+        with self.lock:
+            if isinstance(value, dict):
+                self.series = {tuple(str(part) for part in key): float(v) for key, v in value.items()}
+            elif value is not None:
+                self.series = {(): float(value)}
+
+    def samples(self):
+        self._refresh()
+        return super().samples()
+
+    def snapshot(self):
+        self._refresh()
+        return super().snapshot()
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values in cumulative buckets, with their sum and count
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """
+        Observe how long the block takes, in seconds, including when it raises
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, series in self.series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), series['counts']):
+                    cumulative += count
+                    samples.append(('_bucket', key, (('le', _format_value(bound)),), cumulative))
+                samples.append(('_sum', key, (), series['sum']))
+                samples.append(('_count', key, (), series['count']))
+        return samples
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                ','.join(key) or '': {
+                    'count': series['count'],
+                    'sum': series['sum'],
+                    'mean': series['sum'] / series['count'] if series['count'] else None,
+                }
+                for key, series in self.series.items()
+            }
+
+
+class Registry:
+    """
+    Every metric a process exposes, by name
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help, labels, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, labels, **kwargs)
+            elif not isinstance(metric, cls) or metric.label_names != tuple(labels):
+                raise ValueError(f"Metric {name} is already registered as a different {metric.type}")
+            return metric
+
+    def render(self):
+        """
+        Returns:
+            str: All metrics in the Prometheus text exposition format
+        """
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Current value of every metric, histograms summarised as count, sum and mean
+        """
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def counter(name, help, labels=()):
+    return REGISTRY._get_or_create(Counter, name, help, labels)
+
+
+def gauge(name, help, labels=()):
+    return REGISTRY._get_or_create(Gauge, name, help, labels)
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY._get_or_create(Histogram, name, help, labels, buckets=buckets)
@@ -0,0 +1,277 @@
+import psycopg2.extras
+import pandas as pd
+from datetime import datetime
+import threading
+import logging
+import time
+
+from packages.database_tools import connection
+from packages.stats_tools import summary_deltas
+from packages import trace_tools
+
+
+WIN_COLUMNS = [
+    'deck1_wins',
+    'deck2_wins',
+    'deck3_wins',
+    'deck4_wins',
+]
+
+# Columns of a written games row that the summary tables are built from
+SUMMARY_COLUMNS = [
+    'job_id',
+    'format',
+    'deck1_name',
+    'deck2_name',
+    'deck3_name',
+    'deck4_name',
+    *WIN_COLUMNS,
+    'turn_counts',
+    'games_played',
+    'finished_on',
+]
+
+
+def update_summaries(cur, rows):
+    """
+    Add written games rows to the job, deck and pair summary tables, in the caller's transaction
+
+    Job progress counts every checkpoint. Deck and pair totals only count rows
+    as they finish, so partial results are never added twice.
+
+    Args:
+        cur: Database cursor
+        rows (list): Tuples of SUMMARY_COLUMNS followed by games_played before the write
+    """
+    if not rows:
+        return
+    games = pd.DataFrame(rows, columns=SUMMARY_COLUMNS + ['previous_games_played'])
+    now = datetime.now()
+
+    games['games_delta'] = games['games_played'] - games['previous_games_played']
+    games['finished'] = games['finished_on'].notna()
+    jobs = games.groupby('job_id').agg(
+        games_delta=('games_delta', 'sum'),
+        rows_finished=('finished', 'sum'),
+        finished_on=('finished_on', 'max'),
+    ).sort_index()
+    psycopg2.extras.execute_values(cur, """
+        UPDATE job_stats AS s
+        SET games_played = s.games_played + v.games_delta,
+            rows_finished = s.rows_finished + v.rows_finished,
+            finished_on = greatest(s.finished_on, v.finished_on)
+        FROM (VALUES %s) AS v(job_id, games_delta, rows_finished, finished_on)
+        WHERE s.job_id = v.job_id::uuid
+    """, [
+        (str(job_id), int(job.games_delta), int(job.rows_finished), None if pd.isna(job.finished_on) else job.finished_on)
+        for job_id, job in jobs.iterrows()
+    ], template="(%s, %s::int, %s::int, %s::timestamp)")
+
+    add_finished_games(cur, games[games['finished']], now)
+
+
+def add_finished_games(cur, games, updated_on=None):
+    """
+    Add finished games rows to the running deck and pair totals
+
+    Args:
+        cur: Database cursor
+        games (DataFrame): Finished rows with format, deck names, wins, turn_counts and games_played
+        updated_on (datetime, optional): Time to stamp on the changed totals
+    """
+    if games.empty:
+        return
+    now = updated_on or datetime.now()
+    deck_rows, pair_rows = summary_deltas(games)
+    if deck_rows:
+        psycopg2.extras.execute_values(cur, """
+            INSERT INTO deck_stats AS s (format, deck_name, games, wins, draws, turn_histogram, updated_on)
+            VALUES %s
+            ON CONFLICT (format, deck_name) DO UPDATE
+            SET games = s.games + EXCLUDED.games,
+                wins = s.wins + EXCLUDED.wins,
+                draws = s.draws + EXCLUDED.draws,
+                turn_histogram = ARRAY(
+                    SELECT coalesce(s.turn_histogram[turn], 0) + coalesce(EXCLUDED.turn_histogram[turn], 0)
+                    FROM generate_series(1, greatest(cardinality(s.turn_histogram), cardinality(EXCLUDED.turn_histogram))) AS turn
+                    ORDER BY turn
+                ),
+                updated_on = EXCLUDED.updated_on
+        """, [row + (now,) for row in deck_rows], template="(%s, %s, %s, %s, %s, %s::integer[], %s)")
+    if pair_rows:
+        psycopg2.extras.execute_values(cur, """
+            INSERT INTO pair_stats AS s (format, deck_name, opponent_name, games, wins, losses, updated_on)
+            VALUES %s
+            ON CONFLICT (format, deck_name, opponent_name) DO UPDATE
+            SET games = s.games + EXCLUDED.games,
+                wins = s.wins + EXCLUDED.wins,
+                losses = s.losses + EXCLUDED.losses,
+                updated_on = EXCLUDED.updated_on
+        """, [row + (now,) for row in pair_rows])
+
+
+class ResultSink:
+    """
+    Collects finished game results and writes them back in one multi-row UPDATE
+
+    A batch is flushed once it holds max_batch results or its oldest result is
+    max_delay_ms old, whichever comes first. close() flushes whatever is left,
+    and a failed flush keeps its results queued for the next attempt.
+
+    Checkpoints of unfinished games go through the same queue, so a later
+    result for a game always replaces an earlier one that has not been written.
+
+    With a device_id, results are only written to rows that device still holds
+    the claim on, so a worker whose lease expired and was reclaimed elsewhere
+    cannot overwrite the new run's progress.
+
+    A released row waits retry_seconds before it can be claimed again,
+    doubling with every attempt up to max_retry_seconds. A row released after
+    max_attempts claims is finished with what it played and marked failed.
+    """
+
+    def __init__(self, max_batch=50, max_delay_ms=500, device_id=None, max_attempts=5, retry_seconds=60, max_retry_seconds=3600):
+        self.max_batch = max_batch
+        self.device_id = device_id
+        self.max_attempts = int(max_attempts)
+        self.retry_seconds = float(retry_seconds)
+        self.max_retry_seconds = float(max_retry_seconds)
+        self.max_delay = max_delay_ms / 1000
+        self.pending = {}
+        self.oldest = None
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def add(self, primary_key, result, finished=True, release=False):
+        """
+        Queue a game's result for write-back
+
+        Args:
+            primary_key (str): Game row to update
+            result (dict): Parsed result with deck wins, turn_counts and games_played
+            finished (bool): False to checkpoint partial progress without finishing the row
+            release (bool): Also give up the claim after a failure, so a later attempt can finish the missing games
+        """
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Result sink is closed")
+            # A queued finish is final, like a finished row in the table
+            queued = self.pending.get(primary_key)
+            if queued and queued[1] is not None and not finished:
+                return
+            self.pending[primary_key] = (result, datetime.now() if finished else None, release, time.time())
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            full = len(self.pending) >= self.max_batch
+            self.condition.notify()
+
+        if full:
+            try:
+                self.flush()
+            except Exception:
+                # Already logged and requeued for the background flusher
+                pass
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.closed and (self.oldest is None or time.monotonic() - self.oldest < self.max_delay):
+                    timeout = None if self.oldest is None else self.max_delay - (time.monotonic() - self.oldest)
+                    self.condition.wait(timeout)
+                if self.closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # Already logged and requeued, back off before retrying
+                time.sleep(self.max_delay)
+
+    def flush(self):
+        """
+        Write every queued result in one transaction
+
+        Returns:
+            int: Number of games written
+        """
+        with self.flush_lock:
+            with self.condition:
+                batch, self.pending, self.oldest = self.pending, {}, None
+            if not batch:
+                return 0
+
+            rows = [
+                (primary_key, *[result.get(column, 0) for column in WIN_COLUMNS],
+                 list(result.get('turn_counts', [])), result.get('games_played', 0),
+                 result.get('stopped_early', False), finished_on, release, self.device_id)
+                for primary_key, (result, finished_on, release, _) in batch.items()
+            ]
+            flush_started = time.time()
+            try:
+                with connection('write_results') as (conn, cur):
+                    # Only rows still unfinished, and still claimed by this device, are written,
+                    # so a result is never counted twice or written over another device's run.
+                    # Released rows back off before their next attempt, or fail once out of attempts
+                    written = psycopg2.extras.execute_values(cur, """
+                        UPDATE games AS g
+                        SET deck1_wins = v.deck1_wins,
+                            deck2_wins = v.deck2_wins,
+                            deck3_wins = v.deck3_wins,
+                            deck4_wins = v.deck4_wins,
+                            turn_counts = v.turn_counts,
+                            games_played = v.games_played,
+                            stopped_early = v.stopped_early,
+                            finished_on = CASE WHEN v.release AND g.attempts >= {max_attempts} THEN now()::timestamp ELSE v.finished_on END,
+                            failed = g.failed OR (v.release AND g.attempts >= {max_attempts}),
+                            retry_after = CASE WHEN v.release
+                                THEN now() + make_interval(secs => least({max_retry_seconds}, {retry_seconds} * power(2, greatest(g.attempts - 1, 0))))
+                                ELSE g.retry_after END,
+                            device_id = CASE WHEN v.release THEN NULL ELSE g.device_id END,
+                            lease_expires_on = CASE WHEN v.release OR v.finished_on IS NOT NULL THEN NULL ELSE g.lease_expires_on END
+                        FROM (VALUES %s) AS v(primary_key, deck1_wins, deck2_wins, deck3_wins, deck4_wins,
+                                              turn_counts, games_played, stopped_early, finished_on, release, device_id)
+                        JOIN games AS previous ON previous.primary_key = v.primary_key::uuid
+                        WHERE g.primary_key = v.primary_key::uuid
+                        AND g.finished_on IS NULL
+                        AND (v.device_id IS NULL OR g.device_id = v.device_id)
+                        RETURNING {returning}, previous.games_played
+                    """.format(returning=', '.join(f'g.{column}' for column in SUMMARY_COLUMNS), max_attempts=self.max_attempts,
+                               retry_seconds=self.retry_seconds, max_retry_seconds=self.max_retry_seconds),
+                        rows, template="(%s, %s::int, %s::int, %s::int, %s::int, %s::smallint[], %s::int, %s::boolean, %s::timestamp, %s::boolean, %s::uuid)",
+                        page_size=len(rows), fetch=True)
+                    update_summaries(cur, written)
+            except Exception as e:
+                logging.error(f"Failed to write {len(batch)} game result(s), will retry: {e}")
+                with self.condition:
+                    # Results queued since the swap are newer, keep those
+                    batch.update(self.pending)
+                    self.pending = batch
+                    if self.oldest is None:
+                        self.oldest = time.monotonic()
+                raise
+
+            flush_seconds = time.time() - flush_started
+            for primary_key, (_, finished_on, _, queued_on) in batch.items():
+                stage = 'write_back' if finished_on else 'checkpoint'
+                trace_tools.record(f'{stage}_queue', flush_started - queued_on, trace_id=primary_key, start=queued_on)
+                trace_tools.record(stage, flush_seconds, trace_id=primary_key, start=flush_started, batch=len(rows))
+
+            if len(written) < len(rows):
+                logging.warning(f"Skipped {len(rows) - len(written)} game result(s) for rows already finished "
+                                f"or claimed by another device")
+            logging.info(f"Wrote {len(written)} game result(s) to database")
+            return len(written)
+
+    def close(self):
+        """
+        Stop the background flusher and write any remaining results
+        """
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+        self.flush()
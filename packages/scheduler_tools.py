@@ -0,0 +1,254 @@
+import threading
+import json
+import time
+import uuid
+import os
+import logging
+
+# Lowest costs planned for, so a sample from a process that sat idle cannot make a game look free
+MIN_CPU = 0.05
+MIN_MEMORY_MB = 32
+
+
+def load_average():
+    """
+    One minute load average, or None where the platform does not report one (Windows)
+    """
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+
+
+def available_memory_mb():
+    """
+    Memory available to new processes in MB, or None if it cannot be read
+    """
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def process_usage(pid):
+    """
+    Resident memory (MB) and total CPU seconds of a running process, from /proc
+
+    Returns:
+        tuple: (rss_mb, cpu_seconds), or None if the process is gone or /proc is unavailable
+    """
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            rss_mb = next((int(line.split()[1]) / 1024 for line in f if line.startswith('VmRSS:')), 0)
+        with open(f'/proc/{pid}/stat') as f:
+            # Fields after the command name, which may itself contain spaces
+            fields = f.read().rsplit(')', 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        return rss_mb, cpu_seconds
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+
+
+class AdaptiveScheduler:
+    """
+    Decides how many games a worker can run at once from live machine load and
+    what games of each kind have cost before
+
+    Each game is tracked while it runs: its peak resident memory and average
+    CPU cores are folded into a per-key moving average (key is the format and
+    player count, since a 4-player commander JVM costs far more than a
+    2-player constructed one). New games are admitted while the load average
+    plus the CPU of games not yet visible in it stays under the core count,
+    and the memory they are still expected to grow into fits in what is free.
+    Learned costs are saved to disk so a restarted worker keeps them.
+    """
+
+    def __init__(self,
+                 costs_path='output/scheduler_costs.json',
+                 max_games=None,
+                 cpu_target=None,
+                 memory_reserve_mb=None,
+                 default_cpu=1.5,
+                 default_memory_mb=1500,
+                 sample_interval=2,
+                 ):
+        self.cpu_count = os.cpu_count() or 1
+        # Without load or memory readings (e.g. Windows) only the cap limits games, so keep one per core
+        has_readings = load_average() is not None or available_memory_mb() is not None
+        self.max_games = (max_games or int(os.environ.get("MAX_GAMES", 0))
+                          or (self.cpu_count * 2 if has_readings else self.cpu_count))
+        self.cpu_target = cpu_target or float(os.environ.get("SCHEDULER_CPU_TARGET", 1.0))
+        self.memory_reserve_mb = memory_reserve_mb or float(os.environ.get("SCHEDULER_MEMORY_RESERVE_MB", 512))
+        self.default_cost = {'cpu': default_cpu, 'memory_mb': default_memory_mb, 'runs': 0}
+        self.sample_interval = sample_interval
+        self.costs_path = costs_path
+        self.costs = self._load_costs()
+        self.running = {}
+        self.lock = threading.Lock()
+
+    def _load_costs(self):
+        try:
+            with open(self.costs_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_costs(self):
+        try:
+            os.makedirs(os.path.dirname(self.costs_path) or '.', exist_ok=True)
+            temp_path = f"{self.costs_path}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self.costs, f, indent=2)
+            os.replace(temp_path, self.costs_path)
+        except OSError as e:
+            logging.warning(f"Could not save scheduler costs: {e}")
+
+    @staticmethod
+    def cost_key(format, player_count):
+        return f"{format}/{player_count}p"
+
+    def cost(self, key):
+        return self.costs.get(key, self.default_cost)
+
+    def _heaviest_cost(self):
+        # Games are claimed before their format is known, so plan for the most expensive kind seen
+        costs = list(self.costs.values()) or [self.default_cost]
+        return {
+            'cpu': max(MIN_CPU, max(cost['cpu'] for cost in costs)),
+            'memory_mb': max(MIN_MEMORY_MB, max(cost['memory_mb'] for cost in costs)),
+        }
+
+    def _committed(self, now):
+        # Resources running games will use but that live readings do not show yet
+        cpu = 0.0
+        memory_mb = 0.0
+        for game in self.running.values():
+            cost = self.cost(game['key'])
+            if now - game['started'] < 60:
+                # The one minute load average has not caught up with this game yet
+                cpu += cost['cpu']
+            memory_mb += max(0.0, cost['memory_mb'] - game['rss_mb'])
+        return cpu, memory_mb
+
+    def available_slots(self):
+        """
+        Number of new games that fit on this machine right now
+
+        Returns:
+            int: Games to claim, never negative
+        """
+        with self.lock:
+            running = len(self.running)
+            if running >= self.max_games:
+                return 0
+
+            cost = self._heaviest_cost()
+            committed_cpu, committed_memory_mb = self._committed(time.monotonic())
+            slots = self.max_games - running
+
+            load = load_average()
+            if load is not None:
+                spare_cpu = self.cpu_count * self.cpu_target - load - committed_cpu
+                slots = min(slots, int(spare_cpu // cost['cpu']))
+
+            memory_mb = available_memory_mb()
+            if memory_mb is not None:
+                spare_memory_mb = memory_mb - committed_memory_mb - self.memory_reserve_mb
+                slots = min(slots, int(spare_memory_mb // cost['memory_mb']))
+
+            # An idle worker always runs at least one game
+            if running == 0:
+                slots = max(slots, 1)
+            return max(slots, 0)
+
+    def start(self, game_id, format, player_count):
+        with self.lock:
+            self.running[game_id] = {
+                'key': self.cost_key(format, player_count),
+                'started': time.monotonic(),
+                'pid': None,
+                'rss_mb': 0.0,
+                'peak_rss_mb': 0.0,
+                'cpu_seconds': 0.0,
+                'tracked_since': None,
+            }
+
+    def track(self, game_id, pid):
+        """
+        Sample a game's simulator process until it exits
+
+        Args:
+            game_id (str): Game registered with start()
+            pid (int): Simulator process ID
+        """
+        with self.lock:
+            game = self.running.get(game_id)
+            if game is None:
+                return
+            game['pid'] = pid
+            game['tracked_since'] = time.monotonic()
+            first_sample = process_usage(pid)
+            game['cpu_start'] = first_sample[1] if first_sample else 0.0
+        threading.Thread(target=self._sample, args=(game_id, pid), daemon=True).start()
+
+    def _sample(self, game_id, pid):
+        while True:
+            usage = process_usage(pid)
+            with self.lock:
+                game = self.running.get(game_id)
+                if usage is None or game is None or game['pid'] != pid:
+                    return
+                game['rss_mb'] = usage[0]
+                game['peak_rss_mb'] = max(game['peak_rss_mb'], usage[0])
+                game['cpu_seconds'] = usage[1] - game['cpu_start']
+            time.sleep(self.sample_interval)
+
+    def finish(self, game_id):
+        """
+        Stop tracking a game and fold what it used into its key's cost
+        """
+        with self.lock:
+            game = self.running.pop(game_id, None)
+            if game is None or not game['tracked_since'] or not game['peak_rss_mb']:
+                return
+            wall_seconds = time.monotonic() - game['tracked_since']
+            if wall_seconds < self.sample_interval:
+                return
+
+            cpu = game['cpu_seconds'] / wall_seconds
+            if cpu <= 0:
+                # e.g. a wrapper shell that only waits on the simulator, which says nothing about the game
+                return
+            cost = self.costs.get(game['key'])
+            if cost is None:
+                cost = {'cpu': cpu, 'memory_mb': game['peak_rss_mb'], 'runs': 0}
+            else:
+                # Exponential moving average so costs follow changes in decks and Forge versions
+                cost['cpu'] = 0.8 * cost['cpu'] + 0.2 * cpu
+                cost['memory_mb'] = 0.8 * cost['memory_mb'] + 0.2 * game['peak_rss_mb']
+            cost['runs'] += 1
+            self.costs[game['key']] = cost
+            self._save_costs()
+
+    def status(self):
+        """
+        Current limits, live readings and learned costs, for the worker's HTTP endpoint
+        """
+        slots = self.available_slots()
+        with self.lock:
+            return {
+                'cpu_count': self.cpu_count,
+                'max_games': self.max_games,
+                'cpu_target': self.cpu_target,
+                'memory_reserve_mb': self.memory_reserve_mb,
+                'load_average': load_average(),
+                'available_memory_mb': available_memory_mb(),
+                'running_games': len(self.running),
+                'available_slots': slots,
+                'costs': self.costs,
+                'default_cost': self.default_cost,
+            }
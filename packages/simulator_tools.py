@@ -0,0 +1,319 @@
+import subprocess
+import threading
+import collections
+import queue
+import shlex
+import time
+import os
+import logging
+from packages import metrics_tools
+
+"""
+Warm pool of long-lived Forge simulator processes.
+
+Stock `forge.jar sim` exits after one matchup, so the pool talks to a resident
+simulator launched from FORGE_POOL_CMD (e.g. a small wrapper around Forge's
+SimulateMatch that stays in a read loop). The protocol is line based:
+
+    request:   sim arguments separated by tabs, e.g. "-d<TAB>Deck A<TAB>Deck B<TAB>-n<TAB>10<TAB>-q"
+    response:  normal sim output lines, terminated by "@@FORGE_DONE <returncode>"
+    ping:      "@@PING", answered with "@@PONG"
+
+A new simulator is ready once it answers its first ping, which is also where
+its start-up time is measured.
+
+When FORGE_POOL_CMD is not set, run_game keeps using the one-shot `java -jar` path.
+No such wrapper for real Forge ships with this repo; benchmarks/fake_forge.py --pool
+speaks the protocol for testing.
+"""
+
+FORGE_START_SECONDS = metrics_tools.histogram(
+    'forge_start_seconds', 'Time from launching a pooled simulator to its first ping answer', labels=('mode',))
+# A one-shot run prints nothing before its first game under -q, so its start-up is only seen with that game
+FORGE_FIRST_GAME_SECONDS = metrics_tools.histogram(
+    'forge_first_game_seconds', 'Time from launching a one-shot simulator to its first output line, start-up plus the first game')
+
+DONE_PREFIX = '@@FORGE_DONE'
+PING = '@@PING'
+PONG = '@@PONG'
+
+
+class ForgePoolError(Exception):
+    """
+    Raised when a pooled simulator fails to start or breaks the protocol before
+    any output of the run was handed on, so callers can fall back to a one-shot run
+    """
+
+
+class ForgeProcess:
+    """
+    A single resident simulator process and the threads draining its output
+    """
+
+    def __init__(self, cmd, working_dir=None):
+        self.cmd = cmd
+        self.working_dir = working_dir or None
+        self.games_run = 0
+        self.started_on = time.monotonic()
+        self.last_used = self.started_on
+        self.lines = queue.Queue()
+        self.stderr_tail = collections.deque(maxlen=50)
+
+        logging.info(f"Starting pooled simulator: {' '.join(cmd)}")
+        self.proc = subprocess.Popen(
+            cmd,
+            cwd=self.working_dir,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        threading.Thread(target=self._drain, args=(self.proc.stdout, self.lines.put), daemon=True).start()
+        threading.Thread(target=self._drain, args=(self.proc.stderr, self.stderr_tail.append), daemon=True).start()
+
+    @staticmethod
+    def _drain(stream, sink):
+        for line in stream:
+            sink(line.rstrip('\n'))
+        sink(None)
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def _send(self, line):
+        try:
+            self.proc.stdin.write(line + '\n')
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError) as e:
+            raise ForgePoolError(f"Simulator stdin closed: {e}")
+
+    def _readline(self, deadline, timeout):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired(self.cmd, timeout)
+        try:
+            line = self.lines.get(timeout=remaining)
+        except queue.Empty:
+            raise subprocess.TimeoutExpired(self.cmd, timeout)
+        if line is None:
+            raise ForgePoolError(f"Simulator exited with code {self.proc.poll()}")
+        return line
+
+    def ping(self, timeout=10):
+        """
+        Health check: the simulator must answer a ping within timeout seconds
+
+        Returns:
+            bool: True if the process is alive and responsive
+        """
+        if not self.alive():
+            return False
+        deadline = time.monotonic() + timeout
+        try:
+            self._send(PING)
+            while self._readline(deadline, timeout) != PONG:
+                pass
+        except (ForgePoolError, subprocess.TimeoutExpired) as e:
+            logging.warning(f"Pooled simulator failed health check: {e}")
+            return False
+        return True
+
+    def wait_ready(self, timeout):
+        """
+        Wait for a new simulator to answer its first ping, which marks the end of its start-up
+
+        Raises:
+            ForgePoolError: If the simulator exited or did not answer within timeout seconds
+        """
+        if not self.ping(timeout):
+            self.close(timeout=0)
+            raise ForgePoolError(f"Pooled simulator did not start within {timeout}s: {' '.join(self.stderr_tail)}")
+        FORGE_START_SECONDS.observe(time.monotonic() - self.started_on, mode='pool')
+
+    def run(self, sim_args, game_count, timeout, on_line=None):
+        """
+        Run one matchup on this process
+
+        Args:
+            sim_args (list): Arguments that would follow `sim` on the command line
+            game_count (int): Number of games requested, used for recycling
+            timeout (float): Seconds before the run is abandoned
+            on_line (callable, optional): Called with each output line instead of collecting stdout
+
+        Returns:
+            subprocess.CompletedProcess: Game output, shaped like a one-shot run. A simulator
+            that exits part way through its output fails like a one-shot run that crashed
+
+        Raises:
+            ForgePoolError: If the simulator failed before printing any output for this run
+            subprocess.TimeoutExpired: If the run took longer than timeout
+        """
+        deadline = time.monotonic() + timeout
+        self._send('\t'.join(str(arg) for arg in sim_args))
+
+        output = []
+        started = False
+        while True:
+            try:
+                line = self._readline(deadline, timeout)
+            except ForgePoolError:
+                if not started:
+                    raise
+                # Games already parsed and checkpointed must not be replayed by a fallback run
+                returncode = self.proc.poll() or 1
+                logging.warning(f"Pooled simulator exited part way through a run with code {returncode}")
+                break
+            started = True
+            if line.startswith(DONE_PREFIX):
+                try:
+                    returncode = int(line[len(DONE_PREFIX):].strip() or 0)
+                except ValueError:
+                    returncode = 1
+                break
+            if on_line is not None:
+                on_line(line)
+            else:
+                output.append(line)
+
+        self.games_run += game_count
+        self.last_used = time.monotonic()
+        stdout = None if on_line is not None else '\n'.join(output) + '\n' if output else ''
+        return subprocess.CompletedProcess(['sim'] + list(sim_args), returncode, stdout, '\n'.join(self.stderr_tail))
+
+    def close(self, timeout=5):
+        if self.alive():
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=timeout)
+            except (OSError, subprocess.TimeoutExpired):
+                self.proc.kill()
+                self.proc.wait()
+
+
+class ForgePool:
+    """
+    Checks resident simulators in and out for worker threads, replacing any
+    that die, fail a health check or reach max_games
+    """
+
+    def __init__(self, cmd, size=None, working_dir=None, max_games=500, ping_after=60, start_timeout=300):
+        self.cmd = cmd
+        self.size = size or os.cpu_count() or 1
+        self.working_dir = working_dir
+        self.max_games = max_games
+        self.ping_after = ping_after
+        self.start_timeout = start_timeout
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(self.size)
+        self.closed = False
+
+    def _checkout(self):
+        while True:
+            try:
+                process = self.idle.get_nowait()
+            except queue.Empty:
+                process = ForgeProcess(self.cmd, self.working_dir)
+                process.wait_ready(self.start_timeout)
+                return process
+
+            if process.games_run >= self.max_games:
+                logging.info(f"Recycling pooled simulator after {process.games_run} games")
+                process.close()
+            elif time.monotonic() - process.last_used > self.ping_after and not process.ping():
+                process.close()
+            elif not process.alive():
+                process.close()
+            else:
+                return process
+
+    def run(self, sim_args, game_count=1, timeout=None, on_line=None, on_start=None):
+        """
+        Run one matchup on a warm simulator, starting one if none are idle
+
+        Args:
+            sim_args (list): Arguments that would follow `sim` on the command line
+            game_count (int): Number of games requested
+            timeout (float): Seconds before the run is abandoned (default game_count*60)
+            on_line (callable, optional): Called with each output line instead of collecting stdout
+            on_start (callable, optional): Called with the simulator's Popen before the run
+
+        Returns:
+            subprocess.CompletedProcess: Game output
+
+        Raises:
+            ForgePoolError: If the simulator could not start or failed before printing any output
+            subprocess.TimeoutExpired: If the run took longer than timeout
+        """
+        if self.closed:
+            raise ForgePoolError("Simulator pool is closed")
+        timeout = timeout or game_count * 60
+
+        with self.slots:
+            try:
+                process = self._checkout()
+            except OSError as e:
+                raise ForgePoolError(f"Could not start pooled simulator: {e}")
+            if on_start is not None:
+                on_start(process.proc)
+
+            try:
+                result = process.run(sim_args, game_count, timeout, on_line)
+            except Exception:
+                # Never hand a process in an unknown state to the next game,
+                # including one a caller stopped part way through its output
+                process.close(timeout=0)
+                raise
+
+            if self.closed:
+                process.close()
+            else:
+                self.idle.put(process)
+            return result
+
+    def close(self):
+        self.closed = True
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(working_dir=None):
+    """
+    Return the shared simulator pool, creating it on first use
+
+    Args:
+        working_dir (str): Working directory for the simulator processes
+
+    Returns:
+        ForgePool: Shared pool, or None if FORGE_POOL_CMD is not set
+    """
+    global _pool
+    pool_cmd = os.environ.get("FORGE_POOL_CMD")
+    if not pool_cmd:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ForgePool(
+                shlex.split(pool_cmd),
+                size=int(os.environ.get("FORGE_POOL_SIZE", 0)) or None,
+                working_dir=working_dir,
+                max_games=int(os.environ.get("FORGE_POOL_MAX_GAMES", 500)),
+            )
+            logging.info(f"Created simulator pool with {_pool.size} slots, recycling every {_pool.max_games} games")
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
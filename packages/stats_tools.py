@@ -0,0 +1,370 @@
+import numpy as np
+import pandas as pd
+from statistics import NormalDist
+import itertools
+import math
+import os
+
+from packages.database_tools import connection
+
+
+def sprt(wins_a, wins_b, confidence=0.95, delta=0.1):
+    """
+    Wald's sequential probability ratio test on head-to-head wins
+
+    Tests "A wins with probability 0.5 + delta" against "0.5 - delta", with both
+    error rates set to 1 - confidence. It can be re-evaluated after every game
+    without inflating the error rate, unlike a repeatedly checked confidence interval.
+
+    Args:
+        wins_a (int): Wins of the first deck
+        wins_b (int): Wins of the second deck
+        confidence (float): Required confidence in the winner, e.g. 0.95
+        delta (float): Smallest edge over 50% worth detecting
+
+    Returns:
+        int: 1 if A is the better deck, -1 if B is, 0 to keep playing
+    """
+    alpha = beta = 1 - confidence
+    p0, p1 = 0.5 - delta, 0.5 + delta
+    llr = wins_a * math.log(p1 / p0) + wins_b * math.log((1 - p1) / (1 - p0))
+
+    if llr >= math.log((1 - beta) / alpha):
+        return 1
+    if llr <= math.log(beta / (1 - alpha)):
+        return -1
+    return 0
+
+
+def early_stop_winner(win_counts, confidence, delta=0.1, min_games=10, players=2):
+    """
+    Decide whether a matchup's winner is already statistically clear
+
+    Seats are compared in their fixed order and the test is two-sided, so the
+    error rate is split between both directions rather than spent on whichever
+    deck happens to lead. With more than two players every pair of seats is
+    tested, the error rate split between the pairs, and a seat wins once it
+    beats each of the others.
+
+    Args:
+        win_counts (list): Wins per seat
+        confidence (float): Required confidence, e.g. 0.95
+        delta (float): Smallest edge over 50% worth detecting
+        min_games (int): Never stop before this many decided games
+        players (int): Seats in play, the first players entries of win_counts
+
+    Returns:
+        int: Seat index of the clear winner, or None to keep playing
+    """
+    win_counts = list(win_counts)[:players]
+    if players < 2 or sum(win_counts) < min_games:
+        return None
+
+    pairs = list(itertools.combinations(range(players), 2))
+    pair_confidence = 1 - (1 - confidence) / (2 * len(pairs))
+    beaten = [0] * players
+    for a, b in pairs:
+        decision = sprt(win_counts[a], win_counts[b], pair_confidence, delta)
+        if decision == 1:
+            beaten[a] += 1
+        elif decision == -1:
+            beaten[b] += 1
+
+    for seat in range(players):
+        if beaten[seat] == players - 1:
+            return seat
+    return None
+
+
+SEATS = range(1, 5)
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'queries')
+
+
+def fetch_job_games(job_id=None):
+    """
+    Load the games rows of a job for analysis
+
+    Args:
+        job_id (str, optional): Job to load, defaults to the most recently finished job
+
+    Returns:
+        pandas.DataFrame: One row per games row, turn_counts as lists
+    """
+    columns = ['job_id', 'format', 'game_count', 'games_played', 'turn_counts', 'finished_on']
+    columns += [f'deck{i}_name' for i in SEATS] + [f'deck{i}_wins' for i in SEATS]
+    with connection() as (conn, cur):
+        if job_id is None:
+            cur.execute("SELECT job_id FROM games WHERE finished_on IS NOT NULL ORDER BY finished_on DESC LIMIT 1")
+            row = cur.fetchone()
+            if row is None:
+                return pd.DataFrame(columns=columns)
+            job_id = row[0]
+        cur.execute(f"SELECT {', '.join(columns)} FROM games WHERE job_id = %s", (job_id,))
+        return pd.DataFrame(cur.fetchall(), columns=columns)
+
+
+def wilson_interval(wins, games, confidence=0.95):
+    """
+    Wilson score interval for win rates, vectorized over arrays
+
+    Unlike the normal approximation it stays inside [0, 1] and behaves for
+    small samples and win rates near 0 or 1.
+
+    Args:
+        wins (array-like): Wins per deck
+        games (array-like): Games per deck
+        confidence (float): Interval confidence, e.g. 0.95
+
+    Returns:
+        tuple: (low, high) arrays, NaN where no games were played
+    """
+    wins = np.asarray(wins, dtype=float)
+    games = np.asarray(games, dtype=float)
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = wins / games
+        denominator = 1 + z ** 2 / games
+        center = (rate + z ** 2 / (2 * games)) / denominator
+        margin = z * np.sqrt(rate * (1 - rate) / games + z ** 2 / (4 * games ** 2)) / denominator
+    return center - margin, center + margin
+
+
+def _players(games, split_halves=False):
+    # Four player slots per row as (names, wins, team) arrays aligned with the rows.
+    # Jumpstart rows list four half decks but record wins per pair: deck1_wins for
+    # decks 1+2 and deck2_wins for decks 3+4. They are played as two merged decks,
+    # or with split_halves each half deck is credited with its pair's games.
+    names = [games[f'deck{i}_name'].to_numpy(dtype=object) for i in SEATS]
+    wins = [games[f'deck{i}_wins'].fillna(0).to_numpy(dtype=np.int64) for i in SEATS]
+    jumpstart = (games['format'] == 'jumpstart').to_numpy()
+    if not jumpstart.any():
+        return [(names[i], wins[i], np.full(len(games), i)) for i in range(4)]
+
+    if split_halves:
+        pair_wins = [wins[0], wins[0], wins[1], wins[1]]
+        return [
+            (names[i], np.where(jumpstart, pair_wins[i], wins[i]), np.where(jumpstart, i // 2, i))
+            for i in range(4)
+        ]
+
+    merged = [
+        (games['deck1_name'] + ' ' + games['deck2_name']).to_numpy(dtype=object),
+        (games['deck3_name'] + ' ' + games['deck4_name']).to_numpy(dtype=object),
+    ]
+    return [
+        (np.where(jumpstart, merged[0], names[0]), wins[0], np.zeros(len(games), dtype=int)),
+        (np.where(jumpstart, merged[1], names[1]), wins[1], np.ones(len(games), dtype=int)),
+        (np.where(jumpstart, None, names[2]), np.where(jumpstart, 0, wins[2]), np.full(len(games), 2)),
+        (np.where(jumpstart, None, names[3]), np.where(jumpstart, 0, wins[3]), np.full(len(games), 3)),
+    ]
+
+
+def _encode(games, split_halves=False):
+    # Factorize every slot's deck names against one shared code table, -1 where the slot is empty
+    players = _players(games, split_halves)
+    codes, decks = pd.factorize(np.concatenate([slot_names for slot_names, _, _ in players]))
+    codes = codes.reshape(len(players), len(games))
+    played = games['games_played'].fillna(0).to_numpy(dtype=np.int64)
+    draws = np.maximum(played - sum(games[f'deck{i}_wins'].fillna(0).to_numpy(dtype=np.int64) for i in SEATS), 0)
+    return players, codes, np.asarray(decks, dtype=object), played, draws
+
+
+def _turn_histograms(games, codes, deck_count):
+    # Exact turn count histogram per deck: every turn count in a row counts for each deck in it
+    turn_lists = games['turn_counts'].map(lambda turns: turns or []).tolist()
+    lengths = np.fromiter(map(len, turn_lists), dtype=np.int64, count=len(turn_lists))
+    turns = np.fromiter(itertools.chain.from_iterable(turn_lists), dtype=np.int64, count=lengths.sum())
+    if not len(turns):
+        return np.zeros((deck_count, 1), dtype=np.int64)
+
+    turn_rows = np.repeat(np.arange(len(turn_lists)), lengths)
+    width = turns.max() + 1
+    histograms = np.zeros(deck_count * width, dtype=np.int64)
+    for slot_codes in codes:
+        turn_codes = slot_codes[turn_rows]
+        present = turn_codes >= 0
+        histograms += np.bincount(turn_codes[present] * width + turns[present], minlength=deck_count * width)
+    return histograms.reshape(deck_count, width)
+
+
+def _turn_summary(histograms):
+    # Mean, median and mode of each deck's turn counts, read straight off its histogram
+    counts = histograms.sum(axis=1)
+    turns = np.arange(histograms.shape[1])
+    cumulative = histograms.cumsum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (histograms * turns).sum(axis=1) / counts
+        # Middle values of the sorted turn counts, averaged when there are two
+        lower = (cumulative > ((counts - 1) // 2)[:, None]).argmax(axis=1)
+        upper = (cumulative > (counts // 2)[:, None]).argmax(axis=1)
+        median = np.where(counts > 0, (lower + upper) / 2, np.nan)
+        mode = np.where(counts > 0, histograms.argmax(axis=1), np.nan)
+    return mean, median, mode
+
+
+def deck_stats(games, confidence=0.95, split_halves=False):
+    """
+    Per-deck results with win rate confidence intervals and exact turn count statistics
+
+    Turn statistics come from every game a deck played, not averages of
+    per-matchup medians and modes.
+
+    Args:
+        games (DataFrame): Rows from fetch_job_games
+        confidence (float): Confidence of the win rate interval
+        split_halves (bool): Credit each Jumpstart half deck with its pair's results
+
+    Returns:
+        pandas.DataFrame: deck, games, wins, losses, draws, win_rate, ci_low, ci_high,
+            avg_turns, median_turns, mode_turns, sorted by win rate
+    """
+    players, codes, decks, played, draws = _encode(games, split_halves)
+    deck_count = len(decks)
+
+    deck_games = np.zeros(deck_count, dtype=np.int64)
+    deck_wins = np.zeros(deck_count, dtype=np.int64)
+    deck_draws = np.zeros(deck_count, dtype=np.int64)
+    for slot_codes, (_, slot_wins, _) in zip(codes, players):
+        present = slot_codes >= 0
+        deck_games += np.bincount(slot_codes[present], weights=played[present], minlength=deck_count).astype(np.int64)
+        deck_wins += np.bincount(slot_codes[present], weights=slot_wins[present], minlength=deck_count).astype(np.int64)
+        deck_draws += np.bincount(slot_codes[present], weights=draws[present], minlength=deck_count).astype(np.int64)
+
+    ci_low, ci_high = wilson_interval(deck_wins, deck_games, confidence)
+    avg_turns, median_turns, mode_turns = _turn_summary(_turn_histograms(games, codes, deck_count))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = deck_wins / deck_games
+
+    stats = pd.DataFrame({
+        'deck': decks,
+        'games': deck_games,
+        'wins': deck_wins,
+        'losses': deck_games - deck_wins - deck_draws,
+        'draws': deck_draws,
+        'win_rate': win_rate,
+        'ci_low': ci_low,
+        'ci_high': ci_high,
+        'avg_turns': avg_turns,
+        'median_turns': median_turns,
+        'mode_turns': mode_turns,
+    })
+    return stats.sort_values(['win_rate', 'games'], ascending=False).reset_index(drop=True)
+
+
+def pair_stats(games, confidence=0.95, split_halves=False):
+    """
+    Head-to-head results for every pair of decks that met
+
+    Each pair appears in both orientations, so pair_stats(games).pivot(index='deck',
+    columns='opponent', values='win_rate') is a win rate matrix. In multiplayer
+    pods wins and losses only count games one of the two won.
+
+    Args:
+        games (DataFrame): Rows from fetch_job_games
+        confidence (float): Confidence of the win rate interval
+        split_halves (bool): Credit each Jumpstart half deck with its pair's results
+
+    Returns:
+        pandas.DataFrame: deck, opponent, games, wins, losses, win_rate, ci_low, ci_high
+    """
+    players, codes, decks, played, _ = _encode(games, split_halves)
+    deck_count = len(decks)
+
+    keys, pair_games, pair_wins, pair_losses = [], [], [], []
+    for i, j in itertools.permutations(range(len(players)), 2):
+        _, wins_i, team_i = players[i]
+        _, wins_j, team_j = players[j]
+        # Half decks on the same Jumpstart team are partners, not opponents
+        met = (codes[i] >= 0) & (codes[j] >= 0) & (codes[i] != codes[j]) & (team_i != team_j)
+        keys.append(codes[i][met] * deck_count + codes[j][met])
+        pair_games.append(played[met])
+        pair_wins.append(wins_i[met])
+        pair_losses.append(wins_j[met])
+
+    pairs, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    totals = [
+        np.bincount(inverse, weights=np.concatenate(values), minlength=len(pairs)).astype(np.int64)
+        for values in (pair_games, pair_wins, pair_losses)
+    ]
+    ci_low, ci_high = wilson_interval(totals[1], totals[0], confidence)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = totals[1] / totals[0]
+
+    stats = pd.DataFrame({
+        'deck': decks[pairs // max(deck_count, 1)],
+        'opponent': decks[pairs % max(deck_count, 1)],
+        'games': totals[0],
+        'wins': totals[1],
+        'losses': totals[2],
+        'win_rate': win_rate,
+        'ci_low': ci_low,
+        'ci_high': ci_high,
+    })
+    return stats.sort_values(['deck', 'win_rate'], ascending=[True, False]).reset_index(drop=True)
+
+
+def turn_distribution(games, split_halves=False):
+    """
+    Exact distribution of game lengths per deck
+
+    Args:
+        games (DataFrame): Rows from fetch_job_games
+        split_halves (bool): Credit each Jumpstart half deck with its pair's games
+
+    Returns:
+        pandas.DataFrame: Games per turn count, one row per deck and one column per turn
+    """
+    _, codes, decks, _, _ = _encode(games, split_halves)
+    histograms = _turn_histograms(games, codes, len(decks))
+    distribution = pd.DataFrame(histograms, index=pd.Index(decks, name='deck'))
+    return distribution.loc[:, distribution.sum() > 0]
+
+
+def summary_deltas(games):
+    """
+    Per-deck and per-pair totals of finished rows, to add to the running summary tables
+
+    Args:
+        games (DataFrame): Finished rows, as from fetch_job_games
+
+    Returns:
+        tuple: (deck rows of (format, deck_name, games, wins, draws, turn_histogram),
+                pair rows of (format, deck_name, opponent_name, games, wins, losses)),
+               each sorted by key so concurrent writers lock summary rows in the same order
+    """
+    deck_rows, pair_rows = [], []
+    for format, rows in games.groupby('format', sort=True):
+        distribution = turn_distribution(rows)
+        # turn_histogram[n] counts games of n turns (SQL arrays are 1-based)
+        distribution = distribution.reindex(columns=range(1, max(distribution.columns, default=0) + 1), fill_value=0)
+        for deck in deck_stats(rows).itertuples(index=False):
+            histogram = distribution.loc[deck.deck].tolist() if deck.deck in distribution.index else []
+            deck_rows.append((format, deck.deck, int(deck.games), int(deck.wins), int(deck.draws), histogram))
+        for pair in pair_stats(rows).itertuples(index=False):
+            pair_rows.append((format, pair.deck, pair.opponent, int(pair.games), int(pair.wins), int(pair.losses)))
+
+    return sorted(deck_rows, key=lambda row: row[:2]), sorted(pair_rows, key=lambda row: row[:3])
+
+
+def fetch_leaderboard(format, min_games=0):
+    """
+    Load the all-time leaderboard for a format from the running deck totals
+
+    Args:
+        format (str): Game format
+        min_games (int): Leave out decks with fewer finished games
+
+    Returns:
+        pandas.DataFrame: One row per deck (see queries/leaderboard.sql), with Wilson intervals
+    """
+    with open(os.path.join(QUERIES_PATH, 'leaderboard.sql')) as f:
+        query = f.read()
+
+    with connection() as (conn, cur):
+        cur.execute(query, {'format': format, 'min_games': min_games})
+        rows = cur.fetchall()
+        columns = [desc[0] for desc in cur.description]
+
+    leaderboard = pd.DataFrame(rows, columns=columns)
+    leaderboard['ci_low'], leaderboard['ci_high'] = wilson_interval(leaderboard['wins'], leaderboard['games'])
+    return leaderboard
@@ -0,0 +1,200 @@
+import threading
+import atexit
+import json
+import time
+import os
+import logging
+
+"""
+Lightweight tracing of each game's path through the worker.
+
+Off unless TRACE_PATH is set, in which case every span (a named, timed stage
+of one game) is appended to that file as one JSON line:
+
+    {"trace":"<primary_key>","name":"simulate","parent":"game","start":1760000000.123456,"ms":5120.4,"attrs":{...}}
+
+Recording a span only appends a dict to a buffer; a background thread
+serialises and writes the buffer every TRACE_FLUSH_SECONDS (default 1), so
+tracing can stay on in production. tools/summarize_traces.py summarises
+trace files and exports them for a trace viewer.
+"""
+
+_local = threading.local()
+
+
+class Tracer:
+    """
+    Buffers finished spans and appends them to a JSON lines file from a background thread
+    """
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(path, 'a', encoding='utf-8')
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def record(self, span):
+        with self.lock:
+            self.buffer.append(span)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logging.warning(f"Could not write trace spans to {self.path}: {e}")
+
+    def flush(self):
+        with self.write_lock:
+            with self.lock:
+                spans, self.buffer = self.buffer, []
+            if not spans or self.file.closed:
+                return
+            self.file.write(''.join(json.dumps(span, separators=(',', ':'), default=str) + '\n' for span in spans))
+            self.file.flush()
+
+    def close(self):
+        self.flush()
+        with self.write_lock:
+            self.file.close()
+
+
+_tracer = None
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def get_tracer():
+    """
+    Return the process-wide tracer, creating it from TRACE_PATH on first use
+
+    Returns:
+        Tracer: Shared tracer, or None if tracing is off
+    """
+    global _tracer, _configured
+    if _configured:
+        return _tracer
+    with _configure_lock:
+        if not _configured:
+            path = os.environ.get("TRACE_PATH")
+            if path:
+                _tracer = Tracer(path, float(os.environ.get("TRACE_FLUSH_SECONDS", 1)))
+                atexit.register(_tracer.close)
+                logging.info(f"Tracing game spans to {path}")
+            _configured = True
+    return _tracer
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class _Span:
+    def __init__(self, tracer, name, trace_id, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.attrs = attrs
+
+    def __enter__(self):
+        stack = _stack()
+        if self.trace_id is None and stack:
+            self.trace_id = stack[-1][0]
+        self.parent = stack[-1][1] if stack and stack[-1][0] == self.trace_id else None
+        stack.append((self.trace_id, self.name))
+        self.start = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def set(self, **attrs):
+        """
+        Add attributes once they are known, such as the number of games played
+        """
+        self.attrs.update(attrs)
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        _stack().pop()
+        span = {'trace': self.trace_id, 'name': self.name, 'start': round(self.start, 6), 'ms': round(duration * 1000, 3)}
+        if self.parent:
+            span['parent'] = self.parent
+        if exc_type is not None:
+            span['error'] = exc_type.__name__
+        if self.attrs:
+            span['attrs'] = self.attrs
+        self.tracer.record(span)
+        return False
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def set(self, **attrs):
+        pass
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, trace_id=None, **attrs):
+    """
+    Time a block as one stage of a trace
+
+    Spans opened inside another span on the same thread join its trace and
+    record it as their parent.
+
+    Args:
+        name (str): Stage name, e.g. simulate
+        trace_id (str, optional): Correlation id, the game's primary_key. Defaults to the enclosing span's
+        **attrs: Extra values stored with the span
+
+    Returns:
+        Context manager whose set() adds attributes; does nothing when tracing is off
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        return _NO_SPAN
+    return _Span(tracer, name, trace_id, attrs)
+
+
+def record(name, seconds, trace_id=None, start=None, **attrs):
+    """
+    Record a stage timed elsewhere, such as parse time accumulated while streaming
+
+    Args:
+        name (str): Stage name
+        seconds (float): Duration
+        trace_id (str, optional): Correlation id. Defaults to the enclosing span's
+        start (float, optional): Epoch seconds the stage started, defaults to seconds ago
+        **attrs: Extra values stored with the span
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        return
+    stack = _stack()
+    if trace_id is None and stack:
+        trace_id = stack[-1][0]
+    span = {
+        'trace': trace_id,
+        'name': name,
+        'start': round(time.time() - seconds if start is None else start, 6),
+        'ms': round(seconds * 1000, 3),
+    }
+    if stack and stack[-1][0] == trace_id:
+        span['parent'] = stack[-1][1]
+    if attrs:
+        span['attrs'] = attrs
+    tracer.record(span)
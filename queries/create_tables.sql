@@ -9,9 +9,14 @@ CREATE TABLE IF NOT EXISTS "public"."decks" (
   "colour" TEXT NULL,
   "format" TEXT NULL,
   "category" TEXT NULL,
+  "content_hash" TEXT NULL,
+  "revision" INTEGER NOT NULL DEFAULT 1,
   CONSTRAINT "PK_decks" PRIMARY KEY ("primary_key")
 );
 
+CREATE INDEX IF NOT EXISTS "IX_decks_format_deck_name"
+  ON "public"."decks" ("format", "deck_name", "uploaded_on");
+
 CREATE TABLE "public"."games" (
   "primary_key" UUID NOT NULL,
   "deck1_name" TEXT NULL,
@@ -24,10 +29,67 @@ CREATE TABLE "public"."games" (
   "deck2_wins" INTEGER NULL,
   "deck3_wins" INTEGER NULL,
   "deck4_wins" INTEGER NULL,
-  "turn_counts" JSON NULL,
+  "turn_counts" SMALLINT[] NULL DEFAULT '{}',
   "device_id" UUID NULL,
   "format" TEXT NULL,
   "created_on" TIMESTAMP NULL,
   "finished_on" TIMESTAMP NULL,
+  "games_played" INTEGER NOT NULL DEFAULT 0,
+  "matchup_id" UUID NULL,
+  "early_stop_confidence" REAL NULL,
+  "stopped_early" BOOLEAN NOT NULL DEFAULT FALSE,
+  "lease_expires_on" TIMESTAMP NULL,
+  "attempts" INTEGER NOT NULL DEFAULT 0,
+  "retry_after" TIMESTAMP NULL,
+  "failed" BOOLEAN NOT NULL DEFAULT FALSE,
   CONSTRAINT "PK_games" PRIMARY KEY ("primary_key")
 );
+
+CREATE INDEX IF NOT EXISTS "IX_games_queue"
+  ON "public"."games" ("created_on")
+  WHERE "finished_on" IS NULL;
+CREATE INDEX IF NOT EXISTS "IX_games_job_id" ON "public"."games" ("job_id");
+CREATE INDEX IF NOT EXISTS "IX_games_matchup_id" ON "public"."games" ("matchup_id");
+
+CREATE TABLE IF NOT EXISTS "public"."job_stats" (
+  "job_id" UUID NOT NULL,
+  "format" TEXT NULL,
+  "rows_total" INTEGER NOT NULL DEFAULT 0,
+  "rows_finished" INTEGER NOT NULL DEFAULT 0,
+  "game_count" INTEGER NOT NULL DEFAULT 0,
+  "games_played" INTEGER NOT NULL DEFAULT 0,
+  "created_on" TIMESTAMP NULL,
+  "finished_on" TIMESTAMP NULL,
+  CONSTRAINT "PK_job_stats" PRIMARY KEY ("job_id")
+);
+
+-- Finished games per deck; turn_histogram[n] is the number of games that lasted n turns
+CREATE TABLE IF NOT EXISTS "public"."deck_stats" (
+  "format" TEXT NOT NULL,
+  "deck_name" TEXT NOT NULL,
+  "games" INTEGER NOT NULL DEFAULT 0,
+  "wins" INTEGER NOT NULL DEFAULT 0,
+  "draws" INTEGER NOT NULL DEFAULT 0,
+  "turn_histogram" INTEGER[] NOT NULL DEFAULT '{}',
+  "updated_on" TIMESTAMP NULL,
+  CONSTRAINT "PK_deck_stats" PRIMARY KEY ("format", "deck_name")
+);
+
+-- Finished games per ordered deck pair, each pair stored from both sides
+CREATE TABLE IF NOT EXISTS "public"."pair_stats" (
+  "format" TEXT NOT NULL,
+  "deck_name" TEXT NOT NULL,
+  "opponent_name" TEXT NOT NULL,
+  "games" INTEGER NOT NULL DEFAULT 0,
+  "wins" INTEGER NOT NULL DEFAULT 0,
+  "losses" INTEGER NOT NULL DEFAULT 0,
+  "updated_on" TIMESTAMP NULL,
+  CONSTRAINT "PK_pair_stats" PRIMARY KEY ("format", "deck_name", "opponent_name")
+);
+
+-- Every entrant of a Swiss tournament, including those sitting a round out
+CREATE TABLE IF NOT EXISTS "public"."tournament_entrants" (
+  "job_id" UUID NOT NULL,
+  "deck_names" TEXT[] NOT NULL,
+  CONSTRAINT "PK_tournament_entrants" PRIMARY KEY ("job_id", "deck_names")
+);
@@ -1,26 +1,11 @@
-WITH last_finished AS (
-    SELECT
-        games.job_id,
-        max(games.finished_on) AS finished_on
-    FROM "public"."games" AS games
-    WHERE games.finished_on IS NOT NULL
-    GROUP BY games.job_id
-),
-job_created AS (
-    SELECT
-        games.job_id,
-        min(games.created_on) AS created_on
-    FROM "public"."games" AS games
-    GROUP BY games.job_id
-)
+-- Progress of every job, read from the running totals in job_stats
 SELECT
-    games.job_id,
-    age(last_finished.finished_on, job_created.created_on) AS time_elapsed,
-    count(games.primary_key) AS game_count,
-    count(games.finished_on) AS games_evaluated,
-    100.0 * count(games.finished_on) / nullif(count(games.primary_key), 0) AS percent_complete
-FROM "public"."games" AS games
-JOIN job_created ON games.job_id = job_created.job_id
-LEFT JOIN last_finished ON games.job_id = last_finished.job_id
-GROUP BY games.job_id, last_finished.finished_on, job_created.created_on
-ORDER BY job_created.created_on DESC;
+    stats.job_id,
+    age(stats.finished_on, stats.created_on) AS time_elapsed,
+    stats.rows_total AS game_count,
+    stats.rows_finished AS games_evaluated,
+    100.0 * stats.rows_finished / nullif(stats.rows_total, 0) AS percent_complete,
+    stats.games_played AS games_simulated,
+    100.0 * stats.games_played / nullif(stats.game_count, 0) AS percent_simulated
+FROM "public"."job_stats" AS stats
+ORDER BY stats.created_on DESC;
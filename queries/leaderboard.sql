@@ -0,0 +1,17 @@
+-- All-time results per deck for a format, read from the running totals in deck_stats
+SELECT
+    stats.deck_name AS deck,
+    stats.games,
+    stats.wins,
+    stats.games - stats.wins - stats.draws AS losses,
+    stats.draws,
+    stats.wins::float / nullif(stats.games, 0) AS win_rate,
+    (
+        SELECT sum(turns.games * turns.turn_count)::float / nullif(sum(turns.games), 0)
+        FROM unnest(stats.turn_histogram) WITH ORDINALITY AS turns(games, turn_count)
+    ) AS avg_turns,
+    stats.updated_on
+FROM "public"."deck_stats" AS stats
+WHERE stats.format = %(format)s
+  AND stats.games >= %(min_games)s
+ORDER BY win_rate DESC NULLS LAST, stats.games DESC;
@@ -0,0 +1,29 @@
+-- Per-matchup totals for a job, merging the shards of each matchup
+SELECT
+    games.job_id,
+    games.matchup_id,
+    games.format,
+    games.deck1_name,
+    games.deck2_name,
+    games.deck3_name,
+    games.deck4_name,
+    count(games.primary_key) AS shards,
+    count(games.finished_on) AS shards_finished,
+    sum(games.game_count) AS game_count,
+    sum(games.games_played) AS games_played,
+    sum(games.deck1_wins) AS deck1_wins,
+    sum(games.deck2_wins) AS deck2_wins,
+    sum(games.deck3_wins) AS deck3_wins,
+    sum(games.deck4_wins) AS deck4_wins,
+    (
+        SELECT array_agg(turns.turn_count)
+        FROM "public"."games" AS shard,
+             unnest(shard.turn_counts) AS turns(turn_count)
+        WHERE shard.matchup_id = games.matchup_id
+    ) AS turn_counts,
+    max(games.finished_on) AS finished_on
+FROM "public"."games" AS games
+WHERE games.job_id = %(job_id)s
+GROUP BY games.job_id, games.matchup_id, games.format,
+         games.deck1_name, games.deck2_name, games.deck3_name, games.deck4_name
+ORDER BY games.deck1_name, games.deck2_name, games.deck3_name, games.deck4_name;
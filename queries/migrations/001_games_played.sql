@@ -0,0 +1,9 @@
+-- Games simulated so far for each row, checkpointed while long runs are in progress
+ALTER TABLE "public"."games"
+  ADD COLUMN IF NOT EXISTS "games_played" INTEGER NOT NULL DEFAULT 0;
+
+-- Rows finished before checkpointing existed played every requested game
+UPDATE "public"."games"
+SET "games_played" = "game_count"
+WHERE "finished_on" IS NOT NULL
+  AND "games_played" = 0;
@@ -0,0 +1,8 @@
+-- Shards of one matchup share a matchup_id so their results can be merged
+ALTER TABLE "public"."games"
+  ADD COLUMN IF NOT EXISTS "matchup_id" UUID NULL;
+
+-- Rows queued before sharding are a matchup of their own
+UPDATE "public"."games"
+SET "matchup_id" = "primary_key"
+WHERE "matchup_id" IS NULL;
@@ -0,0 +1,4 @@
+-- Optional sequential test: stop a row once its winner is clear at this confidence
+ALTER TABLE "public"."games"
+  ADD COLUMN IF NOT EXISTS "early_stop_confidence" REAL NULL,
+  ADD COLUMN IF NOT EXISTS "stopped_early" BOOLEAN NOT NULL DEFAULT FALSE;
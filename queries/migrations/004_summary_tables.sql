@@ -0,0 +1,38 @@
+-- Running totals kept up to date by the workers as results are written,
+-- so progress and leaderboard queries never scan the games table.
+-- After applying, run tools/rebuild_stats.py once to fill them from existing games.
+CREATE TABLE IF NOT EXISTS "public"."job_stats" (
+  "job_id" UUID NOT NULL,
+  "format" TEXT NULL,
+  "rows_total" INTEGER NOT NULL DEFAULT 0,
+  "rows_finished" INTEGER NOT NULL DEFAULT 0,
+  "game_count" INTEGER NOT NULL DEFAULT 0,
+  "games_played" INTEGER NOT NULL DEFAULT 0,
+  "created_on" TIMESTAMP NULL,
+  "finished_on" TIMESTAMP NULL,
+  CONSTRAINT "PK_job_stats" PRIMARY KEY ("job_id")
+);
+
+-- Finished games per deck; turn_histogram[n] is the number of games that lasted n turns
+CREATE TABLE IF NOT EXISTS "public"."deck_stats" (
+  "format" TEXT NOT NULL,
+  "deck_name" TEXT NOT NULL,
+  "games" INTEGER NOT NULL DEFAULT 0,
+  "wins" INTEGER NOT NULL DEFAULT 0,
+  "draws" INTEGER NOT NULL DEFAULT 0,
+  "turn_histogram" INTEGER[] NOT NULL DEFAULT '{}',
+  "updated_on" TIMESTAMP NULL,
+  CONSTRAINT "PK_deck_stats" PRIMARY KEY ("format", "deck_name")
+);
+
+-- Finished games per ordered deck pair, each pair stored from both sides
+CREATE TABLE IF NOT EXISTS "public"."pair_stats" (
+  "format" TEXT NOT NULL,
+  "deck_name" TEXT NOT NULL,
+  "opponent_name" TEXT NOT NULL,
+  "games" INTEGER NOT NULL DEFAULT 0,
+  "wins" INTEGER NOT NULL DEFAULT 0,
+  "losses" INTEGER NOT NULL DEFAULT 0,
+  "updated_on" TIMESTAMP NULL,
+  CONSTRAINT "PK_pair_stats" PRIMARY KEY ("format", "deck_name", "opponent_name")
+);
@@ -0,0 +1,33 @@
+-- Queued games in claim order. Partial, so it only holds the unclaimed rows
+-- workers actually scan, however long the finished history grows.
+CREATE INDEX IF NOT EXISTS "IX_games_queue"
+  ON "public"."games" ("created_on")
+  WHERE "device_id" IS NULL AND "finished_on" IS NULL;
+
+-- Per-job and per-matchup reads (results, standings, matchup merges, analytics)
+CREATE INDEX IF NOT EXISTS "IX_games_job_id" ON "public"."games" ("job_id");
+CREATE INDEX IF NOT EXISTS "IX_games_matchup_id" ON "public"."games" ("matchup_id");
+
+-- Deck lists and deck versions by format and name; uploaded_on makes the
+-- worker's MAX(uploaded_on) version check an index-only scan
+CREATE INDEX IF NOT EXISTS "IX_decks_format_deck_name"
+  ON "public"."decks" ("format", "deck_name", "uploaded_on");
+
+-- Turn counts as a SMALLINT[] instead of a JSON-formatted Python list.
+-- ALTER ... USING cannot contain a subquery, so the conversion goes through a session function.
+-- Only a JSON column is converted, so running this file again leaves the array alone.
+DO $migration$
+BEGIN
+  IF (SELECT atttypid FROM pg_attribute
+      WHERE attrelid = '"public"."games"'::regclass AND attname = 'turn_counts') = 'json'::regtype THEN
+    CREATE FUNCTION pg_temp.turn_counts_array(turn_counts JSON) RETURNS SMALLINT[]
+      LANGUAGE sql IMMUTABLE
+      AS $$ SELECT coalesce(array_agg(turns.turn_count::SMALLINT), '{}') FROM json_array_elements_text(turn_counts) AS turns(turn_count) $$;
+
+    ALTER TABLE "public"."games"
+      ALTER COLUMN "turn_counts" TYPE SMALLINT[] USING pg_temp.turn_counts_array("turn_counts");
+  END IF;
+END
+$migration$;
+
+ALTER TABLE "public"."games" ALTER COLUMN "turn_counts" SET DEFAULT '{}';
@@ -0,0 +1,18 @@
+-- Per-deck content hash and revision, so uploading an unchanged deck list writes nothing.
+-- Every row of a deck carries the hash and revision of the upload it came from.
+ALTER TABLE "public"."decks"
+  ADD COLUMN IF NOT EXISTS "content_hash" TEXT NULL,
+  ADD COLUMN IF NOT EXISTS "revision" INTEGER NOT NULL DEFAULT 1;
+
+-- Earlier uploads stacked a full copy of a deck each time it was uploaded.
+-- Keep only each deck's latest upload. Existing decks have no hash yet, so
+-- their next upload replaces them once as revision 2.
+DELETE FROM "public"."decks" AS d
+USING (
+  SELECT "format", "deck_name", MAX("uploaded_on") AS "uploaded_on"
+  FROM "public"."decks"
+  GROUP BY "format", "deck_name"
+) AS latest
+WHERE d."format" = latest."format"
+  AND d."deck_name" = latest."deck_name"
+  AND d."uploaded_on" < latest."uploaded_on";
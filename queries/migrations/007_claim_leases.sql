@@ -0,0 +1,18 @@
+-- Claims are leases: a worker renews lease_expires_on while it runs a game,
+-- and once a lease expires any worker may claim the row again.
+ALTER TABLE "public"."games"
+  ADD COLUMN IF NOT EXISTS "lease_expires_on" TIMESTAMP NULL;
+
+-- Rows claimed before leases existed get a grace period. Workers still running
+-- them renew it, rows of workers that died are picked up once it runs out.
+UPDATE "public"."games"
+SET "lease_expires_on" = now() + interval '10 minutes'
+WHERE "device_id" IS NOT NULL
+  AND "finished_on" IS NULL;
+
+-- The claim scan now also covers leased rows, of which there are only as
+-- many as games running across the fleet.
+DROP INDEX IF EXISTS "public"."IX_games_queue";
+CREATE INDEX IF NOT EXISTS "IX_games_queue"
+  ON "public"."games" ("created_on")
+  WHERE "finished_on" IS NULL;
@@ -0,0 +1,7 @@
+-- Every claim of a row counts as an attempt. A run that fails releases the row
+-- with a growing retry_after before it can be claimed again, and a row that
+-- keeps failing is finished with what it played and marked failed.
+ALTER TABLE "public"."games"
+  ADD COLUMN IF NOT EXISTS "attempts" INTEGER NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS "retry_after" TIMESTAMP NULL,
+  ADD COLUMN IF NOT EXISTS "failed" BOOLEAN NOT NULL DEFAULT FALSE;
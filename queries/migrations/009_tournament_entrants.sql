@@ -0,0 +1,7 @@
+-- Every entrant of a Swiss tournament, so entrants that sit a round out are
+-- still paired in later rounds, which are built from this job's games.
+CREATE TABLE IF NOT EXISTS "public"."tournament_entrants" (
+  "job_id" UUID NOT NULL,
+  "deck_names" TEXT[] NOT NULL,
+  CONSTRAINT "PK_tournament_entrants" PRIMARY KEY ("job_id", "deck_names")
+);
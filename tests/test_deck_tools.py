@@ -0,0 +1,232 @@
+import pandas as pd
+import pytest
+from pathlib import Path
+from packages.deck_tools import parse_decks
+
+INPUT_PATH = Path(__file__).resolve().parent.parent / 'input'
+
+# parse_card, add_lands and parse_decks as they were before parsing was vectorized,
+# copied unchanged apart from their names, so the parser is checked against the original
+
+
+def baseline_add_lands(cards_df):
+    """
+    Adds lands to decks that do not have lands. Tedious to do in Archidekt, so it's automated!
+
+    Args:
+        cards_df (DataFrame): Dataframe containing cards categorized into decks
+
+    Returns:
+        DataFrame: Dataframe containing cards categorized into decks, with added lands
+    """
+    deck_names = cards_df['deck_name'].unique()
+    lands = {
+        'W': [
+            {
+                'quantity':     '7',
+                'card_name':    'Plains',
+                'set_code':     'JMP',
+                'tag':          'Land',
+                'colour':       'W',
+            },
+            {
+                'quantity':     '1',
+                'card_name':    'Thriving Heath',
+                'set_code':     'JMP',
+                'tag':          'Land',
+                'colour':       'W',
+            }
+        ],
+        'U': [
+            {
+                'quantity':     '7',
+                'card_name':    'Island',
+                'set_code':     'JMP',
+                'tag':          'Land',
+                'colour':       'U',
+            },
+            {
+                'quantity':     '1',
+                'card_name':    'Thriving Isle',
+                'set_code':     'JMP',
+                'tag':          'Land',
+                'colour':       'U',
+            }
+        ],
+        'B': [
+            {
+                'quantity':     '7',
+                'card_name':    'Swamp',
+                'set_code':     'JMP',
+                'tag':          'Land',
+                'colour':       'B',
+            },
+            {
+                'quantity':     '1',
+                'card_name':    'Thriving Moor',
+                'set_code':     'JMP',
+                'tag':          'Land',
+                'colour':       'B',
+            }
+        ],
+        'R': [
+            {
+                'quantity':     '7',
+                'card_name':    'Mountain',
+                'set_code':     'JMP',
+                'tag':          'Land',
+                'colour':       'R',
+            },
+            {
+                'quantity':     '1',
+                'card_name':    'Thriving Bluff',
+                'set_code':     'JMP',
+                'tag':          'Land',
+                'colour':       'R',
+            }
+        ],
+        'G': [
+            {
+                'quantity':     '7',
+                'card_name':    'Forest',
+                'set_code':     'JMP',
+                'tag':          'Land',
+                'colour':       'G',
+            },
+            {
+                'quantity':     '1',
+                'card_name':    'Thriving Grove',
+                'set_code':     'JMP',
+                'tag':          'Land',
+                'colour':       'G',
+            }
+        ],
+    }
+
+    for deck in deck_names:
+        deck_df = cards_df[cards_df['deck_name'] == deck]
+        colour = deck_df['colour'].iloc[0]
+
+        if deck_df[deck_df['card_name'].isin(['Plains', 'Island', 'Swamp', 'Mountain', 'Forest'])].empty:
+            lands_df = pd.DataFrame.from_dict(lands[colour])
+            lands_df['deck_name'] = deck
+
+            cards_df = pd.concat([cards_df, lands_df])
+
+
+    return cards_df
+
+
+def baseline_parse_card(card, format):
+    """
+    Parses an individual card line from input CSV
+
+    Args:
+        card (String): Individual card line from CSV
+
+    Returns:
+        Dictionary: Card line parsed into dictionary
+    """
+    split_card = card.split()
+
+    card_dict = {
+        'quantity': '',
+        'card_name':     '',
+        'colour':   '',
+        'set_code': '',
+        'deck_name':     '',
+        'tag':      '',
+    }
+
+    card_dict['quantity'] = split_card[0].split('x')[0]
+
+    step = 0
+
+    if format == 'jumpstart':
+        for index, word in enumerate(split_card[1:]):
+            if step == 0 and '(' not in word:
+                card_dict['card_name'] = card_dict['card_name'] + ' ' + word
+            elif step == 0:
+                step = 1
+            if step == 1:
+                card_dict['set_code'] = card_dict['set_code'] + ' ' + word.strip('()').upper()
+                if ')' in word:
+                    step = 2
+                    continue
+
+            if step == 2:
+                deck_name = word.strip('[]')
+                card_dict['deck_name'] = card_dict['deck_name'] + ' ' + deck_name
+                if ' - ' in card_dict['deck_name']:
+                    card_dict['colour'] = card_dict['deck_name'].split(' - ')[0].strip()
+                    card_dict['deck_name'] = card_dict['deck_name'].split(' - ')[1].strip()
+                if ']' in word:
+                    step = 3
+                continue
+
+            if step == 3:
+                card_dict['tag'] = word.split(',')[0].strip('^')
+
+        for key in card_dict:
+            card_dict[key] = card_dict[key].strip().replace('/', '')
+
+        return card_dict
+
+    else:
+        for index, word in enumerate(split_card[1:]):
+            if step == 0 and '(' not in word:
+                card_dict['card_name'] = card_dict['card_name'] + ' ' + word
+            elif step == 0:
+                step = 1
+            if step == 1:
+                card_dict['set_code'] = card_dict['set_code'] + ' ' + word.strip('()').upper()
+                if ')' in word:
+                    step = 2
+                    continue
+
+        for key in card_dict:
+            card_dict[key] = card_dict[key].strip().replace('/', '')
+
+        return card_dict
+
+
+def baseline_parse_decks(cards, format):
+    """
+    Parses an input CSV
+
+    Args:
+        cards (List): List of card lines from CSV
+
+    Returns:
+        DataFrame: All cards processed
+    """
+    card_list = [baseline_parse_card(card, format) for card in cards]
+    cards_df = pd.DataFrame.from_dict(card_list)
+
+    if format == 'jumpstart':
+        cards_df = baseline_add_lands(cards_df)
+        assert len(cards_df['deck_name'].unique()) == cards_df['quantity'].astype(int).sum() // 20, "Deck count does not match expected value (cards/20)"
+
+    return cards_df
+
+
+def outcome(parse, cards, format):
+    try:
+        return parse(cards, format), None
+    except AssertionError as e:
+        # pytest appends its own explanation to the copied asserts, only the message is compared
+        return None, str(e).splitlines()[0]
+
+
+@pytest.mark.parametrize('format', ['jumpstart', 'constructed'])
+@pytest.mark.parametrize('name', ['decks.txt', 'sample_jumpstart.txt'])
+def test_parse_decks_matches_baseline(name, format):
+    with open(INPUT_PATH / name, 'r') as f:
+        cards = f.readlines()
+
+    (expected, expected_error), (parsed, parsed_error) = outcome(baseline_parse_decks, cards, format), outcome(parse_decks, cards, format)
+    assert parsed_error == expected_error
+    if name == 'sample_jumpstart.txt' and format == 'jumpstart':
+        assert parsed_error == "Deck count does not match expected value (cards/20)"
+    if expected is not None:
+        pd.testing.assert_frame_equal(parsed, expected)
@@ -0,0 +1,106 @@
+import pytest
+from packages.game_tools import GameOutputParser, matchup_count, round_robin, sample_pairings, swiss_pairings, tournament_entrants, tournament_standings
+
+# Result lines as Forge's SimulateMatch prints them, with game log lines in between
+FORGE_OUTPUT = [
+    "Turn 3 (Ai(1)-Cats) casts Savannah Lions",
+    "Game outcome: Turn 9",
+    "Game Result: Game 1 ended in 5120 ms. Ai(1)-Cats has won!",
+    "Game outcome: Turn 14",
+    "Game Result: Game 2 ended in a Draw! Took 30512 ms.",
+    "Game outcome: Turn 7",
+    "Game Result: Game 3 ended in 4410 ms. Ai(2)-Cats Angelic has won!",
+    "game outcome: turn 11",
+    "GAME RESULT: GAME 4 ENDED IN 6001 MS. AI(2)-CATS ANGELIC HAS WON!",
+    "Game outcome: Turn 12",
+    "Game 5 ended in a draw!",
+]
+DECKS = ['Cats', 'Cats Angelic']
+
+
+def streamed(lines):
+    parser = GameOutputParser(DECKS)
+    for line in lines:
+        parser.feed(line)
+    return parser
+
+
+def captured(lines, on_game=None):
+    parser = GameOutputParser(DECKS, on_game=on_game)
+    parser.feed_text('\n'.join(lines) + '\n')
+    return parser
+
+
+@pytest.mark.parametrize('parse', [streamed, captured, lambda lines: captured(lines, on_game=lambda parser: None)])
+def test_forge_result_lines(parse):
+    parser = parse(FORGE_OUTPUT)
+    assert parser.result() == {
+        'deck1_wins': 1,
+        'deck2_wins': 2,
+        'deck3_wins': 0,
+        'deck4_wins': 0,
+        'turn_counts': [9, 14, 7, 11, 12],
+        'games_played': 5,
+    }
+    assert parser.draws == 2
+
+
+def test_streamed_and_captured_agree_line_by_line():
+    for end in range(len(FORGE_OUTPUT) + 1):
+        lines = FORGE_OUTPUT[:end]
+        stream, capture = streamed(lines), captured(lines)
+        assert stream.result() == capture.result()
+        assert stream.draws == capture.draws
+
+
+@pytest.mark.parametrize('deck_count, format', [(5, 'jumpstart'), (8, 'jumpstart'), (6, 'constructed'), (7, 'commander')])
+def test_matchup_count_matches_round_robin(deck_count, format):
+    entrants = tournament_entrants([f"Deck {i}" for i in range(deck_count)], format)
+    assert matchup_count(entrants, format) == len(list(round_robin(entrants, format)))
+
+
+def test_sample_pairings_jumpstart_half_decks():
+    # 5 half decks make 10 pairs but only 15 disjoint matchups, not C(10, 2) = 45
+    entrants = tournament_entrants([f"Half {i}" for i in range(5)], 'jumpstart')
+    with pytest.raises(ValueError):
+        list(sample_pairings(entrants, 'jumpstart', 20, seed=1))
+
+    matchups = list(sample_pairings(entrants, 'jumpstart', 15, seed=1))
+    assert sorted(matchups) == sorted(round_robin(entrants, 'jumpstart'))
+
+
+def test_sample_pairings_sparse_sample_is_distinct_and_disjoint():
+    entrants = tournament_entrants([f"Half {i}" for i in range(30)], 'jumpstart')
+    matchups = list(sample_pairings(entrants, 'jumpstart', 200, seed=1))
+    assert len(set(matchups)) == 200
+    assert all(len(set(matchup)) == 4 for matchup in matchups)
+
+
+def test_swiss_keeps_entrants_that_sat_out():
+    entrants = tournament_entrants(['A', 'B', 'C', 'D', 'E'], 'constructed')
+    first_round = list(swiss_pairings(entrants, 'constructed', seed=1))
+    assert len(first_round) == 2
+    (sat_out,) = set(entrants) - {(name,) for matchup in first_round for name in matchup if name}
+
+    # The first seat wins every game, so the entrant that sat out ties the losers on no points
+    rows = [(f"matchup {i}", *matchup, 3, 0, 0, 0) for i, matchup in enumerate(first_round)]
+    standings, played, round_entrants, byes = tournament_standings(rows, 'constructed', entrants)
+    assert sorted(round_entrants) == sorted(entrants)
+    assert standings[sat_out] == 0
+    assert byes == {sat_out}
+
+    for seed in range(20):
+        second_round = list(swiss_pairings(round_entrants, 'constructed', standings, played, seed, byes))
+        assert len(second_round) == 2
+        assert sat_out[0] in {name for matchup in second_round for name in matchup}
+
+
+@pytest.mark.parametrize('parse', [captured, lambda lines: captured(lines, on_game=lambda parser: None)])
+def test_win_text_outside_result_lines_is_not_counted(parse):
+    # Forge's per-game outcome lines and other log text can say a deck has won, only result lines count
+    lines = FORGE_OUTPUT + [
+        "Ai(1)-Cats has won!",
+        "Game outcome: Ai(2)-Cats Angelic has won because all opponents have lost",
+        "Turn 4 (Ai(1)-Cats) says: Ai(1)-Cats has won!",
+    ]
+    assert parse(lines).result() == streamed(lines).result() == streamed(FORGE_OUTPUT).result()
@@ -0,0 +1,111 @@
+import contextlib
+import pytest
+from packages import result_tools
+from packages.result_tools import ResultSink
+
+# Positions in a written row, as flush passes them to execute_values
+GAMES_PLAYED = 6
+FINISHED_ON = 8
+RELEASE = 9
+
+
+class FakeDatabase:
+    """
+    Stands in for connection() and execute_values, recording each batch written
+    """
+
+    def __init__(self):
+        self.batches = []
+        self.before_write = None
+
+    @contextlib.contextmanager
+    def connection(self, operation=None):
+        yield None, None
+
+    def execute_values(self, cur, query, rows, **kwargs):
+        if self.before_write is not None:
+            self.before_write()
+        self.batches.append({row[0]: row for row in rows})
+        return []
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(result_tools, 'connection', database.connection)
+    monkeypatch.setattr(result_tools.psycopg2.extras, 'execute_values', database.execute_values)
+    monkeypatch.setattr(result_tools, 'update_summaries', lambda cur, rows: None)
+    return database
+
+
+@pytest.fixture
+def sink(database):
+    # A long delay keeps the background flusher out of the way, tests flush themselves
+    sink = ResultSink(max_batch=10, max_delay_ms=60000)
+    yield sink
+    sink.close()
+
+
+def result(games_played):
+    return {'deck1_wins': games_played, 'turn_counts': [7] * games_played, 'games_played': games_played}
+
+
+def test_checkpoint_never_replaces_a_queued_finish(sink, database):
+    sink.add('a', result(5))
+    sink.add('a', result(3), finished=False)
+    sink.add('a', result(3), finished=False, release=True)
+    sink.flush()
+
+    (row,) = database.batches[0].values()
+    assert row[GAMES_PLAYED] == 5
+    assert row[FINISHED_ON] is not None
+    assert row[RELEASE] is False
+
+
+def test_failed_flush_requeues_and_keeps_newer_results(sink, database):
+    sink.add('a', result(2), finished=False)
+    sink.add('b', result(1), finished=False)
+
+    def newer_result_then_fail():
+        # Queued while the batch is being written, so newer than the batch that fails
+        database.before_write = None
+        sink.add('a', result(4), finished=False)
+        raise RuntimeError("connection lost")
+
+    database.before_write = newer_result_then_fail
+    with pytest.raises(RuntimeError):
+        sink.flush()
+    assert database.batches == []
+
+    assert sink.flush() == 0
+    batch = database.batches[0]
+    assert sorted(batch) == ['a', 'b']
+    assert batch['a'][GAMES_PLAYED] == 4
+    assert batch['b'][GAMES_PLAYED] == 1
+
+
+def test_close_flushes_what_is_left(sink, database):
+    sink.add('a', result(3))
+    sink.add('b', result(1), finished=False)
+    sink.close()
+
+    assert len(database.batches) == 1
+    assert sorted(database.batches[0]) == ['a', 'b']
+    with pytest.raises(RuntimeError):
+        sink.add('c', result(1))
+
+
+def test_full_batch_is_flushed_by_add(database):
+    sink = ResultSink(max_batch=3, max_delay_ms=60000)
+    try:
+        sink.add('a', result(1))
+        sink.add('b', result(1))
+        assert database.batches == []
+
+        # The third result fills the batch and is written before add returns
+        sink.add('c', result(1))
+        assert len(database.batches) == 1
+        assert sorted(database.batches[0]) == ['a', 'b', 'c']
+        assert sink.pending == {}
+    finally:
+        sink.close()
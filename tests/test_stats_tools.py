@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+from packages.stats_tools import deck_stats, early_stop_winner, pair_stats, wilson_interval
+
+COLUMNS = ['format', 'games_played', 'turn_counts'] + [f'deck{i}_name' for i in range(1, 5)] + [f'deck{i}_wins' for i in range(1, 5)]
+
+
+def games_frame(rows):
+    # Rows as fetch_job_games returns them: (format, names, wins, games_played, turn_counts)
+    return pd.DataFrame([{
+        'format': format,
+        'games_played': played,
+        'turn_counts': turns,
+        **{f'deck{i + 1}_name': name for i, name in enumerate(names)},
+        **{f'deck{i + 1}_wins': win for i, win in enumerate(wins)},
+    } for format, names, wins, played, turns in rows], columns=COLUMNS)
+
+
+def by_deck(stats):
+    return stats.set_index('deck')
+
+
+def test_early_stop_is_two_sided_on_fixed_seats():
+    assert early_stop_winner([12, 0, 0, 0], 0.95) == 0
+    assert early_stop_winner([0, 12, 0, 0], 0.95) == 1
+    # Each direction gets half the error rate, so a lead that clears a one-sided test is not enough
+    assert early_stop_winner([9, 0, 0, 0], 0.95) is None
+    assert early_stop_winner([5, 5, 0, 0], 0.95, min_games=1) is None
+
+
+def test_early_stop_multiplayer_needs_every_opponent_beaten():
+    assert early_stop_winner([30, 2, 2, 2], 0.95, players=4) == 0
+    assert early_stop_winner([30, 28, 2, 2], 0.95, players=4) is None
+
+
+def test_turn_statistics_are_exact():
+    games = games_frame([
+        ('constructed', ['A', 'B', None, None], [2, 1, 0, 0], 3, [5, 7, 7]),
+        ('constructed', ['A', 'C', None, None], [1, 0, 0, 0], 1, [9]),
+        ('constructed', ['B', 'C', None, None], [1, 1, 0, 0], 2, [4, 6]),
+    ])
+    stats = by_deck(deck_stats(games))
+
+    # A played 5, 7, 7, 9: even count, median between the middle two
+    assert stats.loc['A', 'median_turns'] == 7
+    assert stats.loc['A', 'mode_turns'] == 7
+    assert stats.loc['A', 'avg_turns'] == 7
+    # B played 4, 5, 6, 7, 7: odd count, the middle value
+    assert stats.loc['B', 'median_turns'] == 6
+    assert stats.loc['B', 'mode_turns'] == 7
+    # C played 4, 6, 9
+    assert stats.loc['C', 'median_turns'] == 6
+    assert stats.loc['C', 'avg_turns'] == pytest.approx(19 / 3)
+
+
+def test_even_median_averages_the_middle_turns():
+    games = games_frame([('constructed', ['A', 'B', None, None], [2, 2, 0, 0], 4, [4, 5, 8, 9])])
+    assert by_deck(deck_stats(games)).loc['A', 'median_turns'] == 6.5
+
+
+def test_jumpstart_merged_and_split_halves():
+    games = games_frame([
+        ('jumpstart', ['Cats', 'Dogs', 'Elves', 'Goblins'], [3, 1, 0, 0], 4, [6, 6, 7, 8]),
+        ('jumpstart', ['Cats', 'Elves', 'Dogs', 'Goblins'], [0, 2, 0, 0], 2, [9, 10]),
+    ])
+
+    merged = by_deck(deck_stats(games))
+    assert sorted(merged.index) == ['Cats Dogs', 'Cats Elves', 'Dogs Goblins', 'Elves Goblins']
+    assert merged.loc['Cats Dogs', ['games', 'wins']].tolist() == [4, 3]
+    assert merged.loc['Dogs Goblins', ['games', 'wins']].tolist() == [2, 2]
+
+    # Each half deck is credited with every game its pair played
+    split = by_deck(deck_stats(games, split_halves=True))
+    assert split.loc['Cats', ['games', 'wins']].tolist() == [6, 3]
+    assert split.loc['Goblins', ['games', 'wins']].tolist() == [6, 3]
+    assert split.loc['Elves', ['games', 'wins']].tolist() == [6, 1]
+    assert split.loc['Cats', 'median_turns'] == 7.5
+
+    # Partners on a team are not opponents
+    pairs = pair_stats(games, split_halves=True)
+    assert not ((pairs['deck'] == 'Cats') & (pairs['opponent'] == 'Dogs') & (pairs['games'] == 6)).any()
+    cats_goblins = pairs[(pairs['deck'] == 'Cats') & (pairs['opponent'] == 'Goblins')].iloc[0]
+    assert cats_goblins[['games', 'wins', 'losses']].tolist() == [6, 3, 3]
+
+
+def test_draws_are_not_losses():
+    games = games_frame([('constructed', ['A', 'B', None, None], [5, 3, 0, 0], 10, [])])
+    stats = by_deck(deck_stats(games))
+    assert stats.loc['A', ['games', 'wins', 'losses', 'draws']].tolist() == [10, 5, 3, 2]
+    assert stats.loc['B', ['games', 'wins', 'losses', 'draws']].tolist() == [10, 3, 5, 2]
+
+    pairs = pair_stats(games).set_index(['deck', 'opponent'])
+    assert pairs.loc[('A', 'B'), ['games', 'wins', 'losses']].tolist() == [10, 5, 3]
+
+
+def test_wilson_interval_at_the_bounds():
+    low, high = wilson_interval([0, 20, 10], [20, 20, 20])
+    assert low[0] == pytest.approx(0) and 0 < high[0] < 0.2
+    assert 0.8 < low[1] < 1 and high[1] == pytest.approx(1)
+    assert low[2] < 0.5 < high[2]
+    assert high[2] - 0.5 == pytest.approx(0.5 - low[2])
+
+    low, high = wilson_interval([0], [0])
+    assert np.isnan(low[0]) and np.isnan(high[0])
+
+
+def test_empty_input():
+    games = games_frame([])
+    assert deck_stats(games).empty
+    assert pair_stats(games).empty
@@ -8,7 +8,6 @@ if str(REPO_ROOT) not in sys.path:
 
 from packages.deck_tools import *
 from packages.game_tools import *
-from packages.database_tools import conn, cur
 import pandas as pd
 
 """
@@ -22,9 +21,15 @@ parser.add_argument("-d", "--decks", action="store", help="comma separated list
 parser.add_argument("-n", "--games", action="store", help="number of games to run (per combination if tournament)", default='1')
 parser.add_argument("-f", "--format", action="store", help="game format (constructed, commander, jumpstart)", default='constructed')
 parser.add_argument("-p", "--print_decks", action="store_true", help="print all decks for format, then quit")
+parser.add_argument("-t", "--tournament", action="store", help="queue a tournament over -d instead of one game (round_robin, sample, swiss)", default=None)
+parser.add_argument("--sample", action="store", type=int, help="matchups to draw for sample tournaments, entrants for a first swiss round", default=None)
+parser.add_argument("--seed", action="store", type=int, help="random seed for sampled and swiss schedules", default=None)
+parser.add_argument("-s", "--shard_size", action="store", type=int, help="split matchups into rows of at most this many games (0 to disable)", default=25)
+parser.add_argument("-e", "--early_stop", action="store", type=float, help="stop a matchup once its winner is clear at this confidence, e.g. 0.95", default=None)
+parser.add_argument("--job_id", action="store", help="swiss job to queue the next round for", default=None)
 args = vars(parser.parse_args())
 
-if args['decks'] == '' and not args['print_decks']:
+if args['decks'] == '' and not args['print_decks'] and not args['job_id']:
     raise ValueError("Populate one of -d or -p (see -h for help)")
 
 # Ensure all variables have valid values
@@ -34,13 +39,31 @@ except (ValueError, TypeError):
     raise ValueError("The value for --games must be an integer.")
 assert isinstance(args['games'], int), 'failed to convert "games" to int'
 
+if args['early_stop'] is not None and not 0.5 < args['early_stop'] < 1:
+    raise ValueError("The value for --early_stop must be between 0.5 and 1, e.g. 0.95.")
+
 valid_formats = ['constructed', 'commander', 'jumpstart']
 if args['format'] not in valid_formats:
     raise ValueError(f"Invalid format '{args['format']}'. Valid options are: {', '.join(valid_formats)}.")
 
-create_game(
-    args['decks'],
-    args['format'],
-    args['games'],
-    args['print_decks'],
-)
\ No newline at end of file
+if args['tournament'] and not args['print_decks']:
+    create_tournament(
+        args['decks'],
+        args['format'],
+        args['games'],
+        args['tournament'],
+        args['sample'],
+        args['seed'],
+        args['job_id'],
+        args['shard_size'],
+        args['early_stop'],
+    )
+else:
+    create_game(
+        args['decks'],
+        args['format'],
+        args['games'],
+        args['print_decks'],
+        args['shard_size'],
+        args['early_stop'],
+    )
\ No newline at end of file
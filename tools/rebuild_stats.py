@@ -0,0 +1,58 @@
+import argparse
+import time
+import sys
+from pathlib import Path
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from packages.database_tools import connection
+from packages.result_tools import add_finished_games, SUMMARY_COLUMNS
+
+"""
+Rebuild the job, deck and pair summary tables from the games table
+
+Run once after applying queries/migrations/004_summary_tables.sql, or to repair
+the totals. Workers keep running: their summary updates wait for the rebuild
+to commit and are then added on top of it.
+"""
+
+parser = argparse.ArgumentParser(description="Rebuild the summary tables from all games",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument("-c", "--chunk_size", action="store", type=int, help="finished rows read per batch", default=10000)
+args = vars(parser.parse_args())
+
+start = time.perf_counter()
+with connection() as (conn, cur):
+    cur.execute("LOCK TABLE job_stats, deck_stats, pair_stats IN EXCLUSIVE MODE")
+    cur.execute("DELETE FROM job_stats")
+    cur.execute("DELETE FROM deck_stats")
+    cur.execute("DELETE FROM pair_stats")
+
+    cur.execute("""
+        INSERT INTO job_stats (job_id, format, rows_total, rows_finished, game_count, games_played, created_on, finished_on)
+        SELECT job_id, min(format), count(*), count(finished_on), coalesce(sum(game_count), 0),
+               sum(games_played), min(created_on), max(finished_on)
+        FROM games
+        WHERE job_id IS NOT NULL
+        GROUP BY job_id
+    """)
+    print(f"Rebuilt progress for {cur.rowcount} jobs")
+
+    # Server-side cursor so finished games are streamed in chunks rather than loaded at once
+    rows = conn.cursor(name='rebuild_stats')
+    rows.itersize = args['chunk_size']
+    rows.execute(f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM games WHERE finished_on IS NOT NULL")
+    finished = 0
+    while True:
+        chunk = rows.fetchmany(args['chunk_size'])
+        if not chunk:
+            break
+        add_finished_games(cur, pd.DataFrame(chunk, columns=SUMMARY_COLUMNS))
+        finished += len(chunk)
+        print(f"Added {finished} finished rows")
+    rows.close()
+
+print(f"Rebuilt summary tables in {time.perf_counter() - start:.1f}s")
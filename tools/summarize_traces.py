@@ -0,0 +1,95 @@
+import argparse
+import glob
+import json
+import sys
+from pathlib import Path
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+"""
+Summarise trace files written by workers run with TRACE_PATH set
+
+Prints time per stage across all games and the slowest games stage by stage,
+and can export the spans in the Chrome trace event format for chrome://tracing
+or https://ui.perfetto.dev.
+"""
+
+parser = argparse.ArgumentParser(description="Summarise worker trace files",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument("-i", "--input", action="store", nargs='+', help="trace files or globs", default=['output/traces/*.jsonl'])
+parser.add_argument("-t", "--top", action="store", type=int, help="slowest games to break down", default=10)
+parser.add_argument("-c", "--chrome", action="store", help="also export the spans to this Chrome trace JSON file", default=None)
+args = vars(parser.parse_args())
+
+# Stages in the order a game passes through them
+STAGES = ['claim', 'game', 'deck_sync', 'deck_files', 'simulate', 'parse',
+          'checkpoint_queue', 'checkpoint', 'write_back_queue', 'write_back']
+
+
+def read_spans(patterns):
+    paths = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+    if not paths:
+        raise FileNotFoundError(f"No trace files match {' '.join(patterns)}")
+    frames = [pd.read_json(path, lines=True, dtype={'trace': str}) for path in paths]
+    spans = pd.concat([frame for frame in frames if not frame.empty], ignore_index=True)
+    print(f"Read {len(spans)} spans for {spans['trace'].nunique()} games from {len(paths)} file(s)")
+    return spans
+
+
+def stage_order(name):
+    return STAGES.index(name) if name in STAGES else len(STAGES)
+
+
+def summarize_stages(spans):
+    stages = spans.groupby('name')['ms'].agg(
+        spans='count',
+        total_s=lambda ms: ms.sum() / 1000,
+        mean_ms='mean',
+        p50_ms='median',
+        p95_ms=lambda ms: ms.quantile(0.95),
+        p99_ms=lambda ms: ms.quantile(0.99),
+        max_ms='max',
+    )
+    stages = stages.loc[sorted(stages.index, key=stage_order)]
+    print("\nTime per stage")
+    print(stages.round(1).to_string())
+
+
+def slowest_games(spans, top):
+    # A game's stages summed by name, ranked by its end-to-end time from claim to last write
+    per_game = spans.pivot_table(index='trace', columns='name', values='ms', aggfunc='sum')
+    bounds = spans.assign(end=spans['start'] + spans['ms'] / 1000).groupby('trace').agg(start=('start', 'min'), end=('end', 'max'))
+    per_game['end_to_end'] = (bounds['end'] - bounds['start']) * 1000
+    per_game = per_game[sorted(per_game.columns, key=stage_order)]
+    print(f"\nSlowest {top} games (ms)")
+    print(per_game.nlargest(top, 'end_to_end').round(1).to_string())
+
+
+def export_chrome(spans, path):
+    # One row per game in the viewer, each stage a complete ("X") event
+    tracks = {trace: i for i, trace in enumerate(spans.sort_values('start')['trace'].unique())}
+    events = [{
+        'name': span.name,
+        'ph': 'X',
+        'ts': span.start * 1e6,
+        'dur': span.ms * 1000,
+        'pid': 1,
+        'tid': tracks[span.trace],
+        'args': {'trace': span.trace, **(span.attrs if isinstance(span.attrs, dict) else {})},
+    } for span in spans.itertuples()]
+    events += [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': trace}} for trace, tid in tracks.items()]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events}, f)
+    print(f"\nExported {len(spans)} spans to {path}")
+
+
+spans = read_spans(args['input'])
+if 'attrs' not in spans:
+    spans['attrs'] = None
+summarize_stages(spans)
+slowest_games(spans, args['top'])
+if args['chrome']:
+    export_chrome(spans, args['chrome'])
@@ -1,16 +1,15 @@
 import argparse
-import io
-import uuid
+import time
 import sys
 from pathlib import Path
-from datetime import datetime
+import pandas as pd
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
 from packages.deck_tools import *
-from packages.database_tools import conn, cur
+from packages.database_tools import connection
 
 """
 Parse jumpstart decks at input directory or commandline argument, if specified
@@ -19,49 +18,36 @@ Parse jumpstart decks at input directory or commandline argument, if specified
 # Set up commandline argument parser
 parser = argparse.ArgumentParser(description="Parse Jumpstart decks from input file, then upload to database",
                                  formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-parser.add_argument("-i", "--input", action="store", help="input file", default='input/decks.txt')
-parser.add_argument("-d", "--deck_name", action="store", help="Name of deck", default='deckname')
+parser.add_argument("-i", "--input", action="store", nargs='+', help="input file(s), several are parsed in parallel", default=['input/decks.txt'])
+parser.add_argument("-d", "--deck_name", action="store", help="Name of deck, with several input files each deck is named after its file", default='deckname')
 parser.add_argument("-f", "--format", action="store", help="game format (constructed, commander, jumpstart)", default='constructed')
-args = parser.parse_args()
-args = vars(parser.parse_args())
-
-
-# Read input file
-input_file = args['input']
-try:
-    with open(input_file, 'r') as file:
-        cards = file.readlines()
-except FileNotFoundError:
-    raise FileNotFoundError(f"Input file '{input_file}' not found.")
-
-# Read decks from input, add lands if missing
-format = args['format']
-cards_df = parse_decks(cards, format=format)
-
-# Commented out to upload just half decks for testing
-decks_df = cards_df
-
-deck_name = args['deck_name']
-if format != 'jumpstart':
-    decks_df['deck_name'] = deck_name
-
-# Add audit columns to decks_df
-decks_df.insert(0, 'primary_key', [str(uuid.uuid4()) for _ in range(len(decks_df))])
-decks_df.insert(1, 'uploaded_on', datetime.now().isoformat())
-decks_df.insert(2, 'format', format)
-decks_df.insert(2, 'category', 'main')
-
-# Rearrange columns to match table layout
-decks_df = decks_df[['primary_key', 'card_name', 'deck_name', 'set_code', 'quantity', 'uploaded_on', 'tag', 'colour', 'format', 'category']]
-
-# Prepare a CSV buffer from the DataFrame
-csv_buffer = io.StringIO()
-decks_df.to_csv(csv_buffer, index=False, header=False, sep='\t')
-csv_buffer.seek(0)
-
-cur.copy_from(csv_buffer, 'decks', sep='\t')
-conn.commit()
-print("Successfully uploaded decks to database")
-
-cur.close()
-conn.close()
+parser.add_argument("-w", "--workers", action="store", type=int, help="processes to parse input files with, defaults to one per CPU", default=None)
+
+# Parsing runs in a process pool, whose children import this script again under spawn
+if __name__ == '__main__':
+    args = parser.parse_args()
+    args = vars(parser.parse_args())
+
+    # Read decks from input files, add lands if missing
+    format = args['format']
+    input_files = args['input']
+    parsed = parse_deck_files(input_files, format=format, workers=args['workers'])
+
+    if format != 'jumpstart':
+        for input_file, cards_df in zip(input_files, parsed):
+            cards_df['deck_name'] = args['deck_name'] if len(input_files) == 1 else Path(input_file).stem
+
+    # Commented out to upload just half decks for testing
+    decks_df = pd.concat(parsed, ignore_index=True)
+
+    decks_df['format'] = format
+    decks_df['category'] = 'main'
+
+    # Only decks whose cards changed are replaced, re-uploading the same list writes nothing
+    start = time.perf_counter()
+    with connection() as (conn, cur):
+        changed, unchanged = upload_decks(cur, decks_df)
+    for deck_format, deck_name, revision in changed:
+        print(f"Uploaded {deck_format} deck '{deck_name}' revision {revision}")
+    print(f"Successfully uploaded decks to database: {len(changed)} changed, {len(unchanged)} unchanged "
+          f"in {(time.perf_counter() - start) * 1000:.0f}ms")
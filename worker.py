@@ -1,15 +1,24 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from dotenv import load_dotenv
 import threading
-import multiprocessing
+import atexit
+import select
+import signal
+import sys
+import psycopg2
 import time
 import os
 import logging
 
-from packages.database_tools import connect
+from packages.database_tools import connect, connection, close_connections, pool_stats
 from packages.deck_tools import generate_deck_files
-from packages.game_tools import run_game, parse_single_game_result
-import pandas as pd
+from packages.game_tools import run_game, GameOutputParser, claim_games, renew_leases, queue_depth, matchup_wins, finish_matchup, EarlyStop, LeaseLost, SimulatorFailed, GAMES_CHANNEL
+from packages.simulator_tools import close_pool
+from packages.cache_tools import DeckCache
+from packages.result_tools import ResultSink
+from packages.scheduler_tools import AdaptiveScheduler
+from packages.stats_tools import early_stop_winner
+from packages import metrics_tools, trace_tools
 
 # Configure logging
 os.makedirs('output/logs', exist_ok=True)
@@ -25,9 +34,37 @@ logging.basicConfig(
 app = Flask(__name__)
 logger = logging.getLogger(__name__)
 
+
+@app.route('/scheduler')
+def scheduler_status():
+    return jsonify(scheduler.status())
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(metrics_tools.REGISTRY.render(), mimetype=metrics_tools.CONTENT_TYPE)
+
+
+@app.route('/status')
+def status():
+    return jsonify({
+        'device_id': DEVICE_ID,
+        'uptime_seconds': time.monotonic() - STARTED,
+        'games_in_flight': running_games(),
+        'database_pool': pool_stats(),
+        'scheduler': scheduler.status(),
+        'metrics': metrics_tools.REGISTRY.snapshot(),
+    })
+
 load_dotenv()
 DEVICE_ID = os.getenv("DEVICE_ID")
 FORGE_JAR_PATH = os.getenv("FORGE_JAR_PATH")
+SPOOL_GAME_LOGS = os.getenv("SPOOL_GAME_LOGS", "1") != "0"
+CHECKPOINT_GAMES = int(os.getenv("CHECKPOINT_GAMES", 10))
+CHECKPOINT_SECONDS = float(os.getenv("CHECKPOINT_SECONDS", 60))
+LEASE_SECONDS = float(os.getenv("LEASE_SECONDS", 300))
+QUEUE_DEPTH_TTL = float(os.getenv("QUEUE_DEPTH_TTL", 15))
+STARTED = time.monotonic()
 
 # Log environment setup
 logging.info(f"Device ID: {DEVICE_ID}")
@@ -38,7 +75,51 @@ if not FORGE_JAR_PATH:
 if not DEVICE_ID:
     logging.error("DEVICE_ID environment variable not set!")
 
+# Game threads by primary_key, read from the request, heartbeat and claim threads
 current_games = {}
+current_games_lock = threading.Lock()
+# Running games whose lease could not be renewed, stopped at their next finished game
+lost_games = set()
+deck_cache = DeckCache()
+scheduler = AdaptiveScheduler()
+result_sink = ResultSink(
+    max_batch=int(os.getenv("RESULT_BATCH_SIZE", 50)),
+    max_delay_ms=int(os.getenv("RESULT_FLUSH_MS", 500)),
+    device_id=DEVICE_ID,
+    max_attempts=int(os.getenv("MAX_ATTEMPTS", 5)),
+    retry_seconds=float(os.getenv("RETRY_SECONDS", 60)),
+)
+slot_freed = threading.Event()
+queue_cache = {'depth': None, 'checked': float('-inf')}
+
+
+def running_games():
+    with current_games_lock:
+        return sorted(current_games)
+
+
+def cached_queue_depth():
+    # Every worker reports the fleet's queue, so scrapes only query it every QUEUE_DEPTH_TTL seconds
+    if time.monotonic() - queue_cache['checked'] >= QUEUE_DEPTH_TTL:
+        with connection('queue_depth') as (conn, cur):
+            depth = queue_depth(cur)
+        queue_cache['depth'] = {(state,): count for state, count in depth.items()}
+        queue_cache['checked'] = time.monotonic()
+    return queue_cache['depth']
+
+
+metrics_tools.gauge('worker_games_in_flight', 'Games running on this worker').set_function(lambda: len(current_games))
+metrics_tools.gauge('db_pool_connections_in_use', 'Pooled database connections borrowed right now').set_function(
+    lambda: pool_stats().get('in_use'))
+metrics_tools.gauge('queue_games', 'Unfinished game rows across the fleet, by state', labels=('state',)).set_function(
+    cached_queue_depth)
+CLAIM_SECONDS = metrics_tools.histogram('worker_claim_seconds', 'Time to claim games, including waiting for a connection')
+GAMES_CLAIMED = metrics_tools.counter('worker_games_claimed_total', 'Game rows claimed by this worker')
+SIMULATION_SECONDS = metrics_tools.counter('forge_simulation_seconds_total', 'Wall time spent running simulations', labels=('format',))
+GAMES_SIMULATED = metrics_tools.counter('forge_games_simulated_total', 'Games simulated', labels=('format',))
+SECONDS_PER_GAME = metrics_tools.histogram('forge_seconds_per_game', 'Average seconds per game of each simulator run', labels=('format',))
+PARSE_SECONDS = metrics_tools.histogram('forge_parse_seconds', 'Time spent parsing the output of each simulator run', labels=('format',),
+                                        buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
 
 def update_decks(
     decks = [],
@@ -51,27 +132,10 @@ def update_decks(
         format (str): Game format (constructed, commander, jumpstart)
     """
 
-    conn, cur = connect()
-    # TODO: Check if decks need to be updated
-    # cur.execute(f"""
-    #             SELECT MAX(uploaded_on) FROM decks
-    #             WHERE format = {format}
-    #             """)
-    # latest_uploaded_on = cur.fetchone()[0]
-
-    query = f"""
-        SELECT * FROM decks
-        WHERE format = '{format}'
-        """
-    if decks:
-        placeholders = ','.join(['%s'] * len(decks))
-        query += f"\nAND deck_name IN ({placeholders})"
-        cur.execute(query, decks)
-    else:
-        cur.execute(query)
-
-    rows = cur.fetchall()
-    decks_df = pd.DataFrame(rows, columns=[desc[0] for desc in cur.description])
+    # Only decks whose uploaded_on changed since the last sync are read from the database
+    with connection('deck_sync') as (conn, cur):
+        with trace_tools.span('deck_sync', decks=len([deck for deck in decks if deck])):
+            decks_df = deck_cache.get_decks(cur, format, decks)
 
     if format == 'jumpstart':
         if len(decks) != 4:
@@ -89,13 +153,55 @@ def update_decks(
             None
             )
 
-    generate_deck_files(decks_df, output_path=f"output/decks/{format}")
-
-    conn.close()
+    # Jumpstart decks are played as constructed, so Forge reads them from the constructed directory
+    forge_format = 'constructed' if format == 'jumpstart' else format
+    with trace_tools.span('deck_files') as deck_files_span:
+        changed = generate_deck_files(decks_df, output_path=f"output/decks/{format}", format=forge_format)
+        deck_files_span.set(changed=changed)
 
     return decks
 
+def player_count(game):
+    # Jumpstart's four half decks are merged into two players
+    if game['format'] == 'jumpstart':
+        return 2
+    return sum(1 for i in range(4) if game.get(f'deck{i+1}_name'))
+
+
 def setup_game(game):
+    try:
+        # Every stage of the game is traced under its primary_key
+        with trace_tools.span('game', trace_id=game['primary_key'], format=game['format'], game_count=game['game_count']):
+            play_game(game)
+    except Exception as e:
+        # Keep what was played and hand the rest back to the queue, whichever stage failed
+        parser = game.get('parser') or GameOutputParser([], initial=game)
+        logging.exception(f"Game {game['primary_key']} failed on attempt {game.get('attempts')} after {parser.games_played}/{game['game_count']} games, releasing for a retry: {e}")
+        result_sink.add(game['primary_key'], parser.result(), finished=False, release=True)
+    finally:
+        # Remove from current_games after finishing
+        with current_games_lock:
+            current_games.pop(game['primary_key'], None)
+            lost_games.discard(game['primary_key'])
+        scheduler.finish(game['primary_key'])
+        slot_freed.set()
+
+
+def record_run(format, parser, started, games_before):
+    elapsed = time.perf_counter() - started
+    games = parser.games_played - games_before
+    SIMULATION_SECONDS.inc(elapsed, format=format)
+    GAMES_SIMULATED.inc(games, format=format)
+    if games > 0:
+        SECONDS_PER_GAME.observe(elapsed / games, format=format)
+    PARSE_SECONDS.observe(parser.parse_seconds, format=format)
+    trace_tools.record('simulate', elapsed, games=games)
+    trace_tools.record('parse', parser.parse_seconds, lines=parser.lines)
+
+
+def play_game(game):
+    # Metrics are by the format games were queued in, before Jumpstart runs as constructed
+    format = game['format']
     logging.info(f"Starting game {game['primary_key']} with decks: {game['deck1_name']}, {game['deck2_name']}, {game.get('deck3_name')}, {game.get('deck4_name')}")
 
     updated_decks = update_decks(
@@ -118,142 +224,251 @@ def setup_game(game):
         # Change format to constructed so game doesn't look in Jumpstart subdirectory
         game['format'] = 'constructed'
 
+    # Resume from any games an earlier, interrupted run checkpointed
+    games_played = game.get('games_played') or 0
+    remaining = game['game_count'] - games_played
+    if games_played:
+        logging.info(f"Game {game['primary_key']} - Resuming after {games_played}/{game['game_count']} checkpointed games")
+
+    last_checkpoint = {'games': games_played, 'time': time.monotonic()}
+    early_stop = game.get('early_stop_confidence')
+    players = player_count(game)
+    # Early stopping judges the whole matchup: this shard's games plus what its sibling shards checkpointed
+    sibling_wins = [0] * 4
+
+    def refresh_sibling_wins():
+        if early_stop and game.get('matchup_id'):
+            with connection('matchup_wins') as (conn, cur):
+                sibling_wins[:] = matchup_wins(cur, game['matchup_id'], game['primary_key'])
+
+    def matchup_decided(parser):
+        totals = [own + other for own, other in zip(parser.win_counts, sibling_wins)]
+        return early_stop and early_stop_winner(totals, early_stop, players=players) is not None
+
+    def on_game(parser):
+        # Another device owns the row now, or it was finished, so nothing more this run plays would be written
+        with current_games_lock:
+            lost = game['primary_key'] in lost_games
+        if lost:
+            raise LeaseLost()
+
+        # Stop the simulator as soon as the winner is clear, the remaining games would not change it
+        if matchup_decided(parser):
+            raise EarlyStop()
+
+        # Checkpoint every CHECKPOINT_GAMES games or CHECKPOINT_SECONDS seconds, whichever comes first
+        if (parser.games_played - last_checkpoint['games'] >= CHECKPOINT_GAMES
+                or time.monotonic() - last_checkpoint['time'] >= CHECKPOINT_SECONDS):
+            logging.info(f"Game {game['primary_key']} - Progress: {parser.games_played}/{game['game_count']} games")
+            result_sink.add(game['primary_key'], parser.result(), finished=False)
+            last_checkpoint['games'] = parser.games_played
+            last_checkpoint['time'] = time.monotonic()
+            refresh_sibling_wins()
+
+    def stop_early(parser):
+        parsed_result = parser.result()
+        parsed_result['stopped_early'] = True
+        logging.info(f"Game {game['primary_key']} - Matchup winner clear at {early_stop:.0%} confidence, stopped after {parser.games_played}/{game['game_count']} games: {parsed_result}")
+        result_sink.add(game['primary_key'], parsed_result)
+        if game.get('matchup_id'):
+            with connection('finish_matchup') as (conn, cur):
+                finished = finish_matchup(conn, cur, game['matchup_id'], game['primary_key'])
+            if finished:
+                logging.info(f"Game {game['primary_key']} - Finished {finished} queued shard(s) of the decided matchup")
+
+    # Output is parsed as it streams in, and optionally spooled to a compressed log
+    parser = GameOutputParser(
+        [game['deck1_name'], game['deck2_name'], game['deck3_name'], game['deck4_name']],
+        initial=game,
+        on_game=on_game,
+    )
+    game['parser'] = parser
+    log_path = f"output/logs/game_{game['primary_key']}_output.txt.gz" if SPOOL_GAME_LOGS else None
+
+    if remaining <= 0:
+        logging.info(f"Game {game['primary_key']} - All games already played, finishing")
+        result_sink.add(game['primary_key'], parser.result())
+        return
+
+    # Sibling shards may have decided the matchup while this one waited in the queue
+    refresh_sibling_wins()
+    if matchup_decided(parser):
+        stop_early(parser)
+        return
+
+    started = time.perf_counter()
+    try:
+        game['results'] = run_game(
+            deck1_name=game['deck1_name'],
+            deck2_name=game['deck2_name'],
+            deck3_name=game['deck3_name'],
+            deck4_name=game['deck4_name'],
+            format=game['format'],
+            game_count=remaining,
+            parser=parser,
+            log_path=log_path,
+            on_start=lambda proc: scheduler.track(game['primary_key'], proc.pid),
+        )
+    except EarlyStop:
+        stop_early(parser)
+        return
+    except LeaseLost:
+        logging.warning(f"Game {game['primary_key']} - Stopped after {parser.games_played}/{game['game_count']} games, its lease was lost")
+        return
+    finally:
+        record_run(format, parser, started, games_played)
+
+    success = game['results'].returncode == 0
+    logging.info(f"Game {game['primary_key']} - Return code: {game['results'].returncode}, {parser.lines} output lines")
+    if log_path:
+        logging.info(f"Game {game['primary_key']} - Output spooled to {log_path}")
+    if not success:
+        logging.warning(f"Game {game['primary_key']} - Game marked as unsuccessful after {parser.games_played}/{game['game_count']} games")
+        if game['results'].stderr:
+            logging.warning(f"Game {game['primary_key']} - STDERR: {game['results'].stderr}")
+        # A crash part way through is retried for the missing games like any other failure, not finished short
+        if parser.games_played < game['game_count']:
+            raise SimulatorFailed(f"Simulator exited with code {game['results'].returncode} after {parser.games_played}/{game['game_count']} games")
+
+    parsed_result = parser.result()
+    logging.info(f"Game {game['primary_key']} - Parsed result: {parsed_result}")
 
+    # Written back in batches with other finished games
+    result_sink.add(game['primary_key'], parsed_result)
 
-    game['results'] = run_game(
-        deck1_name=game['deck1_name'],
-        deck2_name=game['deck2_name'],
-        deck3_name=game['deck3_name'],
-        deck4_name=game['deck4_name'],
-        format=game['format'],
-        game_count=game['game_count']
-    )
 
-    logging.info(f"Game {game['primary_key']} - Return code: {getattr(game['results'], 'returncode', 'N/A')}")
-
-    if hasattr(game['results'], 'stdout') and game['results'].stdout:
-        logging.info(f"Game {game['primary_key']} - STDOUT length: {len(game['results'].stdout)} characters")
-        logging.debug(f"Game {game['primary_key']} - STDOUT first 500 chars: {game['results'].stdout[:500]}")
-
-        # Ensure output/logs directory exists before writing
-        os.makedirs('output/logs', exist_ok=True)
-        # Save full output to file for debugging
-        with open(f"output/logs/game_{game['primary_key']}_output.txt", 'w', encoding='utf-8') as f:
-            f.write(f"Game {game['primary_key']} Output\n")
-            f.write(f"Decks: {game['deck1_name']}, {game['deck2_name']}, {game.get('deck3_name')}, {game.get('deck4_name')}\n")
-            f.write(f"Return code: {game['results'].returncode}\n")
-            f.write(f"STDOUT:\n{game['results'].stdout}\n")
-            if game['results'].stderr:
-                f.write(f"STDERR:\n{game['results'].stderr}\n")
-        logging.info(f"Game {game['primary_key']} - Full output saved to output/logs/game_{game['primary_key']}_output.txt")
-    else:
-        logging.warning(f"Game {game['primary_key']} - No stdout found")
-
-    # if hasattr(game['results'], 'stderr') and game['results'].stderr:
-    #     logging.warning(f"Game {game['primary_key']} - STDERR: {game['results'].stderr}")
-
-    single_result = {
-        'deck1': game['deck1_name'],
-        'deck2': game['deck2_name'],
-        'deck3': game.get('deck3_name'),
-        'deck4': game.get('deck4_name'),
-        'result': game['results'],
-        'success': getattr(game['results'], 'returncode', 0) == 0
-    }
-
-    logging.info(f"Game {game['primary_key']} - Single result success: {single_result['success']}")
-
-    parsed_result = parse_single_game_result(single_result)
-    logging.info(f"Game {game['primary_key']} - Parsed result: {parsed_result}")
+def listen_for_games():
+    """
+    Open a connection subscribed to new game notifications
 
-    # print(parsed_result)
-
-    conn, cur = connect()
-    cur.execute("""
-        UPDATE games
-        SET deck1_wins = %s,
-            deck2_wins = %s,
-            deck3_wins = %s,
-            deck4_wins = %s,
-            turn_counts = %s,
-            finished_on = NOW()
-        WHERE primary_key = %s
-    """, (
-        parsed_result.get('deck1_wins', 0),
-        parsed_result.get('deck2_wins', 0),
-        parsed_result.get('deck3_wins', 0),
-        parsed_result.get('deck4_wins', 0),
-        str(parsed_result.get('turn_counts', [])),
-        game['primary_key']
-    ))
-    conn.commit()
-    conn.close()
-    # Remove from current_games after finishing
-    current_games.pop(game['primary_key'], None)
-
-
-def check_game_data(interval=10):
+    Returns:
+        connection: Autocommit connection listening on GAMES_CHANNEL, or None if it failed
+    """
+    try:
+        conn, cur = connect()
+        conn.autocommit = True
+        cur.execute(f"LISTEN {GAMES_CHANNEL}")
+        logging.info(f"Listening for queued games on channel '{GAMES_CHANNEL}'")
+        return conn
+    except psycopg2.Error as e:
+        logging.warning(f"Could not listen for queued games, falling back to polling: {e}")
+        return None
+
+
+def wait_for_games(listen_conn, timeout):
+    """
+    Block until a game is queued or timeout seconds pass
+
+    Args:
+        listen_conn: Connection returned by listen_for_games, or None to just sleep
+        timeout (float): Maximum seconds to wait (the polling fallback)
+
+    Returns:
+        connection: The listening connection, or None if it was lost
+    """
+    if listen_conn is None:
+        time.sleep(timeout)
+        return None
+
+    try:
+        if not listen_conn.notifies:
+            select.select([listen_conn], [], [], timeout)
+        listen_conn.poll()
+        if listen_conn.notifies:
+            logging.info(f"Woken by {len(listen_conn.notifies)} queue notification(s)")
+        listen_conn.notifies.clear()
+        return listen_conn
+    except (psycopg2.Error, OSError) as e:
+        logging.warning(f"Lost queue listener connection: {e}")
+        listen_conn.close()
+        return None
+
+
+def heartbeat():
+    """
+    Renew the leases on every running game a few times per lease, so other
+    workers only reclaim games whose worker has stopped
+    """
     while True:
-        max_games = multiprocessing.cpu_count()
-        if len(current_games) >= max_games:
-            logging.info(f"Max games running ({max_games}). Sleeping...")
-            time.sleep(30)
+        time.sleep(LEASE_SECONDS / 3)
+        running = running_games()
+        if not running:
             continue
+        try:
+            with connection('renew_leases') as (conn, cur):
+                lost = renew_leases(conn, cur, DEVICE_ID, running, LEASE_SECONDS)
+        except Exception as e:
+            logging.warning(f"Failed to renew leases on {len(running)} game(s), will retry: {e}")
+            continue
+        with current_games_lock:
+            lost_games.update(primary_key for primary_key in lost if primary_key in current_games)
+        for primary_key in lost:
+            # Its results would not be written, so the simulator is stopped at its next finished game
+            logging.warning(f"Game {primary_key} - Lease could not be renewed, the game was finished or claimed by another device")
 
-        time.sleep(interval)
 
-        logging.info("Checking for games...")
-        conn, cur = connect()
-        slots = max_games - len(current_games)
-        cur.execute(f"""
-            SELECT primary_key,
-                   deck1_name,
-                   deck2_name,
-                   deck3_name,
-                   deck4_name,
-                   created_on,
-                   format,
-                   game_count
-            FROM games
-            WHERE device_id IS NULL
-            ORDER BY created_on ASC
-            LIMIT {slots}
-        """)
-        rows = cur.fetchall()
-        logging.info(f"Found {len(rows)} available games to process")
-
-        for row in rows:
-            game = {
-                "primary_key": row[0],
-                "deck1_name": row[1],
-                "deck2_name": row[2],
-                "deck3_name": row[3],
-                "deck4_name": row[4],
-                "created_on": row[5],
-                "format": row[6],
-                "game_count": row[7]
-            }
-            logging.info(f"Processing game {row[0]}: {row[1]} vs {row[2]} vs {row[3]} vs {row[4]} ({row[7]} games)")
-
-            cur.execute("""
-                UPDATE games
-                SET device_id = %s
-                WHERE primary_key = %s
-            """, (DEVICE_ID, row[0]))
-            conn.commit()
-            logging.info(f"Game {row[0]} successfully claimed by device {DEVICE_ID}")
+def check_game_data(interval=60):
+    listen_conn = listen_for_games()
 
+    while True:
+        # Admission follows live load, free memory and learned per-format costs
+        slots = scheduler.available_slots()
+        if slots <= 0:
+            logging.info(f"No capacity for more games ({len(current_games)} running). Waiting...")
+            slot_freed.wait(10)
+            slot_freed.clear()
+            continue
+
+        if listen_conn is None:
+            listen_conn = listen_for_games()
+        elif listen_conn.notifies:
+            # Claiming below picks up whatever these announced
+            listen_conn.notifies.clear()
+
+        logging.info(f"Checking for games ({slots} slots free)...")
+        claim_started = time.perf_counter()
+        with CLAIM_SECONDS.time():
+            with connection('claim_games') as (conn, cur):
+                games = claim_games(conn, cur, DEVICE_ID, slots, LEASE_SECONDS)
+        GAMES_CLAIMED.inc(len(games))
+        claim_seconds = time.perf_counter() - claim_started
+        for game in games:
+            trace_tools.record('claim', claim_seconds, trace_id=game['primary_key'], claimed=len(games))
+        logging.info(f"Claimed {len(games)} available games for device {DEVICE_ID}")
+
+        for game in games:
+            # Registered before the thread starts, so a game that finishes at once is not left behind
             t = threading.Thread(target=setup_game, args=(game,), daemon=True)
+            with current_games_lock:
+                running = game['primary_key'] in current_games
+                if not running:
+                    current_games[game['primary_key']] = t
+            if running:
+                # Our own lease ran out while the game was still running here, the claim just renewed it
+                logging.warning(f"Game {game['primary_key']} is already running on this device")
+                continue
+            logging.info(f"Processing game {game['primary_key']}: {game['deck1_name']} vs {game['deck2_name']} vs {game['deck3_name']} vs {game['deck4_name']} ({game['game_count']} games)")
+
+            scheduler.start(game['primary_key'], game['format'], player_count(game))
             t.start()
-            current_games[row[0]] = t
-        conn.close()
 
-        if rows:
-            logging.info(f"Started {len(rows)} new games. Currently running: {len(current_games)} games")
-        logging.debug('Sleeping before next check...')
+        if games:
+            logging.info(f"Started {len(games)} new games. Currently running: {len(current_games)} games")
+
+        # Queue may still have games if every slot was filled, so check again straight away
+        if len(games) < slots:
+            logging.debug('Waiting for queued games...')
+            listen_conn = wait_for_games(listen_conn, interval)
 
 
 if __name__ == '__main__':
+    # atexit runs in reverse order: flush results before the connection pool closes
+    atexit.register(close_connections)
+    atexit.register(result_sink.close)
+    atexit.register(close_pool)
+    # Turn SIGTERM into a normal exit so queued results are flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     thread = threading.Thread(target=check_game_data, daemon=True)
     thread.start()
-    app.run(debug=True, use_reloader=False)
\ No newline at end of file
+    threading.Thread(target=heartbeat, daemon=True).start()
+    app.run(debug=True, use_reloader=False, port=int(os.getenv("WORKER_PORT", 5000)))
\ No newline at end of file